@@ -0,0 +1,121 @@
+"""
+Compare the bidirectional A* search of the centre strategies with the Dijkstra search they ran before, on node pairs of
+synthetic networks of several sizes, by the nodes settled, the time per query and the length of the paths found.
+
+    python -m benchmarks.bench_astar --scales 10000,100000 --pairs 50
+
+Local pairs lie within --radius km of each other, as the centres of neighbouring components do, and random pairs
+anywhere in the largest component.
+"""
+import argparse
+import json
+import networkx as nx
+import numpy as np
+import os
+import random
+import statistics
+import time
+from scripts.geodesic import geodesic_lengths
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.profiler import Profiler
+from scripts.search import DijkstraTree, bidirectional_astar
+from scripts.synthetic import LAYOUTS, SyntheticFetcher, generate_network
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_pairs(graph: GraphProcessing, n: int, radius: float, seed: int) -> Dict[str, List[Tuple[int, int]]]:
+    rng = random.Random(seed)
+    nodes = sorted(max(nx.connected_components(graph.graph_unfiltered), key=len))
+    pos = np.array([graph.layout[node] for node in nodes])
+    local = []
+    for source in rng.sample(range(len(nodes)), n):
+        lengths = geodesic_lengths(pos[source, 0], pos[source, 1], pos[:, 0], pos[:, 1], method='haversine')
+        close = np.flatnonzero((lengths > 0) & (lengths < radius))
+        if len(close) > 0:
+            local.append((nodes[source], nodes[rng.choice(close.tolist())]))
+    return {'local': local, 'random': [tuple(rng.sample(nodes, 2)) for _ in range(n)]}
+
+
+def measure(search: Callable, pairs: List[Tuple[int, int]]) -> Tuple[List[float], List[float]]:
+    times, dists = [], []
+    for source, target in pairs:
+        start = time.perf_counter()
+        dist, _ = search(source, target)
+        times.append(time.perf_counter() - start)
+        dists.append(dist)
+    return times, dists
+
+
+def count_settled(search: Callable, pairs: List[Tuple[int, int]]) -> float:
+    profiler = Profiler(detailed=True)
+    with profiler.activate():
+        for source, target in pairs:
+            search(source, target)
+    return profiler.get_counts().get('nodes_settled', 0) / max(1, len(pairs))
+
+
+def benchmark(config_json: Dict, layout: str, scale: int, n_pairs: int, radius: float, seed: int = 0) -> Dict:
+    network = generate_network(layout, nodes=scale, components=1, seed=seed)
+    graph = GraphProcessing(Model(SyntheticFetcher(network.get_config(config_json), network)))
+    graph.preprocessing()
+    g = graph.graph_unfiltered
+
+    def dijkstra(source, target):
+        return nx.single_source_dijkstra(g, source, target, weight='length')
+
+    def astar(source, target):
+        return bidirectional_astar(g, source, target, graph.get_distance_bound_to, weight='length')
+
+    def counted_dijkstra(source, target):
+        # Settles the same nodes as nx.single_source_dijkstra to a single target
+        return DijkstraTree(g, [source], weight='length').nearest({target})
+
+    results = {}
+    for kind, pairs in get_pairs(graph, n_pairs, radius, seed).items():
+        dijkstra_times, dijkstra_dists = measure(dijkstra, pairs)
+        astar_times, astar_dists = measure(astar, pairs)
+        results[kind] = {
+            'pairs': len(pairs),
+            'dijkstra_ms': statistics.median(dijkstra_times) * 1000,
+            'astar_ms': statistics.median(astar_times) * 1000,
+            'dijkstra_settled': count_settled(counted_dijkstra, pairs),
+            'astar_settled': count_settled(astar, pairs),
+            'max_length_difference_km': max((abs(a - b) for a, b in zip(dijkstra_dists, astar_dists)), default=0)
+        }
+    return {'layout': layout, 'scale': scale, 'nodes': g.number_of_nodes(), 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bidirectional A* against Dijkstra between two nodes.')
+    parser.add_argument('--config', type=str, default='configuration.json',
+                        help='configuration file to take the tag weights, threshold and radius from')
+    parser.add_argument('--scales', type=str, default='10000,100000', help='comma-separated numbers of nodes')
+    parser.add_argument('--layouts', type=str, default=','.join(LAYOUTS), help='comma-separated layouts')
+    parser.add_argument('--pairs', type=int, default=50, help='number of node pairs of each kind')
+    parser.add_argument('--radius', type=float, default=0.5, help='greatest distance in km between local pairs')
+    parser.add_argument('--output', type=str, help='file to write the results to')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, args.config), 'r') as f:
+        config_json = json.load(f)
+
+    results = []
+    for layout in args.layouts.split(','):
+        for scale in (int(scale) for scale in args.scales.split(',')):
+            result = benchmark(config_json, layout, scale, args.pairs, args.radius)
+            for kind, r in result['results'].items():
+                print(f"{layout:>8} {scale:>7} {kind:>6}: settled {r['dijkstra_settled']:>9.0f} -> "
+                      f"{r['astar_settled']:>8.0f}, {r['dijkstra_ms']:>8.2f}ms -> {r['astar_ms']:>7.2f}ms, "
+                      f"length difference {r['max_length_difference_km']:.2e} km")
+            results.append(result)
+
+    if args.output is not None:
+        with open(os.path.join(ROOT, args.output), 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
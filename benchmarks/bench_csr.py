@@ -0,0 +1,92 @@
+"""
+Compare the csr graph engine with the networkx engine on synthetic networks of several sizes: the time to build the
+graphs, to link close nodes and find the components, and to run each path strategy between the largest component and
+the largest one reachable from it. Reports whether both engines found the same components and path lengths.
+
+    python -m benchmarks.bench_csr --scales 10000,100000
+"""
+import argparse
+import dataclasses
+import json
+import os
+import time
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.pipeline import STRATEGIES
+from scripts.synthetic import LAYOUTS, SyntheticFetcher, generate_network
+from typing import Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def benchmark_engine(config, network, engine: str) -> Dict:
+    timings: Dict[str, float] = {}
+
+    def timed(stage: str, function: Callable, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    model = Model(SyntheticFetcher(dataclasses.replace(config, graph_engine=engine), network))
+    model.get_adj_list()
+    model.get_adj_list(0)
+    graph = timed('graph', GraphProcessing, model)
+    groups = timed('preprocessing', graph.preprocessing)
+
+    dists = {}
+    # Every region lies in one part of the network, as the network is generated in one piece
+    if len(groups) > 1:
+        for strategy, (method, _) in STRATEGIES.items():
+            dists[strategy] = timed(strategy, getattr(graph, method), groups[0], groups[1])[0]
+    return {'timings': timings, 'components': groups, 'dists': dists}
+
+
+def benchmark(config_json: Dict, layout: str, scale: int, seed: int = 0) -> Dict:
+    network = generate_network(layout, nodes=scale, seed=seed)
+    config = network.get_config(config_json)
+    results = {engine: benchmark_engine(config, network, engine) for engine in ('networkx', 'csr')}
+    nx_result, csr_result = results['networkx'], results['csr']
+    return {
+        'layout': layout,
+        'scale': scale,
+        'nodes': len(network.nodes),
+        'components': len(csr_result['components']),
+        'same_components': nx_result['components'] == csr_result['components'],
+        'max_length_difference_km': max((abs(nx_result['dists'][strategy] - dist)
+                                         for strategy, dist in csr_result['dists'].items()), default=0),
+        'timings': {engine: result['timings'] for engine, result in results.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the csr graph engine against the networkx engine')
+    parser.add_argument('--config', type=str, default='configuration.json',
+                        help='configuration file to take the tag weights, threshold and radius from')
+    parser.add_argument('--scales', type=str, default='10000,100000', help='comma-separated numbers of nodes')
+    parser.add_argument('--layouts', type=str, default=','.join(LAYOUTS), help='comma-separated layouts')
+    parser.add_argument('--output', type=str, help='file to write the results to')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, args.config), 'r') as f:
+        config_json = json.load(f)
+
+    results = []
+    for layout in args.layouts.split(','):
+        for scale in (int(scale) for scale in args.scales.split(',')):
+            result = benchmark(config_json, layout, scale)
+            print(f"{layout:>8} {scale:>7}: {result['nodes']} nodes, {result['components']} components, "
+                  f"same components {result['same_components']}, "
+                  f"length difference {result['max_length_difference_km']:.2e} km")
+            nx_timings, csr_timings = result['timings']['networkx'], result['timings']['csr']
+            for stage, seconds in nx_timings.items():
+                print(f"{'':>16} {stage:<14} {seconds:>9.4f}s -> {csr_timings[stage]:>9.4f}s")
+            results.append(result)
+
+    if args.output is not None:
+        with open(os.path.join(ROOT, args.output), 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Compare the contraction hierarchy built by --hierarchy with the searches it replaces, on synthetic networks of several
+sizes: bidirectional A* between node pairs, as the centre strategies search, and Dijkstra between the components of a
+network, as the overall strategy searches. Reports the time to build the hierarchy, its shortcuts, the time per query
+and the largest difference in the lengths of the paths found, which should be zero.
+
+    python -m benchmarks.bench_hierarchy --scales 10000,100000 --pairs 50
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from benchmarks.bench_astar import get_pairs, measure
+from scripts.graph import GraphProcessing
+from scripts.hierarchy import ContractionHierarchy
+from scripts.model import Model
+from scripts.search import DijkstraTree, bidirectional_astar
+from scripts.synthetic import LAYOUTS, SyntheticFetcher, generate_network
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def benchmark(config_json: Dict, layout: str, scale: int, n_pairs: int, radius: float, seed: int = 0) -> Dict:
+    network = generate_network(layout, nodes=scale, seed=seed)
+    graph = GraphProcessing(Model(SyntheticFetcher(network.get_config(config_json), network)))
+    components = graph.preprocessing()
+    g = graph.graph_unfiltered
+
+    start = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(g)
+    build = time.perf_counter() - start
+
+    def astar(source, target):
+        return bidirectional_astar(g, source, target, graph.get_distance_bound_to, weight='length')
+
+    def query(source, target):
+        return hierarchy.query([source], [target])
+
+    results = {}
+    for kind, pairs in get_pairs(graph, n_pairs, radius, seed).items():
+        astar_times, astar_dists = measure(astar, pairs)
+        hierarchy_times, hierarchy_dists = measure(query, pairs)
+        results[kind] = {
+            'pairs': len(pairs),
+            'search_ms': statistics.median(astar_times) * 1000,
+            'hierarchy_ms': statistics.median(hierarchy_times) * 1000,
+            'max_length_difference_km': max((abs(a - b) for a, b in zip(astar_dists, hierarchy_dists)), default=0)
+        }
+
+    # The first component against each of the next ones, as the overall strategy is run between two regions
+    regions = [(components[0], component) for component in components[1:n_pairs + 1]]
+
+    def dijkstra(from_region, to_region):
+        return DijkstraTree(g, from_region, weight='length').nearest(to_region)
+
+    def region_query(from_region, to_region):
+        return hierarchy.query(from_region, to_region)
+
+    dijkstra_times, dijkstra_dists = measure(dijkstra, regions)
+    hierarchy_times, hierarchy_dists = measure(region_query, regions)
+    results['regions'] = {
+        'pairs': len(regions),
+        'search_ms': statistics.median(dijkstra_times) * 1000 if regions else 0,
+        'hierarchy_ms': statistics.median(hierarchy_times) * 1000 if regions else 0,
+        'max_length_difference_km': max((abs(a - b) for a, b in zip(dijkstra_dists, hierarchy_dists)), default=0)
+    }
+    return {'layout': layout, 'scale': scale, 'nodes': g.number_of_nodes(), 'edges': g.number_of_edges(),
+            'build_s': build, 'shortcuts': len(hierarchy.middle), 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the contraction hierarchy against the searches it replaces')
+    parser.add_argument('--config', type=str, default='configuration.json',
+                        help='configuration file to take the tag weights, threshold and radius from')
+    parser.add_argument('--scales', type=str, default='10000,100000', help='comma-separated numbers of nodes')
+    parser.add_argument('--layouts', type=str, default=','.join(LAYOUTS), help='comma-separated layouts')
+    parser.add_argument('--pairs', type=int, default=50, help='number of node pairs of each kind')
+    parser.add_argument('--radius', type=float, default=0.5, help='greatest distance in km between local pairs')
+    parser.add_argument('--output', type=str, help='file to write the results to')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, args.config), 'r') as f:
+        config_json = json.load(f)
+
+    results = []
+    for layout in args.layouts.split(','):
+        for scale in (int(scale) for scale in args.scales.split(',')):
+            result = benchmark(config_json, layout, scale, args.pairs, args.radius)
+            print(f"{layout:>8} {scale:>7}: {result['nodes']} nodes, built in {result['build_s']:.1f}s with "
+                  f"{result['shortcuts']} shortcuts")
+            for kind, r in result['results'].items():
+                print(f"{'':>16} {kind:>7}: {r['search_ms']:>8.2f}ms -> {r['hierarchy_ms']:>7.2f}ms, "
+                      f"length difference {r['max_length_difference_km']:.2e} km")
+            results.append(result)
+
+    if args.output is not None:
+        with open(os.path.join(ROOT, args.output), 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
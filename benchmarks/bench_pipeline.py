@@ -0,0 +1,142 @@
+"""
+Time each stage of the pipeline on synthetic networks of several sizes, from reading the ways of the data source to
+the four path strategies, and write the timings as JSON so that they can be compared between commits.
+
+    python -m benchmarks.bench_pipeline --scales 1000,10000,100000 --layouts grid,organic --output before.json
+    python -m benchmarks.bench_pipeline --output after.json --compare before.json
+
+Each stage is run --repeat times on fresh graphs and the least time is kept.
+"""
+import argparse
+import json
+import networkx as nx
+import os
+import platform
+import subprocess
+import time
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.pipeline import STRATEGIES
+from scripts.store import NodeWayStore
+from scripts.synthetic import LAYOUTS, SyntheticFetcher, generate_network
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_once(config_json: Dict, layout: str, scale: int, components: int, seed: int) -> Dict:
+    timings: Dict[str, float] = {}
+
+    def timed(stage: str, function: Callable, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    network = generate_network(layout, nodes=scale, components=components, seed=seed)
+    config = network.get_config(config_json)
+    fetcher = SyntheticFetcher(config, network)
+
+    timed('get_nodes_on_ways', fetcher.get_nodes_on_ways)
+    model = Model(fetcher)
+    timed('store', NodeWayStore.from_fetcher, fetcher)
+    timed('eval_way', lambda: [model.eval_way(way) for way in fetcher.get_ways()])
+    timed('get_scores', model.get_scores)
+    timed('get_adj_list', model.get_adj_list)
+    timed('get_adj_list_unfiltered', model.get_adj_list, 0)
+    graph = timed('graph', GraphProcessing, model)
+    timed('edge_lengths', graph.get_edge_lengths, list(graph.edge_length))
+
+    for g in (graph.graph, graph.graph_unfiltered):
+        nx.set_node_attributes(g, graph.layout, 'pos')
+        nx.set_edge_attributes(g, graph.edge_length, 'length')
+    timed('connect_close_nodes', graph.connect_close_nodes)
+    groups = timed('get_connected_components', graph.get_connected_components, graph.graph)
+
+    # The largest regions may lie in different parts of the network, so the second region is the largest one that
+    # can be reached from the first
+    reachable = nx.node_connected_component(graph.graph_unfiltered, next(iter(groups[0])))
+    to_region = next((group for group in groups[1:] if len(group & reachable) > 0), None)
+    if to_region is not None:
+        for strategy, (method, _) in STRATEGIES.items():
+            timed(strategy, getattr(graph, method), groups[0], to_region)
+
+    return {
+        'layout': layout,
+        'scale': scale,
+        'nodes': len(network.nodes),
+        'ways': len(network.ways),
+        'graph_nodes': graph.graph_unfiltered.number_of_nodes(),
+        'components': len(groups),
+        'timings': timings
+    }
+
+
+def benchmark(config_json: Dict, layout: str, scale: int, components: int, repeat: int, seed: int = 0) -> Dict:
+    runs = [benchmark_once(config_json, layout, scale, components, seed) for _ in range(repeat)]
+    result = runs[0]
+    result['timings'] = {stage: min(run['timings'][stage] for run in runs) for stage in result['timings']}
+    return result
+
+
+def compare(results: List[Dict], baseline: List[Dict]) -> str:
+    """
+    Format the ratio of each stage time to the time of the same stage in the baseline results, so that values above
+    one are regressions.
+    """
+    by_key = {(result['layout'], result['scale']): result for result in baseline}
+    lines = []
+    for result in results:
+        base = by_key.get((result['layout'], result['scale']))
+        if base is None:
+            continue
+        lines.append(f"{result['layout']} {result['scale']}:")
+        for stage, seconds in result['timings'].items():
+            if stage in base['timings'] and base['timings'][stage] > 0:
+                lines.append(f"  {stage:<26} {base['timings'][stage]:>9.4f}s -> {seconds:>9.4f}s  "
+                             f"x{seconds / base['timings'][stage]:.2f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every stage of the pipeline on synthetic networks.')
+    parser.add_argument('--config', type=str, default='configuration.json',
+                        help='configuration file to take the tag weights, threshold and radius from')
+    parser.add_argument('--scales', type=str, default='1000,10000,100000', help='comma-separated numbers of nodes')
+    parser.add_argument('--layouts', type=str, default=','.join(LAYOUTS), help='comma-separated layouts')
+    parser.add_argument('--components', type=int, default=3, help='number of disconnected parts of the network')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs to keep the least time of')
+    parser.add_argument('--output', type=str, default='benchmarks/results.json', help='file to write the results to')
+    parser.add_argument('--compare', type=str, help='results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, args.config), 'r') as f:
+        config_json = json.load(f)
+
+    results = []
+    for layout in args.layouts.split(','):
+        for scale in (int(scale) for scale in args.scales.split(',')):
+            result = benchmark(config_json, layout, scale, args.components, args.repeat)
+            total = sum(result['timings'].values())
+            print(f"{layout:>8} {scale:>8}: {result['nodes']} nodes, {result['ways']} ways, "
+                  f"{result['components']} components, {total:.3f}s")
+            results.append(result)
+
+    with open(os.path.join(ROOT, args.output), 'w') as f:
+        json.dump({'commit': get_commit(), 'python': platform.python_version(), 'results': results}, f, indent=4)
+
+    if args.compare is not None:
+        with open(os.path.join(ROOT, args.compare), 'r') as f:
+            print(compare(results, json.load(f)['results']))
+
+
+if __name__ == '__main__':
+    main()
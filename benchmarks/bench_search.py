@@ -0,0 +1,86 @@
+"""
+Compare shortest_path_overall and shortest_path_existing against the original implementation, which ran one
+nx.multi_source_dijkstra per node in to_region, on the areas in configuration.json.
+
+The original search is timed on a sample of targets and extrapolated to the whole of to_region, since running it to
+every target takes hours on the larger areas.
+
+    python -m benchmarks.bench_search --areas StAndrews,Dundee,Houten --targets 50
+"""
+import argparse
+import json
+import networkx as nx
+import os
+import random
+import time
+from scripts.cache import QueryCache
+from scripts.config import Config
+from scripts.data_fetcher import DataFetcher
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def search_per_target(graph, from_region, targets, weight):
+    dist = float('inf')
+    for target in targets:
+        dist_temp, _ = nx.multi_source_dijkstra(graph, from_region, target=target, weight=weight)
+        dist = min(dist, dist_temp)
+    return dist
+
+
+def benchmark_area(config: Config, cache: QueryCache, offline: bool, n_targets: int):
+    graph = GraphProcessing(Model(DataFetcher(config, cache=cache, offline=offline)))
+    components = graph.preprocessing()
+    region_from, region_to = components[0], components[1]
+    targets = random.Random(0).sample(sorted(region_to), min(n_targets, len(region_to)))
+
+    start = time.perf_counter()
+    dist, _ = graph.shortest_path_overall(region_from, region_to)
+    single_search = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sampled_dist = search_per_target(graph.graph_unfiltered, region_from, targets, 'length')
+    per_target = (time.perf_counter() - start) / len(targets) * len(region_to)
+
+    start = time.perf_counter()
+    graph.shortest_path_existing(region_from, region_to)
+    existing = time.perf_counter() - start
+
+    return {
+        'area': config.area,
+        'nodes': graph.graph_unfiltered.number_of_nodes(),
+        'to_region': len(region_to),
+        'overall_single_search_s': single_search,
+        'overall_per_target_s': per_target,
+        'speedup': per_target / single_search if single_search > 0 else float('inf'),
+        'existing_single_search_s': existing,
+        'distance_consistent': dist <= sampled_dist + 1e-12
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the multi-target shortest path search.')
+    parser.add_argument('--config', type=str, default='configuration.json', help='path to the configuration file')
+    parser.add_argument('--areas', type=str, default='StAndrews,Dundee,Houten', help='comma-separated areas')
+    parser.add_argument('--targets', type=int, default=50, help='targets to time the per-target search on')
+    parser.add_argument('--offline', action='store_true', help='only read Overpass query results from the cache')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, args.config), 'r') as f:
+        config_json = json.load(f)
+    cache = QueryCache(os.path.join(ROOT, 'cache/'))
+
+    results = []
+    for area in args.areas.split(','):
+        result = benchmark_area(Config.from_dict(config_json, area=area), cache, args.offline, args.targets)
+        print(f"{result['area']:>10}: {result['to_region']} targets, single search "
+              f"{result['overall_single_search_s']:.3f}s, per target {result['overall_per_target_s']:.1f}s "
+              f"(x{result['speedup']:.0f})")
+        results.append(result)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,52 @@ import argparse
 import json
 import os
 from scripts.config import Config
-from scripts.data_fetcher import DataFetcher
-from scripts.graph import GraphProcessing
-from scripts.model import Model
+from scripts.pipeline import OUTPUTS, PLOT_FORMATS, format_summary, run_area, run_batch, share_overpass_slots
 
 
 def main():
     parser = argparse.ArgumentParser(description='PICI - A planner for improving cycling infrastructure.')
     parser.add_argument('--config', type=str, default='configuration.json', help='path to the configuration file')
     parser.add_argument('--save', type=str, default='images/', help='save the generated graphs to a directory')
+    parser.add_argument('--cache', type=str, default='cache/', help='directory to cache Overpass query results in')
+    parser.add_argument('--no-cache', action='store_true', help='always query the Overpass server')
+    parser.add_argument('--artifacts', type=str, default='artifacts/',
+                        help='directory to save preprocessed graphs in, to be reused by later runs')
+    parser.add_argument('--no-artifacts', action='store_true', help='always rebuild the graphs')
+    parser.add_argument('--osm-file', type=str, help='read the network from a local OSM extract instead of Overpass')
+    parser.add_argument('--offline', action='store_true', help='only read Overpass query results from the cache')
+    parser.add_argument('--overpass-slots', type=int, default=2,
+                        help='most Overpass queries to run at once, across all areas and tiles')
+    parser.add_argument('--hierarchy', action='store_true',
+                        help='build a contraction hierarchy over the unfiltered graph to answer path queries with')
+    parser.add_argument('--sweep', type=str,
+                        help='comma-separated thresholds to report connectivity for, instead of suggesting paths')
+    parser.add_argument('--connect-all', action='store_true',
+                        help='suggest paths until every component is connected, instead of the strategies')
+    parser.add_argument('--planner', type=str, default='greedy', choices=['greedy', 'mst'],
+                        help='how to pick the paths suggested by --connect-all')
+    parser.add_argument('--budget', type=float, help='maximum length in km of new paths suggested by --connect-all')
+    parser.add_argument('--batch', action='store_true', help='process every area in the configuration file')
+    parser.add_argument('--areas', type=str, help='comma-separated areas to process with --batch')
+    parser.add_argument('--workers', type=int, help='number of worker processes for --batch, --tiles and --serve')
+    parser.add_argument('--tiles', type=str, help='split the bounding box into a grid of tiles, given as rows x cols, '
+                                                  'that are fetched in parallel')
+    parser.add_argument('--update', type=str,
+                        help='apply an osmChange file to the graphs of the last update instead of rebuilding them')
+    parser.add_argument('--format', type=str, default='svg', choices=PLOT_FORMATS,
+                        help='image format of the plots, png plots are simplified to their pixels')
+    parser.add_argument('--no-plot', action='store_true', help='skip drawing the plots')
+    parser.add_argument('--output', type=str, default='text', choices=OUTPUTS,
+                        help='print the components and suggested paths as JSON, and skip the plots')
+    parser.add_argument('--plot-workers', type=int, help='number of worker processes to draw the plots with')
+    parser.add_argument('--profile', action='store_true',
+                        help='report the time, peak memory and counts of every stage, and save them to profile.json')
+    parser.add_argument('--cprofile', type=str,
+                        help='run the given stage, such as preprocessing or paths/centreLocal, under cProfile')
+    parser.add_argument('--serve', action='store_true',
+                        help='keep the graphs of the area loaded and answer path queries over HTTP')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='address for --serve to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port for --serve to listen on')
 
     args = parser.parse_args()
 
@@ -18,41 +55,30 @@ def main():
 
     with open(os.path.join(root, args.config), 'r') as f:
         config_json = json.load(f)
+
+    with share_overpass_slots(args):
+        if args.batch:
+            areas = args.areas.split(',') if args.areas is not None else list(config_json.get('boundingBoxes').keys())
+            summaries = run_batch(config_json, areas, args, root, workers=args.workers)
+            if args.output == 'json':
+                print(json.dumps(summaries))
+            else:
+                print(format_summary(summaries))
+            with open(os.path.join(root, args.save, 'summary.json'), 'w') as f:
+                json.dump(summaries, f, indent=4)
+            return
+
         config = Config.from_dict(config_json)
+        if args.serve:
+            from scripts.server import serve
+            serve(config, args, root)
+            return
 
-    data_fetcher = DataFetcher(config)
-    model = Model(data_fetcher)
-    graph = GraphProcessing(model)
-
-    components = graph.preprocessing()
-    graph.display(filepath=os.path.join(root, args.save, 'cycle_friendly.svg'))
-    graph.display(components, filepath=os.path.join(root, args.save, 'components.svg'))
-
-    if len(components) < 2:
-        print('Graph is fully connected, no paths suggested')
-    else:
-        region_from, region_to = components[0], components[1]
-        strategies = config.strategies
-
-        if strategies.get('overall', False):
-            dist, path = graph.shortest_path_overall(region_from, region_to)
-            graph.display_path_between_subgraph(path, region_from, region_to,
-                                                filepath=os.path.join(root, args.save, 'path_overall.svg'))
-
-        if strategies.get('centreTown', False):
-            dist, path = graph.shortest_path_town_centre(region_from, region_to)
-            graph.display_path_between_subgraph(path, region_from, region_to,
-                                                filepath=os.path.join(root, args.save, 'path_town_centre.svg'))
-
-        if strategies.get('centreLocal', False):
-            dist, path = graph.shortest_path_local_centre(region_from, region_to)
-            graph.display_path_between_subgraph(path, region_from, region_to,
-                                                filepath=os.path.join(root, args.save, 'path_local_centre.svg'))
-
-        if strategies.get('existing', False):
-            dist, path = graph.shortest_path_existing(region_from, region_to)
-            graph.display_path_between_subgraph(path, region_from, region_to,
-                                                filepath=os.path.join(root, args.save, 'path_existing.svg'))
+        save_dir = os.path.join(root, args.save)
+        os.makedirs(save_dir, exist_ok=True)
+        summary = run_area(config, args, root, save_dir)
+        if args.output == 'json':
+            print(json.dumps(summary))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,176 @@
+import dataclasses
+import hashlib
+import json
+import networkx as nx
+import numpy as np
+import os
+import shutil
+import time
+from scipy.sparse import csr_matrix
+from scripts.cache import DEFAULT_TTL
+from scripts.config import Config
+from scripts.csr import CsrGraph
+from scripts.graph import GraphProcessing
+from scripts.hierarchy import ContractionHierarchy
+from typing import Dict, List, Optional, Set, Tuple
+
+ARTIFACT_VERSION = 2
+GRAPHS = ('graph', 'graph_unfiltered')
+
+
+class GraphArtifact:
+    """
+    On-disk store of preprocessed graphs, so that reruns with the same configuration skip fetching, building the model
+    and preprocessing.
+
+    Each artifact is a directory named after a hash of the configuration values that affect the graphs, holding a
+    meta.json file and one .npy file per array: node ids and positions, the CSR adjacency of both graphs over their
+    own nodes, with sorted indices, the length of every edge and whether it links close nodes, the component of every
+    node of the filtered graph, and the contraction hierarchy of the unfiltered graph when one was built.
+    Arrays are memory-mapped when loaded. The csr engine runs on the mapped adjacency arrays as they are, so that they
+    are only read from disk as searches reach them, while the networkx engine builds its graphs from them. Artifacts of
+    another ARTIFACT_VERSION, or written more than ttl seconds ago so that the network may have changed since, are
+    ignored.
+    """
+    def __init__(self, directory: str, ttl: Optional[float] = DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(config: Config, source: str = '') -> str:
+        values = {
+            'version': ARTIFACT_VERSION,
+            'source': source,
+            'area': config.area,
+            'boundingBox': dataclasses.asdict(config.bounding_box),
+            'threshold': config.threshold,
+            'neighbourRadius': config.neighbour_radius,
+            'lengthMethod': config.length_method,
+            'weightedTags': {key: dataclasses.asdict(tag) for key, tag in config.weighted_tags.tags.items()}
+        }
+        return hashlib.sha256(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def path(self, config: Config, source: str = '') -> str:
+        return os.path.join(self.directory, self.key(config, source))
+
+    def save(self, config: Config, graph: GraphProcessing, components: List[Set[int]], source: str = ''):
+        path = self.path(config, source)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, array in self.to_arrays(graph, components).items():
+            np.save(os.path.join(tmp_path, name + '.npy'), array)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({'version': ARTIFACT_VERSION, 'area': config.area, 'centre': list(graph.centre),
+                       'components': len(components)}, f)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    def load(self, config: Config, source: str = '',
+             hierarchy: bool = False) -> Optional[Tuple[GraphProcessing, List[Set[int]]]]:
+        """
+        Load the graphs and components saved for config and source, or None if there are none. The stored contraction
+        hierarchy is only used if hierarchy is set, as with --hierarchy, and is otherwise left unread.
+        """
+        path = self.path(config, source)
+        try:
+            meta_path = os.path.join(path, 'meta.json')
+            if self.ttl is not None and time.time() - os.path.getmtime(meta_path) > self.ttl:
+                return None
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta['version'] != ARTIFACT_VERSION:
+                return None
+            arrays = {name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode='r')
+                      for name in os.listdir(path)
+                      if name.endswith('.npy') and (hierarchy or not name.startswith('hierarchy_'))}
+        except (OSError, ValueError, KeyError):
+            return None
+        return self.from_arrays(config, tuple(meta['centre']), arrays)
+
+    @staticmethod
+    def to_arrays(graph: GraphProcessing, components: List[Set[int]]) -> Dict[str, np.ndarray]:
+        node_ids = np.array(sorted(graph.get_graph('graph_unfiltered')), dtype=np.int64)
+        pos = np.array([graph.layout[node] for node in node_ids.tolist()], dtype=np.float64).reshape(-1, 2)
+        arrays = {'node_ids': node_ids, 'lon': pos[:, 0], 'lat': pos[:, 1]}
+
+        labels = np.full(len(node_ids), -1, dtype=np.int32)
+        for i, component in enumerate(components):
+            labels[np.searchsorted(node_ids, np.fromiter(component, dtype=np.int64))] = i
+        arrays['component'] = labels
+
+        for name in GRAPHS:
+            nodes = GraphArtifact.get_nodes(name, node_ids, labels)
+            edges = list(graph.get_graph(name).edges(data='length'))
+            u = np.searchsorted(nodes, np.array([edge[0] for edge in edges], dtype=np.int64))
+            v = np.searchsorted(nodes, np.array([edge[1] for edge in edges], dtype=np.int64))
+            length = np.array([edge[2] for edge in edges], dtype=np.float64)
+            # Edges that are not in edge_length were added by connect_close_nodes
+            proximity = np.array([(a, b) not in graph.edge_length and (b, a) not in graph.edge_length
+                                  for a, b, _ in edges], dtype=bool)
+            # Both directions of every edge, sorted by both nodes. Indices are int32, as scipy keeps them, so that the
+            # mapped arrays are used without a copy
+            rows, cols = np.concatenate([u, v]), np.concatenate([v, u])
+            order = np.lexsort((cols, rows))
+            indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+            np.cumsum(np.bincount(rows, minlength=len(nodes)), out=indptr[1:])
+            arrays[f'{name}_indptr'] = indptr
+            arrays[f'{name}_indices'] = cols[order].astype(np.int32)
+            arrays[f'{name}_length'] = np.concatenate([length, length])[order]
+            arrays[f'{name}_proximity'] = np.concatenate([proximity, proximity])[order]
+        # The contraction hierarchy is kept with the graph it was built from, and is left out once the graph changed
+        if graph.hierarchy is not None and graph.hierarchy.matches(graph.get_graph('graph_unfiltered')):
+            arrays.update(graph.hierarchy.to_arrays(node_ids))
+        return arrays
+
+    @staticmethod
+    def get_nodes(name: str, node_ids: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """
+        Get the sorted ids of the nodes of a graph, which are those in a component for the filtered graph.
+        """
+        return node_ids if name == 'graph_unfiltered' else node_ids[labels >= 0]
+
+    @staticmethod
+    def from_arrays(config: Config, centre: Tuple[float, float],
+                    arrays: Dict[str, np.ndarray]) -> Tuple[GraphProcessing, List[Set[int]]]:
+        node_ids = arrays['node_ids']
+        node_list = node_ids.tolist()
+        layout = dict(zip(node_list, zip(arrays['lon'].tolist(), arrays['lat'].tolist())))
+        labels = arrays['component']
+
+        graphs = {}
+        edge_length: Dict[Tuple[int, int], float] = {}
+        for name in GRAPHS:
+            ids = GraphArtifact.get_nodes(name, node_ids, labels)
+            indptr, indices = arrays[f'{name}_indptr'], arrays[f'{name}_indices']
+            rows = np.repeat(np.arange(len(ids)), np.diff(indptr))
+            # Every edge is stored in both directions, so keep one of them
+            keep = rows < indices
+            u, v = ids[rows[keep]].tolist(), ids[indices[keep]].tolist()
+            length = arrays[f'{name}_length'][keep].tolist()
+            proximity = arrays[f'{name}_proximity'][keep].tolist()
+            edge_length.update(((a, b), d) for a, b, d, p in zip(u, v, length, proximity) if not p)
+            if config.graph_engine == 'csr':
+                # The arrays are already in CSR form with sorted indices, so the matrix is a view of the mapped arrays
+                matrix = csr_matrix((arrays[f'{name}_length'], indices, indptr), shape=(len(ids), len(ids)), copy=False)
+                matrix.has_sorted_indices = True
+                graphs[name] = CsrGraph(ids, matrix)
+                continue
+            nodes = ids.tolist()
+            g = nx.Graph()
+            g.add_nodes_from(nodes)
+            g.add_weighted_edges_from(zip(u, v, length), weight='length')
+            nx.set_node_attributes(g, {node: layout[node] for node in nodes}, 'pos')
+            graphs[name] = g
+
+        components: List[Set[int]] = [set() for _ in range(int(labels.max(initial=-1)) + 1)]
+        for node, label in zip(node_list, labels.tolist()):
+            if label >= 0:
+                components[label].add(node)
+        graph = GraphProcessing.from_state(config, centre, layout, graphs['graph'], graphs['graph_unfiltered'],
+                                           edge_length)
+        if 'hierarchy_rank' in arrays:
+            graph.hierarchy = ContractionHierarchy.from_arrays(node_ids, arrays)
+            graph.use_hierarchy = True
+        return graph, components
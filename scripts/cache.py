@@ -0,0 +1,83 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_SIZE = 1024 ** 3
+
+
+class QueryCache:
+    """
+    Content-addressed on-disk cache for query results. Entries are keyed by the SHA-256 hash of the query text and
+    expire ttl seconds after they were written. When the total size of the cache exceeds max_size bytes, the oldest
+    entries are evicted first.
+    """
+    extension = '.pickle'
+
+    def __init__(self, directory: str, ttl: Optional[float] = DEFAULT_TTL, max_size: Optional[int] = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(query: str) -> str:
+        return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+    def path(self, query: str) -> str:
+        return os.path.join(self.directory, self.key(query) + self.extension)
+
+    def get(self, query: str, allow_expired: bool = False) -> Optional[Any]:
+        path = self.path(query)
+        try:
+            modified = os.path.getmtime(path)
+            if not allow_expired and self.is_expired(modified):
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, query: str, value: Any):
+        path = self.path(query)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = self.entries()
+        total_size = 0
+        for modified, size, path in sorted(entries, reverse=True):
+            total_size += size
+            if self.is_expired(modified) or (self.max_size is not None and total_size > self.max_size):
+                # Another process sharing the cache may have evicted it already
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.extension):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def is_expired(self, modified: float) -> bool:
+        return self.ttl is not None and time.time() - modified > self.ttl
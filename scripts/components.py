@@ -0,0 +1,152 @@
+import networkx as nx
+from collections import deque
+from itertools import count
+from typing import Collection, Dict, Iterable, List, Set, Tuple
+
+
+def component_order(length: float, nodes: Collection[int]) -> Tuple[float, int]:
+    """
+    Get the key that components are sorted by: longest first, and of components of the same length the one with the
+    least node first.
+    """
+    return -length, min(nodes)
+
+
+class DynamicComponents:
+    """
+    Connected components of a graph that is edited in place, with the total edge length of each component.
+
+    Call add_edge after an edge is added to the graph and remove_edges after edges are removed. Adding an edge between
+    two components relabels the smaller one. Removing edges searches from their end nodes in parallel, one node per
+    search at a time, and stops once all but one search have either met another or run out of nodes. Only the pieces
+    split off are relabelled, so the cost depends on the size of those pieces rather than the size of the graph.
+    """
+    def __init__(self, graph: nx.Graph, weight: str = 'length'):
+        self.graph = graph
+        self.weight = weight
+        self.labels = count()
+        self.component_of: Dict[int, int] = {}
+        self.members: Dict[int, Set[int]] = {}
+        self.length: Dict[int, float] = {}
+        for component in nx.connected_components(graph):
+            label = next(self.labels)
+            self.members[label] = set(component)
+            self.component_of.update(dict.fromkeys(component, label))
+            self.length[label] = 0
+        for u, v, length in graph.edges(data=weight):
+            self.length[self.component_of[u]] += length
+
+    def __len__(self):
+        return len(self.members)
+
+    def add_node(self, node: int):
+        if node not in self.component_of:
+            label = next(self.labels)
+            self.component_of[node] = label
+            self.members[label] = {node}
+            self.length[label] = 0
+
+    def remove_node(self, node: int):
+        """
+        Forget a node that has been removed from the graph, once the edges at it have been passed to remove_edges.
+        """
+        label = self.component_of.pop(node)
+        self.members[label].discard(node)
+        if len(self.members[label]) == 0:
+            del self.members[label], self.length[label]
+
+    def add_edge(self, u: int, v: int, length: float):
+        self.add_node(u)
+        self.add_node(v)
+        label_u, label_v = self.component_of[u], self.component_of[v]
+        if label_u != label_v:
+            if len(self.members[label_u]) < len(self.members[label_v]):
+                label_u, label_v = label_v, label_u
+            for node in self.members[label_v]:
+                self.component_of[node] = label_u
+            self.members[label_u] |= self.members.pop(label_v)
+            self.length[label_u] += self.length.pop(label_v)
+        self.length[label_u] += length
+
+    def change_length(self, u: int, difference: float):
+        self.length[self.component_of[u]] += difference
+
+    def remove_edges(self, edges: Iterable[Tuple[int, int, float]]):
+        """
+        Update the components after the given (u, v, length) edges have been removed from the graph.
+        """
+        seeds: Dict[int, Set[int]] = {}
+        for u, v, length in edges:
+            label = self.component_of[u]
+            self.length[label] -= length
+            seeds.setdefault(label, set()).update(node for node in (u, v) if self.graph.has_node(node))
+        for label, nodes in seeds.items():
+            self.split(label, list(nodes))
+
+    def split(self, label: int, seeds: List[int]):
+        # Each search owns the nodes it has reached, and searches that meet are merged into one
+        owner: Dict[int, int] = {}
+        reached: Dict[int, Set[int]] = {}
+        queue: Dict[int, deque] = {}
+        for i, seed in enumerate(seeds):
+            if seed not in owner:
+                owner[seed] = i
+                reached[i], queue[i] = {seed}, deque([seed])
+
+        def find(i):
+            while owner_of_search[i] != i:
+                i = owner_of_search[i]
+            return i
+
+        owner_of_search = {i: i for i in reached}
+        active = set(reached)
+        while len(active) > 1:
+            for i in list(active):
+                if i not in active:
+                    continue
+                if len(queue[i]) == 0:
+                    # The search ran out of nodes without meeting another, so it found a whole piece
+                    active.remove(i)
+                    self.relabel(label, reached.pop(i))
+                    if len(active) == 1:
+                        break
+                    continue
+                node = queue[i].popleft()
+                for neighbour in self.graph.adj[node]:
+                    j = owner.get(neighbour)
+                    if j is None:
+                        owner[neighbour] = i
+                        reached[i].add(neighbour)
+                        queue[i].append(neighbour)
+                        continue
+                    j = find(j)
+                    if j != i:
+                        if len(reached[i]) < len(reached[j]):
+                            i, j = j, i
+                        reached[i] |= reached.pop(j)
+                        queue[i].extend(queue.pop(j))
+                        owner_of_search[j] = i
+                        active.discard(j)
+                        if len(active) == 1:
+                            break
+                if len(active) == 1:
+                    break
+
+    def relabel(self, label: int, piece: Set[int]):
+        new_label = next(self.labels)
+        self.members[label] -= piece
+        self.members[new_label] = piece
+        for node in piece:
+            self.component_of[node] = new_label
+        length = sum(data.get(self.weight, 0) for node in piece for _, _, data in self.graph.edges(node, data=True)) / 2
+        self.length[label] -= length
+        self.length[new_label] = length
+        if len(self.members[label]) == 0:
+            del self.members[label], self.length[label]
+
+    def get_components(self) -> List[Set[int]]:
+        """
+        Get the components in the order of component_order, as from GraphProcessing.preprocessing.
+        """
+        labels = sorted(self.members, key=lambda label: component_order(self.length[label], self.members[label]))
+        return [self.members[label] for label in labels]
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from scripts.exception import AreaNotDefinedException
-from typing import Dict
+from scripts.geodesic import degrees_to_metres
+from typing import Dict, List, Optional, Tuple
 
 TAG_MAPPINGS = {
     'cycleway:right': 'cycleway',
@@ -27,6 +28,9 @@ class BoundingBox:
             east=data['east']
         )
 
+    def contains(self, lon: float, lat: float) -> bool:
+        return (lon <= self.east) and (lon >= self.west) and (lat >= self.south) and (lat <= self.north)
+
 
 @dataclass
 class Tag:
@@ -58,6 +62,46 @@ class WeightedTags:
     def weight_sum(self):
         return sum([tag.weight for tag in self.tags.values()])
 
+    def compile(self) -> 'CompiledTags':
+        return CompiledTags(self)
+
+
+class CompiledTags:
+    """
+    Flat lookup tables for scoring ways against WeightedTags. Tag aliases in TAG_MAPPINGS are resolved, each value is
+    mapped straight to its weighted score and the maxspeed ranges are parsed once.
+    """
+    def __init__(self, weighted_tags: WeightedTags):
+        self.max_score = weighted_tags.weight_sum()
+        self.scores: Dict[str, Dict[str, float]] = {}
+        for key in list(weighted_tags.tags.keys()) + list(TAG_MAPPINGS.keys()):
+            tag = weighted_tags[key]
+            if key != 'maxspeed' and len(tag.values) > 0:
+                self.scores[key] = {value: tag.weight * score for value, score in tag.values.items()}
+        maxspeed = weighted_tags['maxspeed']
+        self.speed_ranges: List[Tuple[int, int, float]] = []
+        for m_key, m_value in maxspeed.values.items():
+            m_range = m_key.split(',')
+            self.speed_ranges.append((int(m_range[0]), int(m_range[1]), maxspeed.weight * m_value))
+
+    def score(self, tags: Dict[str, str]) -> float:
+        score = 0
+        for tag_key, tag_value in tags.items():
+            if tag_key == 'maxspeed':
+                score += self.speed_score(tag_value)
+            else:
+                score += self.scores.get(tag_key, {}).get(tag_value, 0)
+        return score / self.max_score
+
+    def speed_score(self, value: str) -> float:
+        if len(self.speed_ranges) == 0:
+            return 0
+        speed = int(value.split(' ')[0])
+        for start, end, score in self.speed_ranges:
+            if start < speed <= end:
+                return score
+        return 0
+
 
 @dataclass
 class Config:
@@ -67,6 +111,15 @@ class Config:
     strategies: Dict[str, bool]
     bounding_box: BoundingBox
     weighted_tags: WeightedTags
+    length_method: str = 'ellipsoidal'
+    centre_method: str = 'sweep'
+    neighbour_radius: Optional[float] = None
+    graph_engine: str = 'networkx'
+
+    def __post_init__(self):
+        # neighbourEps is in degrees, so without neighbourRadius the radius is that many degrees of latitude
+        if self.neighbour_radius is None and self.neighbour_eps is not None:
+            self.neighbour_radius = degrees_to_metres(self.neighbour_eps)
 
     @classmethod
     def from_dict(cls, data, area=None):
@@ -81,5 +134,9 @@ class Config:
             neighbour_eps=data.get('neighbourEps'),
             strategies=data.get('strategies'),
             bounding_box=BoundingBox.from_dict(data.get('boundingBoxes').get(area)),
-            weighted_tags=WeightedTags(data.get('weightedTags'))
+            weighted_tags=WeightedTags(data.get('weightedTags')),
+            length_method=data.get('lengthMethod', 'ellipsoidal'),
+            centre_method=data.get('centreMethod', 'sweep'),
+            neighbour_radius=data.get('neighbourRadius'),
+            graph_engine=data.get('graphEngine', 'networkx')
         )
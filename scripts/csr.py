@@ -0,0 +1,217 @@
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scripts import profiler
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class CsrGraph:
+    """
+    Undirected graph with a length on every edge, held as a symmetric scipy CSR matrix over the positions of its nodes
+    in the sorted array node_ids, so that components and shortest paths run in scipy.sparse.csgraph. Every edge is
+    stored in both directions. Lengths of zero are kept as explicit entries, which csgraph treats as edges.
+
+    It has the read-only part of the nx.Graph interface that the artifacts and the contraction hierarchy use, which
+    are the numbers of nodes and edges, iterating over the nodes and edges(data=...). Adding edges builds a new graph.
+    """
+    def __init__(self, node_ids: np.ndarray, matrix: csr_matrix):
+        self.node_ids = node_ids
+        self.matrix = matrix
+
+    @classmethod
+    def from_edges(cls, node_ids: np.ndarray, u: np.ndarray, v: np.ndarray, length: np.ndarray) -> 'CsrGraph':
+        """
+        Build a graph over the sorted node_ids from the ids at both ends of every edge and its length. Of parallel
+        edges, the last one is kept, as nx.Graph does.
+        """
+        n = len(node_ids)
+        rows, cols = np.searchsorted(node_ids, u), np.searchsorted(node_ids, v)
+        # Both directions of each edge are next to each other, so that a stable sort keeps the edges in order
+        r = np.stack([rows, cols], axis=1).ravel()
+        c = np.stack([cols, rows], axis=1).ravel()
+        d = np.repeat(np.asarray(length, dtype=np.float64), 2)
+        key = r.astype(np.int64) * n + c
+        order = np.argsort(key, kind='stable')
+        key, r, c, d = key[order], r[order], c[order], d[order]
+        last = np.append(key[1:] != key[:-1], True)
+        r, c, d = r[last], c[last], d[last]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(r, minlength=n), out=indptr[1:])
+        return cls(node_ids, csr_matrix((d, c.astype(np.int32), indptr), shape=(n, n)))
+
+    @classmethod
+    def from_adj_list(cls, adj_list: Dict[int, List[int]],
+                      edge_length: Dict[Tuple[int, int], float]) -> 'CsrGraph':
+        node_ids = np.array(sorted(adj_list), dtype=np.int64)
+        edges = [(u, v) for u, neighbours in adj_list.items() for v in neighbours]
+        length = [edge_length[edge] if edge in edge_length else edge_length[(edge[1], edge[0])] for edge in edges]
+        u = np.array([edge[0] for edge in edges], dtype=np.int64)
+        v = np.array([edge[1] for edge in edges], dtype=np.int64)
+        return cls.from_edges(node_ids, u, v, np.array(length, dtype=np.float64))
+
+    @classmethod
+    def from_networkx(cls, graph: nx.Graph, weight: str = 'length') -> 'CsrGraph':
+        node_ids = np.array(sorted(graph.nodes), dtype=np.int64)
+        u, v, length = zip(*graph.edges(data=weight)) if graph.number_of_edges() > 0 else ((), (), ())
+        return cls.from_edges(node_ids, np.array(u, dtype=np.int64), np.array(v, dtype=np.int64),
+                              np.array(length, dtype=np.float64))
+
+    def to_networkx(self, weight: str = 'length') -> nx.Graph:
+        graph = nx.Graph()
+        graph.add_nodes_from(self.node_ids.tolist())
+        u, v, length = self.get_edge_arrays()
+        graph.add_weighted_edges_from(zip(u.tolist(), v.tolist(), length.tolist()), weight=weight)
+        return graph
+
+    def get_edge_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the ids at both ends and the length of every edge, each edge once.
+        """
+        rows = np.repeat(np.arange(len(self.node_ids)), np.diff(self.matrix.indptr))
+        keep = rows <= self.matrix.indices
+        return self.node_ids[rows[keep]], self.node_ids[self.matrix.indices[keep]], self.matrix.data[keep]
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        rows = np.repeat(np.arange(len(self.node_ids)), np.diff(self.matrix.indptr))
+        return int(np.count_nonzero(rows <= self.matrix.indices))
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.node_ids.tolist())
+
+    def edges(self, data: Optional[str] = None) -> List[tuple]:
+        u, v, length = self.get_edge_arrays()
+        if data is None:
+            return list(zip(u.tolist(), v.tolist()))
+        return list(zip(u.tolist(), v.tolist(), length.tolist()))
+
+    def index(self, nodes: Iterable[int]) -> np.ndarray:
+        """
+        Get the positions of nodes in node_ids, raising nx.NodeNotFound for nodes that are not in the graph.
+        """
+        nodes = np.fromiter(nodes, dtype=np.int64)
+        index = np.searchsorted(self.node_ids, nodes)
+        missing = (index >= len(self.node_ids)) | (self.node_ids[np.minimum(index, len(self.node_ids) - 1)] != nodes)
+        if len(self.node_ids) == 0 or missing.any():
+            raise nx.NodeNotFound(f'Nodes {nodes[missing].tolist()} are not in the graph')
+        return index
+
+    def has_edges(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        Check which of the edges between the node ids in u and v are in the graph.
+        """
+        n = len(self.node_ids)
+        if n == 0:
+            return np.zeros(len(u), dtype=bool)
+        rows, cols = (np.minimum(np.searchsorted(self.node_ids, ids), n - 1) for ids in (u, v))
+        member = (self.node_ids[rows] == u) & (self.node_ids[cols] == v)
+        keys = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.matrix.indptr)) * n + self.matrix.indices
+        return member & np.isin(rows.astype(np.int64) * n + cols, keys)
+
+    def get_lengths(self, edges: List[Tuple[int, int]]) -> np.ndarray:
+        """
+        Get the lengths of edges of the graph.
+        """
+        if len(edges) == 0:
+            return np.zeros(0, dtype=np.float64)
+        rows, cols = self.index(u for u, _ in edges), self.index(v for _, v in edges)
+        return np.asarray(self.matrix[rows, cols], dtype=np.float64).ravel()
+
+    def add_edges(self, edges: List[Tuple[int, int, float]]) -> 'CsrGraph':
+        if len(edges) == 0:
+            return self
+        u, v, length = self.get_edge_arrays()
+        new_u, new_v, new_length = (np.array(values) for values in zip(*edges))
+        return CsrGraph.from_edges(self.node_ids, np.concatenate([u, new_u.astype(np.int64)]),
+                                   np.concatenate([v, new_v.astype(np.int64)]), np.concatenate([length, new_length]))
+
+    def with_lengths(self, lengths: np.ndarray) -> 'CsrGraph':
+        """
+        Get the graph with the same edges and other lengths, given for every stored entry of the matrix.
+        """
+        matrix = csr_matrix((lengths, self.matrix.indices, self.matrix.indptr), shape=self.matrix.shape)
+        return CsrGraph(self.node_ids, matrix)
+
+    def subgraph(self, nodes: Collection[int]) -> 'CsrGraph':
+        index = np.sort(self.index(nodes))
+        return CsrGraph(self.node_ids[index], self.matrix[index][:, index])
+
+    def connected_components(self) -> Tuple[List[np.ndarray], np.ndarray]:
+        """
+        Get the ids of the nodes of every component, and the total length of the edges in each of them.
+        """
+        n, labels = connected_components(self.matrix, directed=False)
+        rows = np.repeat(np.arange(len(self.node_ids)), np.diff(self.matrix.indptr))
+        # Both ends of an edge lie in the same component, so each edge is counted in the direction from its lower end
+        once = rows <= self.matrix.indices
+        lengths = np.bincount(labels[rows[once]], weights=self.matrix.data[once], minlength=n)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.cumsum(np.bincount(labels, minlength=n))[:-1]
+        return np.split(self.node_ids[order], bounds), lengths
+
+    def get_component_labels(self) -> Dict[int, int]:
+        _, labels = connected_components(self.matrix, directed=False)
+        return dict(zip(self.node_ids.tolist(), labels.tolist()))
+
+    def shortest_path(self, sources: Collection[int], targets: Collection[int]) -> Tuple[float, List[int]]:
+        """
+        Find the shortest path from any node in sources to any node in targets, as DijkstraTree.nearest does.
+        Of targets at the same least distance, the one with the least id is taken.
+        """
+        return self.shortest_path_tree(sources).nearest(targets)
+
+    def shortest_path_tree(self, sources: Collection[int]) -> 'CsrPathTree':
+        """
+        Get the shortest path tree from the nodes in sources to every node, from a single csgraph search.
+        """
+        profiler.count('dijkstra_runs')
+        dist, pred, _ = dijkstra(self.matrix, directed=False, indices=self.index(sources), min_only=True,
+                                 return_predecessors=True)
+        return CsrPathTree(self, dist, pred)
+
+    def lengths_from(self, source: int) -> Dict[int, float]:
+        """
+        Get the lengths of the shortest paths from source to every node it reaches.
+        """
+        dist = dijkstra(self.matrix, directed=False, indices=int(self.index([source])[0]))
+        reached = np.isfinite(dist)
+        return dict(zip(self.node_ids[reached].tolist(), dist[reached].tolist()))
+
+    def center(self) -> int:
+        """
+        Get the node of least eccentricity of a connected graph, the one with the least id of several.
+        """
+        return int(self.node_ids[np.argmin(dijkstra(self.matrix, directed=False).max(axis=1))])
+
+
+class CsrPathTree:
+    """
+    Shortest path tree of a CsrGraph from a set of sources, as the distance to and the predecessor of every node, of
+    which paths to any targets are read without searching again.
+    """
+    def __init__(self, graph: CsrGraph, dist: np.ndarray, pred: np.ndarray):
+        self.graph = graph
+        self.dist = dist
+        self.pred = pred
+
+    def nearest(self, targets: Collection[int]) -> Tuple[float, List[int]]:
+        """
+        Find the shortest path to any node in targets, of several at the same least distance the one with the least
+        id.
+        """
+        target_index = np.sort(self.graph.index(targets))
+        target_dist = self.dist[target_index]
+        if len(target_index) == 0 or not np.isfinite(target_dist.min()):
+            raise nx.NetworkXNoPath('No path between the source and target regions')
+        node = int(target_index[np.argmin(target_dist)])
+        path = [node]
+        while self.pred[node] >= 0:
+            node = int(self.pred[node])
+            path.append(node)
+        return float(self.dist[path[0]]), self.graph.node_ids[path[::-1]].tolist()
@@ -1,14 +1,61 @@
 import overpy
-from scripts.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from scripts.cache import QueryCache
+from scripts.config import BoundingBox, Config
+from scripts.exception import CacheMissException
+from scripts.overpass import DEFAULT_SLOTS, get_client
 from typing import Dict, List, Tuple
 
+RESOLVE_CHUNK_SIZE = 500
+
+
+class CachedOverpass:
+    """
+    Wrapper around overpy.Overpass that serves query results from a QueryCache. In offline mode, a query that is not
+    in the cache raises CacheMissException instead of being sent to the Overpass server.
+    """
+    def __init__(self, api: overpy.Overpass, cache: QueryCache, offline: bool = False):
+        self.api = api
+        self.cache = cache
+        self.offline = offline
+
+    def query(self, query: str) -> overpy.Result:
+        key = f'{self.api.url}\n{query}'
+        result = self.cache.get(key, allow_expired=self.offline)
+        if result is None:
+            if self.offline:
+                raise CacheMissException(f"No cached result for query '{query}'")
+            result = self.api.query(query)
+            result.api = None
+            self.cache.put(key, result)
+        # Missing elements are resolved through result.api, so route those queries through the cache as well.
+        result.api = self
+        return result
+
 
 class DataFetcher:
-    def __init__(self, config: Config):
-        api = overpy.Overpass()
+    """
+    Data source querying the Overpass server for the nodes and ways in the bounding box of config. Ways keep their
+    nodes that lie in area, which is the bounding box unless given, so that a box can be fetched as a tile of a larger
+    area. Queries are sent through api, which is the OverpassClient of the process unless given.
+    """
+    highways_only = False
 
+    def __init__(self, config: Config, cache: QueryCache = None, offline: bool = False, area: BoundingBox = None,
+                 api: overpy.Overpass = None):
+        if api is None:
+            api = get_client()
+        # Missing nodes are resolved by as many queries at once as the client has slots
+        self.slots = getattr(api, 'slots', DEFAULT_SLOTS)
+        if cache is not None:
+            api = CachedOverpass(api, cache, offline=offline)
+        elif offline:
+            raise CacheMissException("Offline mode requires a query cache")
+
+        self.api = api
         self.config = config
         self.box = config.bounding_box
+        self.area = area if area is not None else self.box
         self.result = api.query(f"nwr({self.box.south}, {self.box.west}, {self.box.north}, {self.box.east}); out;")
         self.centre = api.query(f"node({self.box.node_id}); out;")
 
@@ -20,6 +67,7 @@ class DataFetcher:
         return node_pos
 
     def get_nodes_on_ways(self) -> Dict[int, List[overpy.Node]]:
+        self.resolve_missing_nodes()
         mapping: Dict[int, List[overpy.Node]] = {}
         for way in self.result.ways:
             nodes = way.get_nodes(resolve_missing=True)
@@ -27,6 +75,29 @@ class DataFetcher:
             mapping[way.id] = nodes
         return mapping
 
+    def resolve_missing_nodes(self):
+        """
+        Fetch the nodes of all ways that reference nodes outside the query result, in chunks of RESOLVE_CHUNK_SIZE
+        ways per query, instead of letting overpy resolve each way with its own query. The chunks are queried
+        concurrently, as far as the slots of the client allow.
+        """
+        incomplete_ways = []
+        for way in self.result.ways:
+            try:
+                way.get_nodes()
+            except overpy.exception.DataIncomplete:
+                incomplete_ways.append(way.id)
+        queries = []
+        for i in range(0, len(incomplete_ways), RESOLVE_CHUNK_SIZE):
+            way_ids = ','.join(str(way_id) for way_id in incomplete_ways[i:i + RESOLVE_CHUNK_SIZE])
+            queries.append(f"way(id:{way_ids}); node(w); out;")
+        if len(queries) == 0:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.slots, len(queries))) as executor:
+            # Results are expanded in the order of the chunks, on this thread only
+            for result in executor.map(self.api.query, queries):
+                self.result.expand(result)
+
     def get_ways(self) -> List[overpy.Way]:
         return self.result.ways
 
@@ -34,5 +105,4 @@ class DataFetcher:
         return float(self.centre.nodes[0].lon), float(self.centre.nodes[0].lat)
 
     def node_in_area(self, node: overpy.Node) -> bool:
-        lon, lat = float(node.lon), float(node.lat)
-        return (lon <= self.box.east) and (lon >= self.box.west) and (lat >= self.box.south) and (lat <= self.box.north)
+        return self.area.contains(float(node.lon), float(node.lat))
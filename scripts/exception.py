@@ -1,2 +1,10 @@
 class AreaNotDefinedException(Exception):
     pass
+
+
+class CacheMissException(Exception):
+    pass
+
+
+class NodeNotFoundException(Exception):
+    pass
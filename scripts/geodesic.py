@@ -0,0 +1,96 @@
+import math
+import numpy as np
+from typing import Callable
+
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+MEAN_RADIUS = 6371.0088
+# Least radius of curvature of the ellipsoid, that of the meridian at the equator, so that great-circle distances on a
+# sphere of this radius never exceed geodesics on the ellipsoid
+MIN_RADIUS = WGS84_A * (1 - WGS84_F) ** 2
+EARTH_RADIUS_M = MEAN_RADIUS * 1000
+
+METHODS = ('ellipsoidal', 'haversine')
+
+
+def degrees_to_metres(degrees: float) -> float:
+    """
+    Convert an angle in degrees of latitude into a distance in metres along a meridian.
+    """
+    return float(np.radians(degrees)) * EARTH_RADIUS_M
+
+
+def geodesic_lengths(lon1, lat1, lon2, lat2, method: str = 'ellipsoidal') -> np.ndarray:
+    """
+    Compute the lengths in km of the geodesics between arrays of points given in degrees.
+
+    The ellipsoidal method solves the inverse problem on the WGS-84 ellipsoid with Vincenty's formulae and agrees with
+    geopy.distance.distance to within 1 mm for points less than 1000 km apart. The haversine method assumes a
+    spherical earth of mean radius, which is faster but off by up to 0.6%.
+    """
+    if method == 'ellipsoidal':
+        return vincenty(lon1, lat1, lon2, lat2)
+    if method == 'haversine':
+        return haversine(lon1, lat1, lon2, lat2)
+    raise ValueError(f"Unknown length method '{method}', expected one of {METHODS}")
+
+
+def distance_bound_to(lon: float, lat: float, method: str = 'ellipsoidal') -> Callable[[float, float], float]:
+    """
+    Get a function giving a lower bound in km of the length computed by geodesic_lengths with method from a point to
+    the point at lon, lat, all in degrees, which is the great-circle distance on a sphere no larger than the earth. As
+    the bound of every edge is at most its length, the bound between two nodes is at most the length of any path
+    between them. The function is called for every node a search reaches, so it only takes scalars.
+    """
+    # Scaled down slightly so that rounding never lifts the bound above a haversine length
+    diameter = 2 * (MEAN_RADIUS if method == 'haversine' else MIN_RADIUS) * (1 - 1e-9)
+    lon0, lat0 = math.radians(lon), math.radians(lat)
+    cos_lat0 = math.cos(lat0)
+    sin, cos, radians = math.sin, math.cos, math.radians
+
+    def bound(lon: float, lat: float) -> float:
+        lat = radians(lat)
+        h = sin((lat - lat0) / 2) ** 2 + cos_lat0 * cos(lat) * sin((radians(lon) - lon0) / 2) ** 2
+        return diameter * math.asin(math.sqrt(min(h, 1.0)))
+
+    return bound
+
+
+def haversine(lon1, lat1, lon2, lat2, radius: float = MEAN_RADIUS) -> np.ndarray:
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lon1, lat1, lon2, lat2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * radius * np.arcsin(np.sqrt(np.minimum(h, 1)))
+
+
+def vincenty(lon1, lat1, lon2, lat2, max_iter: int = 200, tol: float = 1e-12) -> np.ndarray:
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lon1, lat1, lon2, lat2))
+    f = WGS84_F
+    u1, u2 = np.arctan((1 - f) * np.tan(lat1)), np.arctan((1 - f) * np.tan(lat2))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+
+    diff_lon = lon2 - lon1
+    lam = diff_lon
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = diff_lon + (1 - c) * f * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            if np.all(np.abs(lam - lam_prev) < tol):
+                break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    return WGS84_B * a * (sigma - delta_sigma)
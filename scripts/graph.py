@@ -1,162 +1,461 @@
-import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
-from geopy import distance
-from matplotlib import colormaps
+from functools import partial
+from itertools import chain
+from scipy.spatial import cKDTree
+from scripts import profiler
+from scripts.components import component_order
+from scripts.config import Config
+from scripts.csr import CsrGraph
+from scripts.geodesic import distance_bound_to, geodesic_lengths
+from scripts.hierarchy import ContractionHierarchy
 from scripts.model import Model
-from typing import Dict, List, Set, Tuple
+from scripts.search import Weight, bidirectional_astar
+from scripts.spatial import SpatialIndex
+from scripts.trees import PathTrees
+from typing import TYPE_CHECKING, Callable, Collection, Dict, List, Optional, Set, Tuple, Union
+
+if TYPE_CHECKING:
+    from scripts.render import GraphRenderer, Layer
+
+CENTRE_METHODS = ('exact', 'sweep', 'medoid')
+CENTRE_SWEEPS = 5
+GRAPH_ENGINES = ('networkx', 'csr')
 
 
 class GraphProcessing:
+    """
+    The filtered and unfiltered graphs of an area, and the searches the strategies run on them, with the engine set by
+    graphEngine:
+
+    networkx: the graphs are nx.Graph objects, searched in Python.
+    csr: the graphs are CsrGraph arrays, and components and shortest paths run in scipy.sparse.csgraph. The nx.Graph
+        objects that other modules use, such as the renderer, the planner and the updater, are only built when first
+        asked for. Code changing them in place must call invalidate, so that the CSR graphs are built from them again.
+    """
     def __init__(self, model: Model):
         self.model = model
         self.config = model.config
         self.centre = model.centre
+        self.engine = self.get_engine(self.config)
 
-        adj_list_unfiltered = self.model.get_adj_list(threshold=0)
-        adj_list = self.model.get_adj_list()
+        with profiler.stage('adj_list'):
+            adj_list_unfiltered = self.model.get_adj_list(threshold=0)
+            adj_list = self.model.get_adj_list()
 
         self.layout = self.model.get_node_pos(adj_list_unfiltered)
+        self.index = SpatialIndex(self.layout)
+        self.close_pairs = None
+        self.hierarchy: Optional[ContractionHierarchy] = None
+        self.use_hierarchy = False
+        self.graphs: Dict[str, Optional[nx.Graph]] = {'graph': None, 'graph_unfiltered': None}
+        self.csr: Dict[str, Optional[CsrGraph]] = {'graph': None, 'graph_unfiltered': None}
+
+        if self.engine == 'csr':
+            edges = self.get_adj_edges(adj_list_unfiltered)
+            unfiltered_edges = set(edges)
+            edges += [(u, v) for u, v in self.get_adj_edges(adj_list)
+                      if (u, v) not in unfiltered_edges and (v, u) not in unfiltered_edges]
+        else:
+            self.graph_unfiltered = nx.Graph(adj_list_unfiltered)
+            self.graph = nx.Graph(adj_list)
+            # Filtered edges skip nodes that only join ways below the threshold, so they are not all unfiltered edges
+            edges = list(self.graph_unfiltered.edges)
+            edges += [edge for edge in self.graph.edges if not self.graph_unfiltered.has_edge(*edge)]
+        profiler.count('edges', len(edges))
+        with profiler.stage('edge_lengths'):
+            self.edge_length = dict(zip(edges, self.get_edge_lengths(edges)))
+        if self.engine == 'csr':
+            self.csr['graph_unfiltered'] = CsrGraph.from_adj_list(adj_list_unfiltered, self.edge_length)
+            self.csr['graph'] = CsrGraph.from_adj_list(adj_list, self.edge_length)
+
+    @classmethod
+    def from_state(cls, config: Config, centre: Tuple[float, float], layout: Dict[int, Tuple[float, float]],
+                   graph: Union[nx.Graph, CsrGraph], graph_unfiltered: Union[nx.Graph, CsrGraph],
+                   edge_length: Dict[Tuple[int, int], float]) -> 'GraphProcessing':
+        """
+        Restore preprocessed graphs without a model, for example from a GraphArtifact. Methods that need the model,
+        such as the threshold sweep, are not available. The graphs may be given as nx.Graph or CsrGraph objects with
+        either engine.
+        """
+        self = cls.__new__(cls)
+        self.model = None
+        self.config = config
+        self.centre = centre
+        self.layout = layout
+        self.index = SpatialIndex(layout)
+        self.close_pairs = None
+        self.hierarchy = None
+        self.use_hierarchy = False
+        self.engine = cls.get_engine(config)
+        self.graphs = {'graph': None, 'graph_unfiltered': None}
+        self.csr = {'graph': None, 'graph_unfiltered': None}
+        for name, g in (('graph', graph), ('graph_unfiltered', graph_unfiltered)):
+            if isinstance(g, CsrGraph):
+                self.csr[name] = g
+            else:
+                self.graphs[name] = g
+        self.edge_length = edge_length
+        return self
+
+    @staticmethod
+    def get_engine(config: Config) -> str:
+        if config.graph_engine not in GRAPH_ENGINES:
+            raise ValueError(f"Unknown graph engine '{config.graph_engine}', expected one of {GRAPH_ENGINES}")
+        return config.graph_engine
+
+    @staticmethod
+    def get_adj_edges(adj_list: Dict[int, List[int]]) -> List[Tuple[int, int]]:
+        """
+        Get every edge of an adjacency list once, from the end nx.Graph(adj_list) adds first, as its edges are. The
+        ellipsoidal lengths differ in the last digits between the two directions of an edge.
+        """
+        order = {node: i for i, node in enumerate(dict.fromkeys(chain(adj_list, chain(*adj_list.values()))))}
+        return list(dict.fromkeys((u, v) if order[u] <= order[v] else (v, u)
+                                  for u, neighbours in adj_list.items() for v in neighbours))
+
+    @property
+    def graph(self) -> nx.Graph:
+        return self.get_networkx('graph')
+
+    @graph.setter
+    def graph(self, graph: nx.Graph):
+        self.graphs['graph'], self.csr['graph'] = graph, None
+
+    @property
+    def graph_unfiltered(self) -> nx.Graph:
+        return self.get_networkx('graph_unfiltered')
 
-        self.graph_unfiltered = nx.Graph(adj_list_unfiltered)
-        self.graph = nx.Graph(adj_list)
+    @graph_unfiltered.setter
+    def graph_unfiltered(self, graph: nx.Graph):
+        self.graphs['graph_unfiltered'], self.csr['graph_unfiltered'] = graph, None
 
-        self.edge_length = {edge: self.get_edge_length(edge) for edge in self.graph_unfiltered.edges}
+    def get_networkx(self, name: str) -> nx.Graph:
+        if self.graphs[name] is None:
+            graph = self.csr[name].to_networkx()
+            nx.set_node_attributes(graph, {node: self.layout[node] for node in graph}, 'pos')
+            self.graphs[name] = graph
+        return self.graphs[name]
+
+    def get_csr(self, name: str) -> CsrGraph:
+        if self.csr[name] is None:
+            self.csr[name] = CsrGraph.from_networkx(self.graphs[name])
+        return self.csr[name]
+
+    def get_graph(self, name: str) -> Union[nx.Graph, CsrGraph]:
+        """
+        Get the graph 'graph' or 'graph_unfiltered' in the form the engine searches, without building the other one.
+        """
+        return self.get_csr(name) if self.engine == 'csr' else self.get_networkx(name)
+
+    def invalidate(self):
+        """
+        Drop what was derived from the graphs after they changed: the contraction hierarchy, and the CSR graphs built
+        from nx.Graph objects that may have been changed in place.
+        """
+        self.hierarchy = None
+        for name, graph in self.graphs.items():
+            if graph is not None:
+                self.csr[name] = None
 
     def preprocessing(self):
-        nx.set_node_attributes(self.graph_unfiltered, self.layout, 'pos')
-        nx.set_edge_attributes(self.graph_unfiltered, self.edge_length, 'length')
-        nx.set_node_attributes(self.graph, self.layout, 'pos')
-        nx.set_edge_attributes(self.graph, self.edge_length, 'length')
-        self.connect_close_nodes()
-        sorted_groups = self.get_connected_components(self.graph)
+        # The CSR graphs hold their lengths from the start
+        if self.engine == 'networkx':
+            nx.set_node_attributes(self.graph_unfiltered, self.layout, 'pos')
+            nx.set_edge_attributes(self.graph_unfiltered, self.edge_length, 'length')
+            nx.set_node_attributes(self.graph, self.layout, 'pos')
+            nx.set_edge_attributes(self.graph, self.edge_length, 'length')
+        with profiler.stage('connect_close_nodes'):
+            self.connect_close_nodes()
+        with profiler.stage('components'):
+            sorted_groups = self.get_connected_components(self.get_graph('graph'))
+        profiler.count('components', len(sorted_groups))
         return sorted_groups
 
-    def shortest_path_overall(self, from_region: Set[int], to_region: Set[int]):
+    def shortest_path_overall(self, from_region: Set[int], to_region: Set[int], trees: Optional[PathTrees] = None):
         """
-        Find the shortest path between any node in from_region and any node in to_region.
+        Find the shortest path between any node in from_region and any node in to_region. The search from from_region
+        is kept in trees, when given, for other paths from it.
         """
-        dist = float('inf')
-        shortest_path = []
-        for target in to_region:
-            dist_temp, path = nx.multi_source_dijkstra(self.graph_unfiltered, from_region, target=target,
-                                                       weight='length')
-            if dist_temp < dist:
-                dist = dist_temp
-                shortest_path = path
+        hierarchy = self.get_hierarchy()
+        if hierarchy is not None:
+            dist, shortest_path = hierarchy.query(from_region, to_region)
+        else:
+            trees = trees if trees is not None else PathTrees(self)
+            dist, shortest_path = trees.nearest('length', from_region, to_region)
         shortest_path_edges = [(shortest_path[i], shortest_path[i + 1]) for i in range(len(shortest_path) - 1)]
         return dist, shortest_path_edges
 
-    def shortest_path_town_centre(self, from_region: Set[int], to_region: Set[int]):
+    def shortest_path_town_centre(self, from_region: Set[int], to_region: Set[int],
+                                  trees: Optional[PathTrees] = None):
         """
         Find the shortest path between the central node in from_region and the central node in to_region,
         where the central node in a region is the node nearest to the centre of the town.
         """
-        node_from = min(from_region, key=lambda n: self.get_geodesic_distance(self.layout[n], self.centre))
-        node_to = min(to_region, key=lambda n: self.get_geodesic_distance(self.layout[n], self.centre))
-        dist, shortest_path = nx.single_source_dijkstra(self.graph_unfiltered, node_from, node_to, weight='length')
+        node_from = self.index.nearest(self.centre, from_region)
+        node_to = self.index.nearest(self.centre, to_region)
+        dist, shortest_path = self.get_centre_path(node_from, node_to, trees)
         shortest_path_edges = [(shortest_path[i], shortest_path[i + 1]) for i in range(len(shortest_path) - 1)]
         path = self.trim_path(shortest_path_edges, from_region, to_region)
         return self.get_path_length(path), path
 
-    def shortest_path_local_centre(self, from_region: Set[int], to_region: Set[int]):
+    def shortest_path_local_centre(self, from_region: Set[int], to_region: Set[int],
+                                   trees: Optional[PathTrees] = None):
         """
         Find the shortest path between the central node in from_region and the central node in to_region,
         where the central node in a region is the node nearest to the centre of the region.
         """
-        centre_from, centre_to = self.get_centre_of_nodes(from_region), self.get_centre_of_nodes(to_region)
-        node_from = min(from_region, key=lambda n: self.get_geodesic_distance(self.layout[n], centre_from))
-        node_to = min(to_region, key=lambda n: self.get_geodesic_distance(self.layout[n], centre_to))
-        dist, shortest_path = nx.single_source_dijkstra(self.graph_unfiltered, node_from, node_to, weight='length')
+        with profiler.stage('centre'):
+            centre_from, centre_to = self.get_centre_of_nodes(from_region), self.get_centre_of_nodes(to_region)
+        node_from = self.index.nearest(centre_from, from_region)
+        node_to = self.index.nearest(centre_to, to_region)
+        dist, shortest_path = self.get_centre_path(node_from, node_to, trees)
         shortest_path_edges = [(shortest_path[i], shortest_path[i + 1]) for i in range(len(shortest_path) - 1)]
         path = self.trim_path(shortest_path_edges, from_region, to_region)
         return self.get_path_length(path), path
 
-    def shortest_path_existing(self, from_region: Set[int], to_region: Set[int]):
+    def get_centre_path(self, node_from: int, node_to: int,
+                        trees: Optional[PathTrees] = None) -> Tuple[float, List[int]]:
+        """
+        Find the shortest path between two nodes of the unfiltered graph, through the contraction hierarchy when one
+        is used, from a tree from node_from with the csr engine or when trees share one, and with bidirectional A*
+        otherwise.
+        """
+        hierarchy = self.get_hierarchy()
+        if hierarchy is not None:
+            return hierarchy.query([node_from], [node_to])
+        if self.engine == 'csr' or (trees is not None and trees.is_shared('length', [node_from])):
+            trees = trees if trees is not None else PathTrees(self)
+            return trees.nearest('length', [node_from], {node_to})
+        return bidirectional_astar(self.graph_unfiltered, node_from, node_to, self.get_distance_bound_to,
+                                   weight='length')
+
+    def shortest_path_existing(self, from_region: Set[int], to_region: Set[int], trees: Optional[PathTrees] = None):
         """
         Find the shortest path between any node in from_region and any node in to_region, with path cost of
         existing cycle-friendly paths set to zero.
         """
-        graph_unfiltered_copy = self.graph_unfiltered.copy()
-        edge_length = self.set_zero_cost(self.edge_length)
-        nx.set_edge_attributes(graph_unfiltered_copy, edge_length, 'length')
-
-        dist = float('inf')
-        shortest_path = []
-        for target in to_region:
-            dist_temp, path = nx.multi_source_dijkstra(graph_unfiltered_copy, from_region, target=target,
-                                                       weight='length')
-            if dist_temp < dist:
-                dist = dist_temp
-                shortest_path = path
+        trees = trees if trees is not None else PathTrees(self)
+        dist, shortest_path = trees.nearest('existing', from_region, to_region)
         shortest_path_edges = [(shortest_path[i], shortest_path[i + 1]) for i in range(len(shortest_path) - 1)]
         path = self.trim_path(shortest_path_edges, from_region, to_region)
-        return self.get_path_length(path, graph_unfiltered_copy), path
+        costs = trees.get_costs('existing')
+        if isinstance(costs, CsrGraph):
+            return float(costs.get_lengths(path).sum()), path
+        return sum(costs(u, v, self.graph_unfiltered.edges[u, v]) for (u, v) in path), path
+
+    def get_costs(self, name: str) -> Union[Weight, CsrGraph]:
+        """
+        Get the edge costs of the unfiltered graph that PathTrees searches with: 'length', or 'existing', where the
+        edges of existing cycle-friendly paths cost nothing. With the csr engine they are a CsrGraph, and otherwise a
+        weight of a Dijkstra search.
+        """
+        if self.engine == 'csr':
+            graph = self.get_csr('graph_unfiltered')
+            return graph if name == 'length' else graph.with_lengths(self.get_zero_costs(graph))
+        if name == 'length':
+            return 'length'
+        graph, edge_length = self.graph, self.edge_length
+
+        # The costs are looked up as the search reaches each edge, rather than copying the lengths of every edge
+        def length(u, v, data):
+            if ((u, v) in edge_length or (v, u) in edge_length) and graph.has_edge(u, v):
+                return 0
+            return data['length']
+        return length
 
-    def set_zero_cost(self, edge_length: Dict[Tuple[int, int], float]):
-        for edge in edge_length.keys():
-            if edge in self.graph.edges:
-                edge_length[edge] = 0
-        return edge_length
+    def get_zero_costs(self, graph: CsrGraph) -> np.ndarray:
+        """
+        Get the cost of every stored entry of the unfiltered CSR graph, which is zero for the edges of the filtered
+        graph with a known length, as get_costs('existing') gives, and the length for the others.
+        """
+        u = np.repeat(graph.node_ids, np.diff(graph.matrix.indptr))
+        v = graph.node_ids[graph.matrix.indices]
+        known = np.fromiter(((a, b) in self.edge_length or (b, a) in self.edge_length
+                             for a, b in zip(u.tolist(), v.tolist())), dtype=bool, count=len(u))
+        return np.where(known & self.get_csr('graph').has_edges(u, v), 0.0, graph.matrix.data)
 
-    def get_connected_components(self, graph) -> List[Set[int]]:
-        return sorted(nx.connected_components(graph), key=self.group_size, reverse=True)
+    def get_connected_components(self, graph: Union[nx.Graph, CsrGraph]) -> List[Set[int]]:
+        """
+        Get the components of a graph in the order of component_order.
+        """
+        if isinstance(graph, CsrGraph):
+            components, lengths = graph.connected_components()
+            order = sorted(range(len(components)), key=lambda i: component_order(lengths[i], components[i]))
+            return [set(components[i].tolist()) for i in order]
+        return sorted(nx.connected_components(graph), key=lambda group: component_order(self.group_size(group), group))
 
     def get_centre_of_nodes(self, nodes: Set[int]) -> Tuple[float, float]:
-        g = nx.subgraph(self.graph, nodes)
-        centre = list(nx.center(g, weight='length'))[0]
+        """
+        Find the position of the central node of a connected set of nodes, using the method set by centreMethod:
+
+        exact: the node of least eccentricity, found with nx.center. This needs all-pairs shortest paths.
+        sweep: alternate Dijkstra searches from a candidate centre and from the node farthest from it, for at most
+            CENTRE_SWEEPS rounds. Each search raises a lower bound on the eccentricity of every node and the next
+            candidate is the node with the least lower bound. It stops early once no node can beat the best candidate,
+            in which case that candidate is the exact centre. On random geometric graphs resembling street networks
+            it found the exact centre every time.
+        medoid: the node nearest to the geometric median of the node positions, ignoring the edges.
+        """
+        method = self.config.centre_method
+        if method == 'exact' and self.engine == 'csr':
+            centre = self.get_csr('graph').subgraph(nodes).center()
+        elif method == 'exact':
+            g = nx.subgraph(self.graph, nodes)
+            centre = list(nx.center(g, weight='length'))[0]
+        elif method == 'sweep':
+            centre = self.get_sweep_centre(nodes)
+        elif method == 'medoid':
+            centre = self.get_medoid(nodes)
+        else:
+            raise ValueError(f"Unknown centre method '{method}', expected one of {CENTRE_METHODS}")
         return self.layout[centre]
 
-    def display(self, subgraph: List[Set[int]] = None, filepath=None):
-        fig, ax = plt.subplots()
-        nx.draw_networkx(self.graph, pos=self.layout, with_labels=False, node_size=5, ax=ax)
-        if subgraph is not None:
-            color = iter(colormaps['rainbow'](np.linspace(0, 1, len(subgraph))))
-            for graph in subgraph:
-                c = next(color)
-                nx.draw_networkx(self.graph.subgraph(graph), pos=self.layout, with_labels=False, node_size=5, ax=ax,
-                                 node_color=[c], edge_color=[c])
-        if filepath is not None:
-            fig.savefig(filepath)
+    def get_sweep_centre(self, nodes: Set[int], sweeps: int = CENTRE_SWEEPS) -> int:
+        if self.engine == 'csr':
+            g = self.get_csr('graph').subgraph(nodes)
+            lengths_from = g.lengths_from
         else:
-            plt.show()
+            g = self.graph.subgraph(nodes).copy()
+            lengths_from = partial(nx.single_source_dijkstra_path_length, g, weight='length')
+        lower_bound = dict.fromkeys(g, 0)
+        best, best_eccentricity = None, float('inf')
+        source = self.get_medoid(nodes)
+        for _ in range(sweeps):
+            # Search from the candidate centre, which gives its exact eccentricity, then from its farthest node
+            profiler.count('dijkstra_runs', 2)
+            distances = lengths_from(source)
+            farthest = max(distances, key=distances.get)
+            if distances[farthest] < best_eccentricity:
+                best, best_eccentricity = source, distances[farthest]
+            for node, d in distances.items():
+                lower_bound[node] = max(lower_bound[node], d)
+            for node, d in lengths_from(farthest).items():
+                lower_bound[node] = max(lower_bound[node], d)
+            source = min(lower_bound, key=lower_bound.get)
+            if lower_bound[source] >= best_eccentricity:
+                break
+        return best
+
+    def get_medoid(self, nodes: Set[int], iterations: int = 50) -> int:
+        nodes = list(nodes)
+        pos = np.array([self.layout[node] for node in nodes])
+        # Scale longitudes so that both axes are in the same units around the nodes
+        scale = np.array([np.cos(np.radians(pos[:, 1].mean())), 1])
+        pos = pos * scale
+        median = pos.mean(axis=0)
+        for _ in range(iterations):
+            distances = np.maximum(np.linalg.norm(pos - median, axis=1), 1e-12)
+            median = (pos / distances[:, None]).sum(axis=0) / (1 / distances).sum()
+        _, i = cKDTree(pos).query(median)
+        return nodes[i]
+
+    # Plotting imports matplotlib, which is only loaded once something is drawn
+    def get_renderer(self) -> 'GraphRenderer':
+        from scripts.render import GraphRenderer
+        return GraphRenderer(self.graph, self.layout)
+
+    @staticmethod
+    def get_component_layers(subgraph: List[Set[int]] = None) -> List['Layer']:
+        if subgraph is None:
+            return []
+        from matplotlib import colormaps
+        from scripts.render import Layer
+        colours = colormaps['rainbow'](np.linspace(0, 1, len(subgraph)))
+        return [Layer(colour, nodes=graph) for graph, colour in zip(subgraph, colours)]
+
+    @staticmethod
+    def get_path_layers(path: List[Tuple[int, int]], from_region, to_region) -> List['Layer']:
+        from scripts.render import Layer
+        return [Layer('m', nodes=from_region), Layer('r', nodes=to_region), Layer('y', edges=path)]
+
+    def display(self, subgraph: List[Set[int]] = None, filepath=None):
+        self.get_renderer().render(self.get_component_layers(subgraph), filepath)
 
     def display_path_between_subgraph(self, path: List[Tuple[int, int]], from_region, to_region, filepath=None):
-        fig, ax = plt.subplots()
-        nx.draw_networkx(self.graph, pos=self.layout, with_labels=False, node_size=5, ax=ax)
-        nx.draw_networkx(self.graph.subgraph(from_region), pos=self.layout, with_labels=False, node_size=5, ax=ax,
-                         node_color='m', edge_color='m')
-        nx.draw_networkx(self.graph.subgraph(to_region), pos=self.layout, with_labels=False, node_size=5, ax=ax,
-                         node_color='r', edge_color='r')
-        nx.draw_networkx(nx.Graph(path), pos=self.layout, with_labels=False, node_size=5, ax=ax,
-                         node_color='y', edge_color='y')
-        if filepath is not None:
-            fig.savefig(filepath)
-        else:
-            plt.show()
+        self.get_renderer().render(self.get_path_layers(path, from_region, to_region), filepath)
 
     def connect_close_nodes(self):
-        new_edges_with_length = self.get_geometric_edges(self.graph)
-        self.graph.add_weighted_edges_from(new_edges_with_length, weight='length')
-        new_edges_with_length = self.get_geometric_edges(self.graph_unfiltered)
-        self.graph_unfiltered.add_weighted_edges_from(new_edges_with_length, weight='length')
+        for name in ('graph', 'graph_unfiltered'):
+            graph = self.get_graph(name)
+            edges = self.get_geometric_edges(graph)
+            profiler.count('proximity_edges', len(edges))
+            if isinstance(graph, CsrGraph):
+                self.csr[name] = graph.add_edges(edges)
+            # With the csr engine, nx.Graph objects already built are kept up to date as well
+            if self.graphs[name] is not None:
+                self.graphs[name].add_weighted_edges_from(edges, weight='length')
+        self.hierarchy = None
+
+    def build_hierarchy(self):
+        """
+        Build a contraction hierarchy over the lengths of the unfiltered graph, which the strategies searching it by
+        length use from then on instead of Dijkstra and A* searches.
+        """
+        self.hierarchy = ContractionHierarchy.build(self.get_graph('graph_unfiltered'), weight='length')
+        self.use_hierarchy = True
+
+    def get_hierarchy(self) -> Optional[ContractionHierarchy]:
+        if not self.use_hierarchy:
+            return None
+        if self.hierarchy is None or not self.hierarchy.matches(self.get_graph('graph_unfiltered')):
+            with profiler.stage('hierarchy'):
+                self.build_hierarchy()
+        return self.hierarchy
 
     def get_geometric_edges(self, graph) -> List[Tuple[int, int, float]]:
-        new_edges = nx.geometric_edges(graph, radius=self.config.neighbour_eps)
-        new_edges_with_length = [(u, v, self.get_edge_length((u, v))) for (u, v) in new_edges]
+        """
+        Find the pairs of close nodes that join different components of the graph, with their lengths.
+        """
+        if isinstance(graph, CsrGraph):
+            component_of = graph.get_component_labels()
+        else:
+            component_of = {node: i for i, component in enumerate(nx.connected_components(graph))
+                            for node in component}
+        new_edges = [(u, v) for u, v in self.get_close_pairs()
+                     if u in component_of and v in component_of and component_of[u] != component_of[v]]
+        new_edges_with_length = [(u, v, length) for (u, v), length in zip(new_edges, self.get_edge_lengths(new_edges))]
         return new_edges_with_length
 
+    def get_close_pairs(self, nodes: Optional[Collection[int]] = None) -> List[Tuple[int, int]]:
+        """
+        Find all pairs of nodes that lie within neighbour_radius metres of each other, optionally only among the given
+        nodes. The pairs over all nodes are found once and filtered for each later call.
+        """
+        if self.close_pairs is None:
+            self.close_pairs = self.index.query_pairs(self.config.neighbour_radius)
+        if nodes is None:
+            return self.close_pairs
+        nodes = set(nodes)
+        return [(u, v) for u, v in self.close_pairs if u in nodes and v in nodes]
+
     def group_size(self, group: Set[int]):
+        if self.engine == 'csr':
+            return float(self.get_csr('graph').subgraph(group).get_edge_arrays()[2].sum())
         subgraph = self.graph.subgraph(group)
         size = 0
         for edge in subgraph.edges:
             size += subgraph.get_edge_data(*edge)['length']
         return size
 
-    def get_edge_length(self, edge: Tuple[int, int]):
-        return self.get_geodesic_distance(self.layout[edge[0]], self.layout[edge[1]])
+    def get_edge_lengths(self, edges: List[Tuple[int, int]]) -> List[float]:
+        """
+        Compute the geodesic lengths in km of all edges in one batch, using the method set by lengthMethod.
+        """
+        pos = np.array([self.layout[node] for edge in edges for node in edge], dtype=np.float64).reshape(-1, 4)
+        lengths = geodesic_lengths(pos[:, 0], pos[:, 1], pos[:, 2], pos[:, 3], method=self.config.length_method)
+        return lengths.tolist()
+
+    def get_distance_bound_to(self, node: int) -> Callable[[int], float]:
+        """
+        Get a function giving a lower bound in km of the length of any path from a node to the given one.
+        """
+        bound, layout = distance_bound_to(*self.layout[node], method=self.config.length_method), self.layout
+        return lambda other: bound(*layout[other])
 
     def get_path_length(self, path: List[Tuple[int, int]], graph=None):
+        if graph is None and self.engine == 'csr':
+            return float(self.get_csr('graph_unfiltered').get_lengths(path).sum())
         if graph is None:
             graph = self.graph_unfiltered
         length = 0
@@ -164,10 +463,6 @@ class GraphProcessing:
             length += graph.edges[u, v]['length']
         return length
 
-    @staticmethod
-    def get_geodesic_distance(pos1: Tuple[float, float], pos2: Tuple[float, float]):
-        return distance.distance(tuple(reversed(pos1)), tuple(reversed(pos2))).km
-
     @staticmethod
     def trim_path(path: List[Tuple[int, int]], from_region: Set[int], to_region: Set[int]):
         enum_edges = list(enumerate(path))
@@ -0,0 +1,235 @@
+import heapq
+import networkx as nx
+import numpy as np
+from itertools import count
+from scripts import profiler
+from scripts.search import get_path
+from typing import Dict, Iterable, List, Tuple
+
+# Nodes settled by a witness search before it gives up and the shortcut it looked for is added anyway, when
+# contracting a node and when only estimating the shortcuts contracting it would add
+WITNESS_SETTLED = 64
+ESTIMATE_SETTLED = 16
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over the lengths of an undirected graph, which answers shortest path queries between two
+    nodes, or two sets of nodes, with two small searches that only follow edges to nodes contracted later.
+
+    Nodes are contracted in order of twice their edge difference, the number of shortcuts contracting them adds less
+    the number of edges it removes, plus the number of their neighbours contracted already and their depth in the
+    hierarchy, so that contraction spreads evenly over the graph. The priorities of the neighbours of a node are
+    updated when it is contracted. Contracting a node links each pair of its neighbours with a shortcut, unless a
+    witness search that avoids the node finds a path between them at most as long. A witness search that gives up
+    early only adds shortcuts that are not needed.
+
+    The hierarchy describes the graph as it was when built, whose size it keeps so that a changed graph is noticed.
+    """
+    def __init__(self, rank: Dict[int, int], up: Dict[int, List[Tuple[int, float]]],
+                 middle: Dict[Tuple[int, int], int], nodes: int, edges: int):
+        self.rank = rank
+        self.up = up
+        self.middle = middle
+        self.nodes = nodes
+        self.edges = edges
+
+    @classmethod
+    def build(cls, graph: nx.Graph, weight: str = 'length') -> 'ContractionHierarchy':
+        adj: Dict[int, Dict[int, float]] = {node: {} for node in graph}
+        for u, v, length in graph.edges(data=weight):
+            if u != v and length < adj[u].get(v, float('inf')):
+                adj[u][v] = adj[v][u] = length
+        contracted = dict.fromkeys(adj, 0)
+        depth = dict.fromkeys(adj, 0)
+
+        def get_priority(node: int) -> int:
+            return (2 * (len(get_shortcuts(adj, node, ESTIMATE_SETTLED)) - len(adj[node])) + contracted[node]
+                    + depth[node])
+
+        priority = {node: get_priority(node) for node in adj}
+        c = count()
+        heap = [(node_priority, next(c), node) for node, node_priority in priority.items()]
+        heapq.heapify(heap)
+
+        rank: Dict[int, int] = {}
+        up: Dict[int, List[Tuple[int, float]]] = {}
+        middle: Dict[Tuple[int, int], int] = {}
+        while heap:
+            node_priority, _, node = heapq.heappop(heap)
+            if node in rank or node_priority != priority[node]:
+                continue
+            shortcuts = get_shortcuts(adj, node)
+            neighbours = adj.pop(node)
+            rank[node] = len(rank)
+            up[node] = list(neighbours.items())
+            for neighbour in neighbours:
+                del adj[neighbour][node]
+                contracted[neighbour] += 1
+                depth[neighbour] = max(depth[neighbour], depth[node] + 1)
+            for u, v, length in shortcuts:
+                if length < adj[u].get(v, float('inf')):
+                    adj[u][v] = adj[v][u] = length
+                    middle[(u, v) if u < v else (v, u)] = node
+            # Entries left in the heap with an old priority are skipped when popped
+            for neighbour in neighbours:
+                priority[neighbour] = get_priority(neighbour)
+                heapq.heappush(heap, (priority[neighbour], next(c), neighbour))
+        profiler.count('shortcuts', len(middle))
+        return cls(rank, up, middle, graph.number_of_nodes(), graph.number_of_edges())
+
+    def matches(self, graph: nx.Graph) -> bool:
+        """
+        Check whether graph has the size of the graph the hierarchy was built from. Changes that keep the numbers of
+        nodes and edges are not noticed, so code changing the graph should invalidate the hierarchy itself.
+        """
+        return graph.number_of_nodes() == self.nodes and graph.number_of_edges() == self.edges
+
+    def query(self, sources: Iterable[int], targets: Iterable[int]) -> Tuple[float, List[int]]:
+        """
+        Find the shortest path from any node in sources to any node in targets, as DijkstraTree.nearest does.
+        The path only has a source at its start and a target at its end.
+        """
+        profiler.count('hierarchy_queries')
+        sources, targets = set(sources), set(targets)
+        common = sources & targets
+        if len(common) > 0:
+            return 0, [min(common)]
+
+        # Index 0 holds the upward search from the sources and index 1 the upward search from the targets
+        dists: Tuple[Dict[int, float], Dict[int, float]] = ({}, {})
+        seen: Tuple[Dict[int, float], Dict[int, float]] = (dict.fromkeys(sources, 0), dict.fromkeys(targets, 0))
+        preds: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        c = count()
+        fringes = ([(0, next(c), node) for node in sources], [(0, next(c), node) for node in targets])
+        best, meet = float('inf'), None
+
+        while True:
+            # Each search stops once its least key reaches the best path, and the other one continues
+            keys = [fringe[0][0] if fringe and fringe[0][0] < best else None for fringe in fringes]
+            if keys[0] is None and keys[1] is None:
+                break
+            side = 0 if keys[1] is None or (keys[0] is not None and keys[0] <= keys[1]) else 1
+            d, _, node = heapq.heappop(fringes[side])
+            dist = dists[side]
+            if node in dist:
+                continue
+            dist[node] = d
+            other = seen[1 - side].get(node)
+            if other is not None and d + other < best:
+                best, meet = d + other, node
+            for neighbour, length in self.up[node]:
+                neighbour_dist = d + length
+                if neighbour not in dist and neighbour_dist < seen[side].get(neighbour, float('inf')):
+                    seen[side][neighbour] = neighbour_dist
+                    preds[side][neighbour] = node
+                    heapq.heappush(fringes[side], (neighbour_dist, next(c), neighbour))
+
+        profiler.count('nodes_settled', len(dists[0]) + len(dists[1]))
+        if meet is None:
+            raise nx.NetworkXNoPath('No path between the source and target regions')
+        path = self.unpack(get_path(preds[0], meet) + list(reversed(get_path(preds[1], meet)))[1:])
+        # A path through other sources or targets is as short as the part of it between them
+        start = max(i for i, node in enumerate(path) if node in sources)
+        end = next(i for i in range(start, len(path)) if path[i] in targets)
+        return best, path[start:end + 1]
+
+    def unpack(self, path: List[int]) -> List[int]:
+        """
+        Replace the shortcuts along a path through the hierarchy by the edges of the graph they stand for.
+        """
+        unpacked = [path[0]]
+        for u, v in zip(path[:-1], path[1:]):
+            stack = [(u, v)]
+            while stack:
+                a, b = stack.pop()
+                node = self.middle.get((a, b) if a < b else (b, a))
+                if node is None:
+                    unpacked.append(b)
+                else:
+                    stack.append((node, b))
+                    stack.append((a, node))
+        return unpacked
+
+    def to_arrays(self, node_ids: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Get the hierarchy as arrays indexed by the position of each node in the sorted node_ids, with the upward edges
+        of every node in CSR form and the middle node of each shortcut, or -1 for edges of the graph.
+        """
+        nodes = node_ids.tolist()
+        index_of = {node: i for i, node in enumerate(nodes)}
+        up = [self.up.get(node, []) for node in nodes]
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum([len(edges) for edges in up], out=indptr[1:])
+        edges = [(node, neighbour, length) for node, edges in zip(nodes, up) for neighbour, length in edges]
+        middle = [self.middle.get((u, v) if u < v else (v, u)) for u, v, _ in edges]
+        return {
+            'hierarchy_rank': np.array([self.rank[node] for node in nodes], dtype=np.int64),
+            'hierarchy_indptr': indptr,
+            'hierarchy_indices': np.array([index_of[v] for _, v, _ in edges], dtype=np.int32),
+            'hierarchy_length': np.array([length for _, _, length in edges], dtype=np.float64),
+            'hierarchy_middle': np.array([-1 if node is None else index_of[node] for node in middle], dtype=np.int32),
+            'hierarchy_size': np.array([self.nodes, self.edges], dtype=np.int64)
+        }
+
+    @classmethod
+    def from_arrays(cls, node_ids: np.ndarray, arrays: Dict[str, np.ndarray]) -> 'ContractionHierarchy':
+        nodes = node_ids.tolist()
+        indptr = arrays['hierarchy_indptr'].tolist()
+        indices = node_ids[arrays['hierarchy_indices']].tolist()
+        lengths = arrays['hierarchy_length'].tolist()
+        middle_index = arrays['hierarchy_middle']
+        up, middle = {}, {}
+        for i, node in enumerate(nodes):
+            up[node] = list(zip(indices[indptr[i]:indptr[i + 1]], lengths[indptr[i]:indptr[i + 1]]))
+        rows = np.repeat(node_ids, np.diff(arrays['hierarchy_indptr']))
+        shortcuts = np.flatnonzero(middle_index >= 0)
+        for u, v, node in zip(rows[shortcuts].tolist(), node_ids[arrays['hierarchy_indices'][shortcuts]].tolist(),
+                              node_ids[middle_index[shortcuts]].tolist()):
+            middle[(u, v) if u < v else (v, u)] = node
+        nodes_count, edges_count = arrays['hierarchy_size'].tolist()
+        return cls(dict(zip(nodes, arrays['hierarchy_rank'].tolist())), up, middle, nodes_count, edges_count)
+
+
+def get_shortcuts(adj: Dict[int, Dict[int, float]], node: int,
+                  max_settled: int = WITNESS_SETTLED) -> List[Tuple[int, int, float]]:
+    """
+    Get the shortcuts needed to contract node, as (u, v, length) tuples, between pairs of its neighbours that have no
+    witness path at most as long as the path through node.
+    """
+    neighbours = list(adj[node].items())
+    shortcuts = []
+    for i, (u, to_u) in enumerate(neighbours[:-1]):
+        targets = {v: to_u + to_v for v, to_v in neighbours[i + 1:]}
+        dist = witness_search(adj, u, node, targets, max(targets.values()), max_settled)
+        shortcuts.extend((u, v, length) for v, length in targets.items() if dist.get(v, float('inf')) > length)
+    return shortcuts
+
+
+def witness_search(adj: Dict[int, Dict[int, float]], source: int, avoid: int, targets: Dict[int, float],
+                   limit: float, max_settled: int = WITNESS_SETTLED) -> Dict[int, float]:
+    """
+    Get the lengths of paths from source found by a Dijkstra search that avoids a node, up to a length of limit or
+    until every target is settled or WITNESS_SETTLED nodes are.
+    """
+    seen = {source: 0}
+    settled = set()
+    remaining = len(targets)
+    fringe = [(0, source)]
+    while fringe and len(settled) < max_settled:
+        d, node = heapq.heappop(fringe)
+        if node in settled:
+            continue
+        if d > limit:
+            break
+        settled.add(node)
+        if node in targets:
+            remaining -= 1
+            if remaining == 0:
+                break
+        for neighbour, length in adj[node].items():
+            neighbour_dist = d + length
+            if neighbour != avoid and neighbour_dist < seen.get(neighbour, float('inf')):
+                seen[neighbour] = neighbour_dist
+                heapq.heappush(fringe, (neighbour_dist, neighbour))
+    return seen
@@ -1,73 +1,154 @@
-import overpy
-from scripts.data_fetcher import DataFetcher
-from typing import Dict, List, Tuple
+import numpy as np
+from scripts import profiler
+from scripts.config import CompiledTags
+from scripts.store import NodeWayStore
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import overpy
+    from scripts.data_fetcher import DataFetcher
 
 
 class Model:
-    def __init__(self, data_fetcher: DataFetcher):
-        self.data_fetcher = data_fetcher
+    def __init__(self, data_fetcher: 'DataFetcher'):
         self.config = data_fetcher.config
-        self.all_ways = data_fetcher.get_ways()
-        self.nodes_on_ways = data_fetcher.get_nodes_on_ways()
+        with profiler.stage('store'):
+            self.store = NodeWayStore.from_fetcher(data_fetcher)
         self.centre = data_fetcher.get_centre()
+        self.compiled_tags: Optional[CompiledTags] = None
+        self.scores: Optional[np.ndarray] = None
 
     def get_adj_list(self, threshold=None):
         threshold = threshold if threshold is not None else self.config.threshold
-        hyper_edges = [self.nodes_on_ways.get(way.id, []) for way in self.all_ways if self.eval_way(way) >= threshold]
-        link_counter = self.count_node_links(hyper_edges)
-        adj_list = self.ways_to_adj_list(hyper_edges, link_counter)
+        ways = np.flatnonzero(self.get_scores() >= threshold)
+        indptr, nodes = self.store.select_ways(ways)
+        link_counter = self.count_node_links(nodes, self.store.n_nodes)
+        adj_list = self.ways_to_adj_list(indptr, nodes, link_counter, self.store.node_ids)
         return adj_list
 
     def get_node_pos(self, adj_list: Dict[int, List[int]]) -> Dict[int, Tuple[float, float]]:
-        return self.data_fetcher.get_node_pos_by_ids(list(adj_list.keys()))
-
-    def eval_way(self, way: overpy.Way) -> float:
-        score = 0
-        max_score = self.config.weighted_tags.weight_sum()
-        for tag_key, tag_value in way.tags.items():
-            tag = self.config.weighted_tags[tag_key]
-            weight, mapping = tag.weight, tag.values
-            tag_score = 0
-            if tag_key == 'maxspeed':
-                t_value = int(tag_value.split(' ')[0])
-                for m_key, m_value in mapping.items():
-                    m_range = m_key.split(',')
-                    start, end = int(m_range[0]), int(m_range[1])
-                    if start < t_value <= end:
-                        tag_score = m_value
-                        break
-            else:
-                tag_score = mapping.get(tag_value, 0)
-            score += weight * tag_score
-        return score / max_score
+        return self.store.get_node_pos_by_ids(list(adj_list.keys()))
+
+    def get_scores(self) -> np.ndarray:
+        """
+        Get the score of every way in the store. Scores are computed once per distinct set of tags and reused by every
+        later call.
+        """
+        if self.scores is None:
+            score_by_tags: Dict[bytes, float] = {}
+            scores = np.empty(self.store.n_ways, dtype=np.float64)
+            for i in range(self.store.n_ways):
+                key = self.store.way_tags[self.store.tag_indptr[i]:self.store.tag_indptr[i + 1]].tobytes()
+                if key not in score_by_tags:
+                    score_by_tags[key] = self.eval_tags(self.store.get_tags(i))
+                scores[i] = score_by_tags[key]
+            self.scores = scores
+            profiler.count('ways_scored', self.store.n_ways)
+            profiler.count('tag_sets_scored', len(score_by_tags))
+        return self.scores
+
+    def eval_way(self, way: 'overpy.Way') -> float:
+        return self.eval_tags(way.tags)
+
+    def eval_tags(self, tags: Dict[str, str]) -> float:
+        if self.compiled_tags is None:
+            self.compiled_tags = self.config.weighted_tags.compile()
+        return self.compiled_tags.score(tags)
+
+    @staticmethod
+    def count_node_links(nodes: np.ndarray, n_nodes: int) -> np.ndarray:
+        """
+        Count the number of times each node appears on the given ways.
+        """
+        return np.bincount(nodes, minlength=n_nodes)
+
+    def get_segments(self, threshold=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the edges that get_adj_list(threshold) is built from, as arrays of the OSM ids of both end nodes and the
+        score of the way each edge lies on.
+        """
+        threshold = threshold if threshold is not None else self.config.threshold
+        scores = self.get_scores()
+        ways = np.flatnonzero(scores >= threshold)
+        indptr, nodes = self.store.select_ways(ways)
+        link_counter = self.count_node_links(nodes, self.store.n_nodes)
+        u, v, way = self.split_ways(indptr, nodes, link_counter)
+        return self.store.node_ids[u], self.store.node_ids[v], scores[ways][way]
+
+    def get_node_activation(self) -> Dict[int, float]:
+        """
+        Get, for every node, the highest threshold at which it is a node of the graph from get_adj_list: the node must
+        be a split point of a way scoring at least the threshold, that is be shared by two ways (or appear twice on one
+        way) scoring at least the threshold, or be the first or last node of the way, and the way must have a split
+        point at another node, as links from a node to itself are skipped. A way closing on itself with no other split
+        point, such as an isolated roundabout, adds no node.
+        """
+        scores = self.get_scores()
+        indptr, nodes = self.store.way_indptr, self.store.way_nodes
+        lengths = np.diff(indptr)
+        way_of = np.repeat(np.arange(len(lengths)), lengths)
+        position_score = scores[way_of]
+
+        # The highest threshold at which a node appears twice on ways scoring at least the threshold
+        order = np.lexsort((-position_score, nodes))
+        sorted_nodes, sorted_scores = nodes[order], position_score[order]
+        shared = np.flatnonzero(sorted_nodes[1:] == sorted_nodes[:-1]) + 1
+        second_best = np.full(self.store.n_nodes, -np.inf)
+        np.maximum.at(second_best, sorted_nodes[shared], sorted_scores[shared])
+
+        # The highest threshold at which each position is a split point of its way
+        split = np.minimum(position_score, second_best[nodes])
+        ends = np.concatenate([indptr[:-1][lengths > 0], indptr[1:][lengths > 0] - 1])
+        split[ends] = position_score[ends]
+
+        # The highest threshold at which the way has a split point at another node than that of each position: the
+        # best split point of the way, or the best at another node than that one
+        order = np.lexsort((-split, way_of))
+        first = order[np.concatenate([[0], np.flatnonzero(way_of[order][1:] != way_of[order][:-1]) + 1])] \
+            if len(order) > 0 else order
+        best_node = np.full(len(lengths), -1)
+        best_split = np.full(len(lengths), -np.inf)
+        best_node[way_of[first]], best_split[way_of[first]] = nodes[first], split[first]
+        others = nodes != best_node[way_of]
+        other_split = np.full(len(lengths), -np.inf)
+        np.maximum.at(other_split, way_of[others], split[others])
+        other = np.where(others, best_split[way_of], other_split[way_of])
+
+        activation = np.full(self.store.n_nodes, -np.inf)
+        np.maximum.at(activation, nodes, np.minimum(split, other))
+        active = np.isfinite(activation)
+        return dict(zip(self.store.node_ids[active].tolist(), activation[active].tolist()))
 
     @staticmethod
-    def count_node_links(hyper_edges: List[List[overpy.Node]]) -> Dict[int, int]:
-        link_counter: Dict[int, int] = {}
-        for hyper_edge in hyper_edges:
-            for node in hyper_edge:
-                link_counter[node.id] = link_counter.get(node.id, 0) + 1
-        return link_counter
+    def split_ways(indptr: np.ndarray, nodes: np.ndarray,
+                   link_count: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Split the ways given as a CSR pair (indptr, nodes) at every node that is shared with another way, and link
+        consecutive split points on the same way, so that each link follows its stretch of the way. The first and last
+        nodes of a way are always split points.
+        Returns the end nodes of every link and the way it lies on, skipping links from a node to itself.
+        """
+        lengths = np.diff(indptr)
+        is_split = link_count[nodes] > 1
+        is_split[indptr[:-1][lengths > 0]] = True
+        is_split[indptr[1:][lengths > 0] - 1] = True
+
+        positions = np.flatnonzero(is_split)
+        way_of = np.repeat(np.arange(len(lengths)), lengths)[positions]
+        same_way = way_of[:-1] == way_of[1:]
+        u = nodes[positions[:-1][same_way]]
+        v = nodes[positions[1:][same_way]]
+        not_loop = u != v
+        return u[not_loop], v[not_loop], way_of[:-1][same_way][not_loop]
 
     @staticmethod
-    def ways_to_adj_list(hyper_edges: List[List[overpy.Node]], link_count: Dict[int, int]) -> Dict[int, List[int]]:
+    def ways_to_adj_list(indptr: np.ndarray, nodes: np.ndarray, link_count: np.ndarray,
+                         node_ids: np.ndarray) -> Dict[int, List[int]]:
+        u, v, _ = Model.split_ways(indptr, nodes, link_count)
         adj_list: Dict[int, List[int]] = {}
-        for h_edge in hyper_edges:
-            if len(h_edge) == 0:
-                continue
-            cur_pointer = 0
-            cur_node = h_edge[cur_pointer]
-            next_pointer = cur_pointer + 1
-            while next_pointer < len(h_edge):
-                next_node = h_edge[next_pointer]
-                if (link_count[next_node.id] > 1 or next_pointer == len(h_edge) - 1) and cur_node.id != next_node.id:
-                    neighbours = adj_list.get(cur_node.id, [])
-                    neighbours.append(next_node.id)
-                    adj_list[cur_node.id] = neighbours
-                    adj_list[next_node.id] = adj_list.get(next_node.id, [])
-
-                    cur_pointer = next_pointer
-                    next_pointer = cur_pointer + 1
-                else:
-                    next_pointer += 1
+        for cur_node, next_node in zip(node_ids[u].tolist(), node_ids[v].tolist()):
+            neighbours = adj_list.get(cur_node, [])
+            neighbours.append(next_node)
+            adj_list[cur_node] = neighbours
+            adj_list[next_node] = adj_list.get(next_node, [])
         return adj_list
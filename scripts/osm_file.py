@@ -0,0 +1,169 @@
+import bz2
+import gzip
+from dataclasses import dataclass
+from scripts.config import BoundingBox, Config
+from scripts.exception import NodeNotFoundException
+from scripts.store import NodeWayStore, StoreBuilder
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse
+
+
+@dataclass
+class OsmNode:
+    id: int
+    lon: float
+    lat: float
+
+
+@dataclass
+class OsmWay:
+    id: int
+    tags: Dict[str, str]
+    node_ids: List[int]
+
+
+class OsmFileFetcher:
+    """
+    Data source reading a local OSM extract (.osm, .osm.bz2, .osm.gz or .osm.pbf) instead of querying Overpass.
+
+    The file is parsed as a stream and only highway-tagged ways are kept. Nodes outside the bounding box are dropped
+    as they are read, so memory use is proportional to the network inside the bounding box rather than to the size of
+    the file. As in every extract from Geofabrik or osmium, nodes must appear before the ways referencing them.
+
+    When area is given, the bounding box is a tile of area. Ways with a node in the tile then keep their nodes in the
+    rest of area, which are read in a second pass over the file, so that ways crossing the edge of the tile are
+    complete. Memory use is still proportional to the network inside the tile and along its edges.
+    """
+    highways_only = True
+
+    def __init__(self, config: Config, filepath: str, area: BoundingBox = None):
+        self.config = config
+        self.box = config.bounding_box
+        self.area = area
+        self.filepath = filepath
+
+        self.nodes: Dict[int, Tuple[float, float]] = {}
+        self.ways: List[OsmWay] = []
+        self.centre = None
+        self.missing: Optional[Set[int]] = None
+
+        self.parse()
+        if area is not None:
+            self.missing = {node_id for way in self.ways for node_id in way.node_ids if node_id not in self.nodes}
+            self.parse()
+            self.clip_ways()
+        self.remove_unused_nodes()
+
+        if self.centre is None:
+            raise NodeNotFoundException(f"Centre node {self.box.node_id} is not in {filepath}")
+
+    def parse(self):
+        if self.filepath.endswith('.pbf'):
+            self.parse_pbf()
+        else:
+            self.parse_xml()
+
+    def add_node(self, node_id: int, lon: float, lat: float):
+        if self.missing is not None:
+            if node_id in self.missing and self.area.contains(lon, lat):
+                self.nodes[node_id] = (lon, lat)
+            return
+        if node_id == self.box.node_id:
+            self.centre = (lon, lat)
+        if self.box.contains(lon, lat):
+            self.nodes[node_id] = (lon, lat)
+
+    def add_way(self, way_id: int, tags: Dict[str, str], node_ids: List[int]):
+        if 'highway' not in tags or self.missing is not None:
+            return
+        if self.area is not None:
+            # Nodes outside the tile are clipped once they have been read in the second pass
+            if any(node_id in self.nodes for node_id in node_ids):
+                self.ways.append(OsmWay(id=way_id, tags=tags, node_ids=node_ids))
+            return
+        node_ids = [node_id for node_id in node_ids if node_id in self.nodes]
+        if len(node_ids) > 0:
+            self.ways.append(OsmWay(id=way_id, tags=tags, node_ids=node_ids))
+
+    def clip_ways(self):
+        for way in self.ways:
+            way.node_ids = [node_id for node_id in way.node_ids if node_id in self.nodes]
+
+    def remove_unused_nodes(self):
+        used = {node_id for way in self.ways for node_id in way.node_ids}
+        self.nodes = {node_id: pos for node_id, pos in self.nodes.items() if node_id in used}
+
+    def parse_xml(self):
+        with self.open() as f:
+            root = None
+            tags: Dict[str, str] = {}
+            node_ids: List[int] = []
+            for event, element in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    elif element.tag in ('node', 'way', 'relation'):
+                        # Relations are skipped, but their tags must not be added to those of the last way
+                        tags, node_ids = {}, []
+                    continue
+                if element.tag == 'tag':
+                    tags[element.get('k')] = element.get('v')
+                elif element.tag == 'nd':
+                    node_ids.append(int(element.get('ref')))
+                elif element.tag == 'node':
+                    self.add_node(int(element.get('id')), float(element.get('lon')), float(element.get('lat')))
+                elif element.tag == 'way':
+                    self.add_way(int(element.get('id')), tags, node_ids)
+                if element.tag in ('node', 'way', 'relation'):
+                    # Drop parsed elements from the tree so that memory does not grow with the size of the file
+                    root.clear()
+
+    def parse_pbf(self):
+        try:
+            import osmium
+        except ImportError:
+            raise ImportError("Reading .osm.pbf files requires the osmium package: pip install osmium")
+
+        fetcher = self
+
+        class Handler(osmium.SimpleHandler):
+            def node(self, n):
+                fetcher.add_node(n.id, n.location.lon, n.location.lat)
+
+            def way(self, w):
+                if 'highway' in w.tags:
+                    fetcher.add_way(w.id, {tag.k: tag.v for tag in w.tags}, [node.ref for node in w.nodes])
+
+        Handler().apply_file(self.filepath, locations=False)
+
+    def open(self):
+        if self.filepath.endswith('.bz2'):
+            return bz2.open(self.filepath, 'rb')
+        if self.filepath.endswith('.gz'):
+            return gzip.open(self.filepath, 'rb')
+        return open(self.filepath, 'rb')
+
+    def get_node_pos_by_ids(self, node_ids: List[int]) -> Dict[int, Tuple[float, float]]:
+        return {node_id: self.nodes[node_id] for node_id in node_ids}
+
+    def get_nodes_on_ways(self) -> Dict[int, List[OsmNode]]:
+        return {way.id: list(self.iter_nodes(way)) for way in self.ways}
+
+    def iter_nodes(self, way: OsmWay) -> Iterator[OsmNode]:
+        for node_id in way.node_ids:
+            lon, lat = self.nodes[node_id]
+            yield OsmNode(id=node_id, lon=lon, lat=lat)
+
+    def get_store(self) -> NodeWayStore:
+        builder = StoreBuilder()
+        for node_id, (lon, lat) in self.nodes.items():
+            builder.add_node(node_id, lon, lat)
+        for way in self.ways:
+            builder.add_way(way.id, way.tags, way.node_ids)
+        return builder.build()
+
+    def get_ways(self) -> List[OsmWay]:
+        return self.ways
+
+    def get_centre(self) -> Tuple[float, float]:
+        return self.centre
@@ -0,0 +1,218 @@
+import http.client
+import overpy
+import queue
+import random
+import re
+import threading
+import time
+from scripts import profiler
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# The public Overpass servers give each client two slots, so more concurrent queries are only answered with 429s
+DEFAULT_SLOTS = 2
+MAX_RETRIES = 6
+BACKOFF = 2.0
+MAX_BACKOFF = 120.0
+TIMEOUT = 300.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_status(text: str) -> Optional[float]:
+    """
+    Get the seconds until a query slot is free from the text of the status endpoint of an Overpass server, or None if
+    it does not say.
+    """
+    available = re.search(r'(\d+) slots? available now', text)
+    if available is not None and int(available.group(1)) > 0:
+        return 0.0
+    waits = [float(seconds) for seconds in re.findall(r'in (-?\d+) seconds?', text)]
+    return max(0.0, min(waits)) if len(waits) > 0 else None
+
+
+class OverpassClient(overpy.Overpass):
+    """
+    Overpass API client for long runs against busy servers. It replaces the query of overpy.Overpass, which opens a
+    new connection for every query and gives up on the first busy server response, while keeping its parsing so that
+    results resolve missing elements through it as before.
+
+    Queries are sent over a pool of kept-alive connections, with at most slots of them running at a time, which is
+    bounded by semaphore instead when given one shared between processes. A query answered with 429 waits until the
+    status endpoint of the server reports a free slot, or for as long as Retry-After says. Timeouts, 5xx responses and
+    runtime errors reported by the server are retried with exponential backoff, up to max_retries times. Progress is
+    reported to log, and the numbers of queries, retries and bytes are counted by the active profiler.
+    """
+    def __init__(self, url: Optional[str] = None, slots: int = DEFAULT_SLOTS, semaphore=None,
+                 max_retries: int = MAX_RETRIES, backoff: float = BACKOFF, max_backoff: float = MAX_BACKOFF,
+                 timeout: float = TIMEOUT, log: Optional[Callable[[str], None]] = None):
+        super().__init__(url=url, max_retry_count=max_retries)
+        self.slots = slots
+        self.semaphore = semaphore if semaphore is not None else threading.BoundedSemaphore(slots)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.log = log
+        self.connections: queue.LifoQueue = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.retries = 0
+
+    def __getstate__(self):
+        # Connections and locks stay in the process that opened them, so a result pickled into the query cache or
+        # sent to another process gets a client with no open connections
+        state = self.__dict__.copy()
+        state['connections'] = None
+        state['lock'] = None
+        state['semaphore'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.connections = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.semaphore = threading.BoundedSemaphore(self.slots)
+
+    def get_connection(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """
+        Get an idle connection from the pool, or a new one. Get whether it was reused as well, as a reused connection
+        may have been closed by the server in the meantime.
+        """
+        try:
+            return self.connections.get_nowait(), True
+        except queue.Empty:
+            url = urlsplit(self.url)
+            cls = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+            return cls(url.hostname, url.port, timeout=self.timeout), False
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send a request over a pooled connection and read the whole response, retrying once on a new connection when a
+        reused one turns out to be closed.
+        """
+        target = urlsplit(url)
+        path = target.path + (f'?{target.query}' if target.query else '')
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body is not None else {}
+        while True:
+            connection, reused = self.get_connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self.connections.put(connection)
+            return response.status, {name.lower(): value for name, value in response.getheaders()}, content
+
+    def get_status_wait(self) -> Optional[float]:
+        try:
+            status, _, content = self.request('GET', re.sub(r'/interpreter$', '/status', self.url))
+        except (http.client.HTTPException, OSError):
+            return None
+        return parse_status(content.decode('utf-8', 'replace')) if status == 200 else None
+
+    def get_backoff(self, attempt: int) -> float:
+        # Jitter keeps the workers of a batch that were turned away together from coming back together
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def report(self, message: str):
+        if self.log is not None:
+            self.log(f'Overpass: {message}')
+
+    def query(self, query) -> overpy.Result:
+        if not isinstance(query, bytes):
+            query = query.encode('utf-8')
+        exceptions: List[Exception] = []
+        for attempt in range(self.max_retry_count + 1):
+            with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    status, headers, content = self.request('POST', self.url, query)
+                    if status == 200:
+                        result = self.parse(headers.get('content-type'), content)
+                        with self.lock:
+                            self.queries += 1
+                        profiler.count('overpass_queries')
+                        profiler.count('overpass_bytes', len(content))
+                        self.report(f'query {self.queries} answered in {time.perf_counter() - start:.1f}s, '
+                                    f'{len(content) / 1e6:.1f} MB')
+                        return result
+                except (http.client.HTTPException, OSError, overpy.exception.OverpassRuntimeError) as e:
+                    status, headers, error = None, {}, e
+                else:
+                    error = self.get_error(status, content)
+            exceptions.append(error)
+            if attempt == self.max_retry_count:
+                break
+            wait = self.get_wait(status, headers, attempt)
+            with self.lock:
+                self.retries += 1
+            profiler.count('overpass_retries')
+            self.report(f'{type(error).__name__}, retrying in {wait:.1f}s ({attempt + 1}/{self.max_retry_count})')
+            time.sleep(wait)
+        raise overpy.exception.MaxRetriesReached(retry_count=len(exceptions), exceptions=exceptions)
+
+    def parse(self, content_type: Optional[str], content: bytes) -> overpy.Result:
+        content_type = (content_type or '').split(';')[0].strip()
+        if content_type == 'application/json':
+            return self.parse_json(content)
+        if content_type == 'application/osm3s+xml':
+            return self.parse_xml(content)
+        raise overpy.exception.OverpassUnknownContentType(content_type)
+
+    def get_error(self, status: int, content: bytes) -> Exception:
+        """
+        Get the exception for a response with an error status, raising it if the query should not be retried.
+        """
+        if status == 400:
+            msgs = [self._regex_remove_tag.sub(b'', match.group('msg')).decode('utf-8', 'replace')
+                    for match in self._regex_extract_error_msg.finditer(content)]
+            raise overpy.exception.OverpassBadRequest(self.url, msgs=msgs)
+        if status == 429:
+            return overpy.exception.OverpassTooManyRequests()
+        if status == 504:
+            return overpy.exception.OverpassGatewayTimeout()
+        error = overpy.exception.OverpassUnknownHTTPStatusCode(status)
+        if status not in RETRY_STATUSES:
+            raise error
+        return error
+
+    def get_wait(self, status: Optional[int], headers: Dict[str, str], attempt: int) -> float:
+        if status == 429:
+            try:
+                return min(self.max_backoff, float(headers['retry-after']))
+            except (KeyError, ValueError):
+                pass
+            wait = self.get_status_wait()
+            if wait is not None:
+                # Slots are freed within the whole second reported, so spread the retries over it. A slot reported
+                # free may be taken again before the retry, so the wait is at least the backoff, which keeps the
+                # retries from all being spent at once
+                if wait > 0:
+                    wait += random.uniform(0.0, 1.0)
+                return min(self.max_backoff, max(wait, self.get_backoff(attempt)))
+        return self.get_backoff(attempt)
+
+
+_clients: Dict[str, Tuple[Tuple, OverpassClient]] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(slots: int = DEFAULT_SLOTS, semaphore=None,
+               log: Optional[Callable[[str], None]] = None) -> OverpassClient:
+    """
+    Get the client of this process for the default Overpass server, so that every data fetcher in a process reuses
+    the same connections and shares the same slots. The client is replaced by a new one when it was made with other
+    slots, semaphore or log.
+    """
+    url = overpy.Overpass.default_url
+    settings = (slots, semaphore, log)
+    with _clients_lock:
+        if url not in _clients or _clients[url][0] != settings:
+            _clients[url] = (settings, OverpassClient(url=url, slots=slots, semaphore=semaphore, log=log))
+        return _clients[url][1]
@@ -0,0 +1,312 @@
+import argparse
+import dataclasses
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial
+from scripts.cache import QueryCache
+from scripts.config import BoundingBox, Config
+from scripts.osm_file import OsmFileFetcher
+from scripts.profiler import Profiler
+from scripts.tiles import TiledFetcher
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+# networkx and scipy are only imported by the stages that need them, like overpy and matplotlib, so that the batch
+# parent process, which only hands out areas and formats their summaries, does not load them
+if TYPE_CHECKING:
+    from scripts.graph import GraphProcessing
+    from scripts.update import GraphUpdater, UpdateReport
+
+STRATEGIES = {
+    'overall': ('shortest_path_overall', 'path_overall'),
+    'centreTown': ('shortest_path_town_centre', 'path_town_centre'),
+    'centreLocal': ('shortest_path_local_centre', 'path_local_centre'),
+    'existing': ('shortest_path_existing', 'path_existing')
+}
+PLOT_FORMATS = ('svg', 'png')
+OUTPUTS = ('text', 'json')
+
+
+def get_data_fetcher(args: argparse.Namespace, config: Config, root: str):
+    if args.tiles is not None:
+        rows, cols = (int(n) for n in args.tiles.split('x'))
+        return TiledFetcher(config, partial(get_source_fetcher, args, root), rows, cols, workers=args.workers)
+    return get_source_fetcher(args, root, config)
+
+
+def get_source_fetcher(args: argparse.Namespace, root: str, config: Config, area: BoundingBox = None):
+    if args.osm_file is not None:
+        return OsmFileFetcher(config, args.osm_file, area=area)
+    # overpy is only imported when the network is read from Overpass
+    from scripts.data_fetcher import DataFetcher
+    from scripts.overpass import get_client
+    cache = None if args.no_cache else QueryCache(os.path.join(root, args.cache))
+    api = get_client(args.overpass_slots, args.overpass_semaphore, log=get_log(args))
+    return DataFetcher(config, cache=cache, offline=args.offline, area=area, api=api)
+
+
+@contextmanager
+def share_overpass_slots(args: argparse.Namespace) -> Iterator[None]:
+    """
+    Share the --overpass-slots between the worker processes of a batch or tiled run that queries Overpass, so that
+    they are bounded together rather than in each process.
+    """
+    args.overpass_semaphore = None
+    if (not args.batch and args.tiles is None) or args.osm_file is not None or args.offline:
+        yield
+        return
+    with multiprocessing.Manager() as manager:
+        args.overpass_semaphore = manager.BoundedSemaphore(args.overpass_slots)
+        try:
+            yield
+        finally:
+            args.overpass_semaphore = None
+
+
+def get_source(args: argparse.Namespace) -> str:
+    """
+    Identify where the network is read from, so that artifacts built from different sources are kept apart.
+    """
+    if args.osm_file is not None:
+        return f'{os.path.abspath(args.osm_file)}@{os.path.getmtime(args.osm_file)}'
+    return 'overpass'
+
+
+def get_updater_path(config: Config, args: argparse.Namespace, root: str) -> str:
+    from scripts.artifact import GraphArtifact
+    directory = os.path.join(root, args.artifacts)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{GraphArtifact.key(config, get_source(args))}.update.pickle')
+
+
+def update_area(config: Config, args: argparse.Namespace, root: str) -> Tuple['GraphUpdater', 'UpdateReport']:
+    """
+    Apply the osmChange file of args.update to the graphs kept from the last update of the area, or to graphs built
+    from the source if there are none yet.
+    """
+    from scripts.graph import GraphProcessing
+    from scripts.model import Model
+    from scripts.update import GraphUpdater, OsmChange
+    updater = GraphUpdater.load(get_updater_path(config, args, root))
+    if updater is None:
+        data_fetcher = get_data_fetcher(args, config, root)
+        model = Model(data_fetcher)
+        graph = GraphProcessing(model)
+        updater = GraphUpdater(model, graph, graph.preprocessing(), highways_only=data_fetcher.highways_only)
+    report = updater.apply(OsmChange.parse(args.update))
+    return updater, report
+
+
+def run_area(config: Config, args: argparse.Namespace, root: str, save_dir: str) -> Dict:
+    """
+    Run the DataFetcher, Model and GraphProcessing pipeline for the area of config, as set by the command line
+    arguments, and save the results to save_dir. Get a summary of the run with the time in seconds of each stage, and
+    with --profile a report of the memory and counts of every stage, which is also saved to profile.json.
+    """
+    profiler = Profiler(detailed=args.profile, cprofile_stage=args.cprofile, directory=save_dir)
+    with profiler.activate():
+        summary = run_stages(config, args, root, save_dir, profiler)
+    summary['timings'] = profiler.get_timings()
+    if args.profile:
+        get_log(args)(profiler.format())
+        profiler.save(os.path.join(save_dir, 'profile.json'))
+        summary['profile'] = profiler.report()
+    return summary
+
+
+def print_stderr(*values):
+    print(*values, file=sys.stderr)
+
+
+def get_log(args: argparse.Namespace):
+    """
+    Get the function to print messages with, which prints to stderr when stdout is kept for JSON output. The same
+    function is returned every time, so that the Overpass client of the process is kept between areas.
+    """
+    return print_stderr if args.output == 'json' else print
+
+
+def get_path_result(graph: 'GraphProcessing', dist: float, path: List[Tuple[int, int]]) -> Dict:
+    """
+    Describe a suggested path by its nodes, its edges, its length in km and its cost, which is less than the length
+    where the strategy treats cycle-friendly edges as free.
+    """
+    nodes = [path[0][0]] + [v for _, v in path] if len(path) > 0 else []
+    return {'length_km': graph.get_path_length(path), 'cost_km': dist, 'nodes': nodes,
+            'edges': [list(edge) for edge in path]}
+
+
+def get_component_results(graph: 'GraphProcessing', components: List[Set[int]]) -> List[Dict]:
+    return [{'size': len(component), 'length_km': graph.group_size(component), 'nodes': sorted(component)}
+            for component in components]
+
+
+def run_stages(config: Config, args: argparse.Namespace, root: str, save_dir: str, profiler: Profiler) -> Dict:
+    summary = {'area': config.area, 'status': 'ok'}
+    log = get_log(args)
+    # JSON output is meant for jobs that only need the numbers, so it skips the plots as well
+    plotting = not args.no_plot and args.output != 'json'
+
+    updater, report = None, None
+    artifact = None
+    if not args.no_artifacts and args.sweep is None and args.update is None:
+        from scripts.artifact import GraphArtifact
+        artifact = GraphArtifact(os.path.join(root, args.artifacts))
+    loaded = None
+    if args.update is not None:
+        with profiler.stage('update'):
+            updater, report = update_area(config, args, root)
+            graph, components = updater.graph, updater.get_components()
+        summary['update'] = {'ways': report.ways, 'edges': len(report.edges)}
+    elif artifact is not None:
+        with profiler.stage('load'):
+            loaded = artifact.load(config, get_source(args), hierarchy=args.hierarchy)
+    if loaded is not None:
+        graph, components = loaded
+    elif updater is None:
+        from scripts.graph import GraphProcessing
+        from scripts.model import Model
+        with profiler.stage('model'):
+            # The data fetcher is not kept once the model has copied the network into its compact store
+            model = Model(get_data_fetcher(args, config, root))
+        with profiler.stage('graph'):
+            graph = GraphProcessing(model)
+
+        if args.sweep is not None:
+            from scripts.sweep import ThresholdSweep
+            with profiler.stage('sweep'):
+                thresholds = [float(threshold) for threshold in args.sweep.split(',')]
+                results = ThresholdSweep(graph).run(thresholds)
+            log(ThresholdSweep.format_table(results))
+            with open(os.path.join(save_dir, 'sweep.json'), 'w') as f:
+                json.dump(results, f, indent=4)
+            summary['sweep'] = results
+            return summary
+
+        with profiler.stage('preprocessing'):
+            components = graph.preprocessing()
+    # The hierarchy is built before the artifact is saved, so that it is kept with the graphs
+    built = args.hierarchy and not graph.use_hierarchy
+    if built:
+        with profiler.stage('hierarchy'):
+            graph.build_hierarchy()
+    if artifact is not None and (loaded is None or built):
+        with profiler.stage('save'):
+            artifact.save(config, graph, components, get_source(args))
+
+    summary['nodes'] = graph.get_graph('graph').number_of_nodes()
+    summary['components'] = len(components)
+    results = {'components': get_component_results(graph, components)} if args.output == 'json' else None
+    # The plots are drawn together at the end, so that the base graph is only drawn once. Their layers are only
+    # made when plotting, as that imports matplotlib
+    plots = []
+
+    def plot(name, get_layers, *layer_args):
+        if plotting:
+            plots.append((get_layers(*layer_args), os.path.join(save_dir, f'{name}.{args.format}')))
+
+    plot('cycle_friendly', graph.get_component_layers)
+    plot('components', graph.get_component_layers, components)
+
+    if len(components) < 2:
+        log(f'{config.area}: graph is fully connected, no paths suggested')
+    elif args.connect_all:
+        from scripts.planner import NetworkPlanner
+        with profiler.stage('paths'):
+            suggested = NetworkPlanner(graph, components).plan(method=args.planner, budget=args.budget)
+        for i, path in enumerate(suggested):
+            log(f'{i + 1}: component {path.from_component} to {path.to_component}, {path.length:.3f} km')
+        log(f'{len(suggested)} paths suggested, {sum(path.length for path in suggested):.3f} km in total')
+        with open(os.path.join(save_dir, 'plan.json'), 'w') as f:
+            json.dump([dataclasses.asdict(path) for path in suggested], f, indent=4)
+        edges = [edge for path in suggested for edge in path.path]
+        plot('path_plan', graph.get_path_layers, edges, components[0], set().union(*components[1:]))
+        summary['suggested'] = len(suggested)
+        if results is not None:
+            results['plan'] = [dataclasses.asdict(path) for path in suggested]
+    else:
+        region_from, region_to = components[0], components[1]
+        summary['paths'] = {}
+        strategies = [strategy for strategy in STRATEGIES if config.strategies.get(strategy, False)]
+        # After an update, only the strategies whose paths may have changed are run again
+        rerun = updater.affected_strategies(report, strategies) if updater is not None else strategies
+        # The strategies share the searches from the same nodes
+        from scripts.trees import PathTrees
+        trees = PathTrees(graph)
+        with profiler.stage('paths'):
+            for strategy in strategies:
+                method, filename = STRATEGIES[strategy]
+                if strategy in rerun:
+                    with profiler.stage(strategy):
+                        dist, path = getattr(graph, method)(region_from, region_to, trees=trees)
+                else:
+                    dist, path = updater.results[strategy]
+                if updater is not None:
+                    updater.results[strategy] = (dist, path)
+                plot(filename, graph.get_path_layers, path, region_from, region_to)
+                summary['paths'][strategy] = dist
+                if results is not None:
+                    results.setdefault('paths', {})[strategy] = get_path_result(graph, dist, path)
+        summary['rerun'] = rerun
+
+    if results is not None:
+        summary['results'] = results
+        with open(os.path.join(save_dir, 'results.json'), 'w') as f:
+            json.dump(results, f)
+
+    if plotting:
+        with profiler.stage('display'):
+            graph.get_renderer().render_all(plots, workers=args.plot_workers)
+
+    if updater is not None:
+        with profiler.stage('save'):
+            updater.save(get_updater_path(config, args, root))
+    return summary
+
+
+def run_configured_area(config_json: Dict, area: str, args: argparse.Namespace, root: str) -> Dict:
+    """
+    Run the pipeline for one area of the configuration, saving its results to a directory named after the area.
+    Any error is recorded in the summary instead of raised, so that it does not stop the other areas.
+    """
+    start = time.perf_counter()
+    try:
+        config = Config.from_dict(config_json, area=area)
+        save_dir = os.path.join(root, args.save, area)
+        os.makedirs(save_dir, exist_ok=True)
+        summary = run_area(config, args, root, save_dir)
+    except Exception as e:
+        summary = {'area': area, 'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+    summary['total'] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(config_json: Dict, areas: List[str], args: argparse.Namespace, root: str,
+              workers: Optional[int] = None) -> List[Dict]:
+    """
+    Run the pipeline for every area over a pool of worker processes, and get their summaries in the order of areas.
+    """
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_configured_area, config_json, area, args, root): area for area in areas}
+        for future in as_completed(futures):
+            area = futures[future]
+            try:
+                summaries[area] = future.result()
+            except Exception as e:
+                # The worker itself died, for example because it ran out of memory
+                summaries[area] = {'area': area, 'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+    return [summaries[area] for area in areas]
+
+
+def format_summary(summaries: List[Dict]) -> str:
+    lines = [f"{'area':<20} {'status':<7} {'components':>11} {'time (s)':>9}  error"]
+    for summary in summaries:
+        components = summary.get('components', '-')
+        lines.append(f"{summary['area']:<20} {summary['status']:<7} {components:>11} {summary['total']:>9.2f}  "
+                     f"{summary.get('error', '')}".rstrip())
+    return '\n'.join(lines)
@@ -0,0 +1,194 @@
+import heapq
+from dataclasses import dataclass
+from itertools import count
+from scripts import profiler
+from scripts.graph import GraphProcessing
+from scripts.search import get_path
+from scripts.union_find import UnionFind
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+METHODS = ('greedy', 'mst')
+
+
+@dataclass
+class SuggestedPath:
+    from_component: int
+    to_component: int
+    path: List[Tuple[int, int]]
+    length: float
+
+
+class NetworkPlanner:
+    """
+    Suggest new paths until every component is connected, or until a budget in km of new path is spent.
+
+    The greedy method grows the network from the largest component, each time adding the shortest path from
+    everything connected so far, including earlier suggested paths, to the nearest other component. It keeps one
+    Dijkstra search, to which every suggested path and component reached are added as sources, so that later paths can
+    branch off earlier ones, and only the nodes brought closer by them are searched again.
+
+    The mst method accepts the shortest paths between pairs of components in order of length whenever they join two
+    parts of the network that are not yet connected. One Dijkstra search from every component at once labels each node
+    with its nearest component, as in Mehlhorn's approximation of Steiner trees. Each edge between the regions of two
+    components gives a path between them through it, and the shortest such path of every pair makes a graph of the
+    components. A minimum spanning tree of that graph is also one of the graph of shortest paths between every pair of
+    components, so the paths are selected from it instead of searching again from every component.
+    """
+    def __init__(self, graph: GraphProcessing, components: List[Set[int]]):
+        self.graph = graph
+        self.components = components
+        self.component_of: Dict[int, int] = {node: i for i, component in enumerate(components) for node in component}
+
+    def plan(self, method: str = 'greedy', budget: Optional[float] = None) -> List[SuggestedPath]:
+        if method == 'greedy':
+            return self.plan_greedy(budget)
+        if method == 'mst':
+            return self.plan_mst(budget)
+        raise ValueError(f"Unknown planner method '{method}', expected one of {METHODS}")
+
+    def plan_greedy(self, budget: Optional[float] = None) -> List[SuggestedPath]:
+        suggested: List[SuggestedPath] = []
+        if len(self.components) < 2:
+            return suggested
+        search = GrowingSearch(self.graph.graph_unfiltered, set(self.component_of.keys()) - self.components[0])
+        search.add_sources(self.components[0])
+        spent = 0
+        while True:
+            found = search.nearest()
+            if found is None:
+                break
+            dist, path = found
+            if budget is not None and spent + dist > budget:
+                break
+            spent += dist
+            to_component = self.component_of[path[-1]]
+            if path[0] in self.component_of:
+                from_component = self.component_of[path[0]]
+            else:
+                from_component = self.find_path_component(path[0], suggested)
+            suggested.append(SuggestedPath(from_component=from_component, to_component=to_component,
+                                           path=list(zip(path[:-1], path[1:])), length=dist))
+            search.remove_targets(self.components[to_component])
+            search.add_sources(path)
+            search.add_sources(self.components[to_component])
+        return suggested
+
+    def find_path_component(self, node: int, suggested: List[SuggestedPath]) -> int:
+        """
+        Get the component that a suggested path through node was built to reach.
+        """
+        for path in suggested:
+            if any(node in edge for edge in path.path):
+                return path.to_component
+        raise KeyError(f'Node {node} is not in any component or suggested path')
+
+    def plan_mst(self, budget: Optional[float] = None) -> List[SuggestedPath]:
+        candidates = [(dist, i, j, path) for (i, j), (dist, path) in self.get_component_paths().items()]
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        suggested: List[SuggestedPath] = []
+        connected = UnionFind()
+        spent = 0
+        for dist, i, j, path in candidates:
+            if len(suggested) == len(self.components) - 1:
+                break
+            if connected.find(i) == connected.find(j):
+                continue
+            if budget is not None and spent + dist > budget:
+                break
+            connected.union(i, j)
+            spent += dist
+            suggested.append(SuggestedPath(from_component=i, to_component=j, path=list(zip(path[:-1], path[1:])),
+                                           length=dist))
+        return suggested
+
+    def get_component_paths(self) -> Dict[Tuple[int, int], Tuple[float, List[int]]]:
+        """
+        Run one Dijkstra search from all components over the unfiltered graph, and get the shortest path through an
+        edge between the regions of components i < j for every such pair, as (distance, path) from i to j keyed by
+        (i, j).
+        """
+        profiler.count('dijkstra_runs')
+        adj = self.graph.graph_unfiltered.adj
+        dist: Dict[int, float] = {}
+        pred: Dict[int, int] = {}
+        label: Dict[int, int] = dict(self.component_of)
+        seen: Dict[int, float] = {node: 0 for node in self.component_of}
+        c = count()
+        fringe = [(0, next(c), node) for node in self.component_of]
+        heapq.heapify(fringe)
+        while fringe:
+            d, _, node = heapq.heappop(fringe)
+            if node in dist:
+                continue
+            dist[node] = d
+            for neighbour, data in adj[node].items():
+                neighbour_dist = d + data['length']
+                if neighbour not in dist and neighbour_dist < seen.get(neighbour, float('inf')):
+                    seen[neighbour] = neighbour_dist
+                    pred[neighbour] = node
+                    label[neighbour] = label[node]
+                    heapq.heappush(fringe, (neighbour_dist, next(c), neighbour))
+
+        best: Dict[Tuple[int, int], Tuple[float, int, int]] = {}
+        for u, u_dist in dist.items():
+            for v, data in adj[u].items():
+                if v in dist and label[u] < label[v]:
+                    d = u_dist + data['length'] + dist[v]
+                    if (label[u], label[v]) not in best or d < best[(label[u], label[v])][0]:
+                        best[(label[u], label[v])] = (d, u, v)
+        return {key: (d, get_path(pred, u) + get_path(pred, v)[::-1]) for key, (d, u, v) in best.items()}
+
+
+class GrowingSearch:
+    """
+    Dijkstra search from a set of sources that can grow, for the nearest of a set of targets that can shrink. Nodes
+    added as sources are given a distance of 0 and the search goes on from them, so that only the nodes they bring
+    closer are settled again. The search does not go on through targets, which is where paths to them end.
+    """
+    def __init__(self, graph, targets: Set[int]):
+        profiler.count('dijkstra_runs')
+        self.adj = graph.adj
+        self.targets = set(targets)
+        self.dist: Dict[int, float] = {}
+        self.pred: Dict[int, int] = {}
+        self.c = count()
+        self.fringe: List[Tuple[float, int, int]] = []
+        # Targets reached, by their distance when reached
+        self.reached: List[Tuple[float, int, int]] = []
+
+    def add_sources(self, nodes: Iterable[int]):
+        for node in nodes:
+            if self.dist.get(node, float('inf')) > 0:
+                self.dist[node] = 0
+                self.pred.pop(node, None)
+                heapq.heappush(self.fringe, (0, next(self.c), node))
+
+    def remove_targets(self, nodes: Iterable[int]):
+        self.targets.difference_update(nodes)
+
+    def nearest(self) -> Optional[Tuple[float, List[int]]]:
+        """
+        Find the shortest path from any source to any target, or None if no target can be reached.
+        """
+        adj, dist, pred, fringe, reached = self.adj, self.dist, self.pred, self.fringe, self.reached
+        while True:
+            while reached and (reached[0][2] not in self.targets or reached[0][0] > dist[reached[0][2]]):
+                heapq.heappop(reached)
+            # Nodes left in the fringe are no closer than its least key, so a target reached before that is nearest
+            if reached and (not fringe or reached[0][0] <= fringe[0][0]):
+                return reached[0][0], get_path(pred, reached[0][2])
+            if not fringe:
+                return None
+            d, _, node = heapq.heappop(fringe)
+            if d > dist[node]:
+                continue
+            if node in self.targets:
+                heapq.heappush(reached, (d, next(self.c), node))
+                continue
+            for neighbour, data in adj[node].items():
+                neighbour_dist = d + data['length']
+                if neighbour_dist < dist.get(neighbour, float('inf')):
+                    dist[neighbour] = neighbour_dist
+                    pred[neighbour] = node
+                    heapq.heappush(fringe, (neighbour_dist, next(self.c), neighbour))
@@ -0,0 +1,171 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Returned by stage when no profiler is active, so that disabled instrumentation costs one check per stage
+NULL_STAGE = nullcontext()
+
+
+@dataclass
+class StageRecord:
+    wall: float = 0.0
+    peak_rss: float = 0.0
+    calls: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+def get_peak_rss() -> float:
+    """
+    Get the peak resident memory of the process in MB, since the last reset_peak_rss where it is supported.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if peak > 1 << 32 else peak / 1024
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident memory to the current one, which only Linux supports. Elsewhere the peak of a stage is
+    the peak of the process up to the end of the stage.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class Profiler:
+    """
+    Record the wall time of the stages of a run. When detailed, it also records the peak resident memory of each
+    stage and counts such as the number of ways scored or Dijkstra runs, and stages can be nested, with the names of
+    nested stages joined by '/'. The stage named cprofile_stage, matched by its full or last name, is also run under
+    cProfile and its statistics are dumped to profile_<stage>.prof in directory.
+
+    Instrumented code calls the module functions stage and count, which only record anything while a detailed
+    profiler, or one with a cprofile_stage, is active, so that the stage to profile can be nested in them.
+    """
+    def __init__(self, detailed: bool = False, cprofile_stage: Optional[str] = None, directory: str = '.'):
+        self.detailed = detailed
+        self.cprofile_stage = cprofile_stage
+        self.directory = directory
+        self.stages: Dict[str, StageRecord] = {}
+        self.stack: List[str] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        path = '/'.join(self.stack + [name])
+        record = self.stages.setdefault(path, StageRecord())
+        if self.detailed:
+            if len(self.stack) > 0:
+                parent = self.stages['/'.join(self.stack)]
+                parent.peak_rss = max(parent.peak_rss, get_peak_rss())
+            reset_peak_rss()
+        self.stack.append(name)
+        profile = cProfile.Profile() if name == self.cprofile_stage or path == self.cprofile_stage else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(os.path.join(self.directory, f"profile_{path.replace('/', '_')}.prof"))
+            record.wall += time.perf_counter() - start
+            record.calls += 1
+            self.stack.pop()
+            if self.detailed:
+                record.peak_rss = max(record.peak_rss, get_peak_rss())
+                if len(self.stack) > 0:
+                    parent = self.stages['/'.join(self.stack)]
+                    parent.peak_rss = max(parent.peak_rss, record.peak_rss)
+
+    def add(self, name: str, n: int = 1):
+        record = self.stages.setdefault('/'.join(self.stack), StageRecord())
+        record.counts[name] = record.counts.get(name, 0) + n
+
+    @contextmanager
+    def activate(self) -> Iterator['Profiler']:
+        """
+        Make this the profiler that the module functions record to, if it is detailed or has a stage to profile.
+        """
+        global _active
+        previous = _active
+        if self.detailed or self.cprofile_stage is not None:
+            _active = self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+    def get_timings(self) -> Dict[str, float]:
+        """
+        Get the wall time of each top-level stage in seconds.
+        """
+        return {name: record.wall for name, record in self.stages.items() if '/' not in name and name != ''}
+
+    def get_counts(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for record in self.stages.values():
+            for name, n in record.counts.items():
+                totals[name] = totals.get(name, 0) + n
+        return totals
+
+    def report(self) -> Dict:
+        stages = {name: {'wall_s': record.wall, 'peak_rss_mb': record.peak_rss, 'calls': record.calls,
+                         'counts': record.counts}
+                  for name, record in self.stages.items() if name != ''}
+        return {'stages': stages, 'counts': self.get_counts()}
+
+    def save(self, filepath: str):
+        with open(filepath, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+
+    def format(self) -> str:
+        lines = [f"{'stage':<36} {'time (s)':>9} {'peak (MB)':>10}  counts"]
+        for name, record in self.stages.items():
+            if name == '':
+                continue
+            label = '  ' * name.count('/') + name.rsplit('/', 1)[-1]
+            counts = ', '.join(f'{key}={n}' for key, n in record.counts.items())
+            lines.append(f'{label:<36} {record.wall:>9.3f} {record.peak_rss:>10.1f}  {counts}'.rstrip())
+        return '\n'.join(lines)
+
+
+_active: Optional[Profiler] = None
+
+
+def stage(name: str):
+    """
+    Record a stage with the active profiler, if there is one.
+    """
+    if _active is None:
+        return NULL_STAGE
+    return _active.stage(name)
+
+
+def count(name: str, n: int = 1):
+    """
+    Add n to a count of the current stage of the active profiler, if there is one.
+    """
+    if _active is not None:
+        _active.add(name, n)
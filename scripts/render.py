@@ -0,0 +1,187 @@
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from matplotlib.figure import Figure
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+from scripts import profiler
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+Edge = Tuple[int, int]
+
+# The default colours and node size of nx.draw_networkx, which the plots were drawn with before
+NODE_COLOUR = '#1f78b4'
+EDGE_COLOUR = 'k'
+NODE_SIZE = 5
+
+
+@dataclass
+class Layer:
+    """
+    Part of the graph drawn over the base graph in one colour: the subgraph induced by nodes, and any other edges.
+    """
+    colour: Any
+    nodes: Collection[int] = ()
+    edges: Sequence[Edge] = ()
+
+
+class GraphRenderer:
+    """
+    Draw a graph and coloured layers over it with one path for the edges and one collection for the nodes of each
+    layer, instead of one nx.draw_networkx call per subgraph.
+
+    The base graph is drawn once on a figure that is kept, and each output only adds its layers, saves the figure and
+    removes them again. PNG outputs are simplified to their pixel grid: edges are snapped to pixel centres, and edges
+    and nodes that fall on the same pixels as others are dropped, which leaves the image unchanged for large graphs
+    while drawing far fewer shapes.
+    """
+    def __init__(self, graph: nx.Graph, layout: Dict[int, Tuple[float, float]], dpi: int = 100,
+                 figsize: Tuple[float, float] = (6.4, 4.8)):
+        self.dpi = dpi
+        self.figsize = figsize
+        self.nodes = np.array(list(layout.keys()), dtype=np.int64)
+        self.index_of = {node: i for i, node in enumerate(self.nodes.tolist())}
+        self.points = np.array(list(layout.values()), dtype=float).reshape(-1, 2)
+        self.graph_nodes = np.array([self.index_of[node] for node in graph.nodes], dtype=np.int64)
+        self.graph_edges = np.array([(self.index_of[u], self.index_of[v]) for u, v in graph.edges],
+                                    dtype=np.int64).reshape(-1, 2)
+        self.cells: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.fig: Optional[Figure] = None
+        self.ax = None
+        self.simplified = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['fig'], state['ax'] = None, None
+        return state
+
+    def get_limits(self) -> Tuple[np.ndarray, np.ndarray]:
+        low, high = self.points.min(axis=0), self.points.max(axis=0)
+        margin = np.maximum((high - low) * 0.05, 1e-9)
+        return low - margin, high + margin
+
+    def get_cell(self) -> np.ndarray:
+        """
+        Get the size of a pixel of a PNG output in the units of the layout, taking the whole figure as the axes so that
+        the cells are no larger than the pixels.
+        """
+        low, high = self.get_limits()
+        return (high - low) / (np.array(self.figsize) * self.dpi)
+
+    def get_layer(self, layer: Layer) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the indices of the nodes of a layer and the index pairs of its edges.
+        """
+        in_layer = np.zeros(len(self.nodes), dtype=bool)
+        in_layer[[self.index_of[node] for node in layer.nodes if node in self.index_of]] = True
+        edges = self.graph_edges[in_layer[self.graph_edges[:, 0]] & in_layer[self.graph_edges[:, 1]]]
+        nodes = self.graph_nodes[in_layer[self.graph_nodes]]
+        if len(layer.edges) > 0:
+            extra = np.array([(self.index_of[u], self.index_of[v]) for u, v in layer.edges], dtype=np.int64)
+            edges = np.concatenate([edges, extra])
+            nodes = np.union1d(nodes, extra.ravel())
+        return nodes, edges
+
+    def get_cells(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the pixel of each node of a PNG output, as one integer per pixel, and the centre of the pixel.
+        """
+        if self.cells is None:
+            low, _ = self.get_limits()
+            cell = self.get_cell()
+            cells = np.floor((self.points - low) / cell).astype(np.int64)
+            width = int(cells[:, 0].max()) + 1 if len(cells) > 0 else 1
+            self.cells = cells[:, 1] * width + cells[:, 0], low + (cells + 0.5) * cell
+        return self.cells
+
+    def get_shapes(self, nodes: np.ndarray, edges: np.ndarray, simplify: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the points of the nodes and the line segments of the edges, keeping only one node per pixel and one edge
+        per pair of different pixels if simplify is set.
+        """
+        if not simplify:
+            return self.points[nodes], self.points[edges]
+        keys, snapped = self.get_cells()
+        _, first = np.unique(keys[nodes], return_index=True)
+        points = snapped[nodes[first]]
+        u, v = keys[edges[:, 0]], keys[edges[:, 1]]
+        edges = edges[u != v]
+        pairs = np.stack([np.minimum(u, v), np.maximum(u, v)], axis=1)[u != v]
+        _, first = np.unique(pairs, axis=0, return_index=True)
+        return points, snapped[edges[first]]
+
+    def draw(self, ax, nodes: np.ndarray, edges: np.ndarray, simplify: bool, edge_colour, node_colour=None) -> list:
+        points, segments = self.get_shapes(nodes, edges, simplify)
+        # All edges form one path, which the SVG backend writes as a single element rather than one per edge
+        codes = np.tile([Path.MOVETO, Path.LINETO], len(segments))
+        lines = PathPatch(Path(segments.reshape(-1, 2), codes), fill=False, edgecolor=edge_colour, linewidth=1.0)
+        # Added as an artist, as the limits are fixed and add_patch would measure every edge to update them
+        ax.add_artist(lines)
+        scatter = ax.scatter(points[:, 0], points[:, 1], s=NODE_SIZE,
+                             c=[node_colour if node_colour is not None else edge_colour])
+        return [lines, scatter]
+
+    def draw_base(self, ax, simplify: bool):
+        ax.tick_params(axis='both', which='both', bottom=False, left=False, labelbottom=False, labelleft=False)
+        low, high = self.get_limits()
+        ax.set_xlim(low[0], high[0])
+        ax.set_ylim(low[1], high[1])
+        self.draw(ax, self.graph_nodes, self.graph_edges, simplify, EDGE_COLOUR, NODE_COLOUR)
+
+    def get_figure(self, simplify: bool) -> Figure:
+        if self.fig is None or self.simplified != simplify:
+            self.fig = Figure(figsize=self.figsize, dpi=self.dpi)
+            self.ax = self.fig.add_subplot()
+            self.draw_base(self.ax, simplify)
+            self.simplified = simplify
+        return self.fig
+
+    def render(self, layers: List[Layer], filepath: Optional[str] = None):
+        """
+        Draw the layers over the base graph, in order, and save the figure to filepath, or show it if there is none.
+        The format is taken from the extension of filepath.
+        """
+        if filepath is None:
+            fig, ax = plt.subplots()
+            self.draw_base(ax, False)
+            for layer in layers:
+                self.draw(ax, *self.get_layer(layer), False, layer.colour)
+            plt.show()
+            return
+        simplify = os.path.splitext(filepath)[1].lower() == '.png'
+        fig = self.get_figure(simplify)
+        artists = []
+        for layer in layers:
+            artists += self.draw(self.ax, *self.get_layer(layer), simplify, layer.colour)
+        fig.savefig(filepath)
+        for artist in artists:
+            artist.remove()
+
+    def render_all(self, jobs: List[Tuple[List[Layer], str]], workers: Optional[int] = None):
+        """
+        Render each (layers, filepath) job, over a pool of worker processes if workers is more than one. Each worker
+        draws the base graph once for all its jobs.
+        """
+        profiler.count('plots', len(jobs))
+        if workers is None or workers <= 1 or len(jobs) <= 1:
+            for layers, filepath in jobs:
+                self.render(layers, filepath)
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_worker_renderer, initargs=(self,)) as executor:
+            for future in [executor.submit(render_in_worker, layers, filepath) for layers, filepath in jobs]:
+                future.result()
+
+
+_worker_renderer: Optional[GraphRenderer] = None
+
+
+def set_worker_renderer(renderer: GraphRenderer):
+    global _worker_renderer
+    _worker_renderer = renderer
+
+
+def render_in_worker(layers: List[Layer], filepath: str):
+    _worker_renderer.render(layers, filepath)
@@ -0,0 +1,131 @@
+import heapq
+import networkx as nx
+from itertools import count
+from scripts import profiler
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Tuple, Union
+
+Weight = Union[str, Callable[[int, int, Dict], float]]
+
+
+def weight_function(weight: Weight) -> Callable[[int, int, Dict], float]:
+    if callable(weight):
+        return weight
+    return lambda u, v, data: data.get(weight, 1)
+
+
+class DijkstraTree:
+    """
+    Shortest path tree of a Dijkstra search from a set of sources, grown only as far as the targets asked for so far
+    need. Later queries for other targets continue the same search, so that several paths from the same sources cost
+    one search. Nodes are settled in the same order whatever the queries, so each query gives the path a new search
+    would.
+    """
+    def __init__(self, graph: nx.Graph, sources: Iterable[int], weight: Weight = 'length'):
+        profiler.count('dijkstra_runs')
+        self.adj = graph.adj
+        self.weight = weight_function(weight)
+        self.dist: Dict[int, float] = {}
+        self.pred: Dict[int, int] = {}
+        self.seen: Dict[int, float] = {}
+        self.rank: Dict[int, int] = {}
+        self.counted = 0
+        self.c = count()
+        self.fringe = []
+        for source in sources:
+            self.seen[source] = 0
+            heapq.heappush(self.fringe, (0, next(self.c), source))
+
+    def nearest(self, targets: Collection[int]) -> Tuple[float, List[int]]:
+        """
+        Find the shortest path to the node in targets that the search settles first.
+        """
+        settled = [node for node in targets if node in self.rank]
+        node = min(settled, key=self.rank.get) if len(settled) > 0 else self.grow(targets)
+        profiler.count('nodes_settled', len(self.dist) - self.counted)
+        self.counted = len(self.dist)
+        if node is None:
+            raise nx.NetworkXNoPath('No path between the source and target regions')
+        return self.dist[node], get_path(self.pred, node)
+
+    def grow(self, targets: Collection[int]) -> Optional[int]:
+        """
+        Settle nodes until one of targets is settled, and return it, or None if the search ends without one.
+        """
+        adj, weight, dist, pred, seen, fringe = self.adj, self.weight, self.dist, self.pred, self.seen, self.fringe
+        while fringe:
+            d, _, node = heapq.heappop(fringe)
+            if node in dist:
+                continue
+            dist[node] = d
+            self.rank[node] = len(self.rank)
+            for neighbour, data in adj[node].items():
+                neighbour_dist = d + weight(node, neighbour, data)
+                if neighbour not in dist and neighbour_dist < seen.get(neighbour, float('inf')):
+                    seen[neighbour] = neighbour_dist
+                    pred[neighbour] = node
+                    heapq.heappush(fringe, (neighbour_dist, next(self.c), neighbour))
+            if node in targets:
+                return node
+        return None
+
+
+def bidirectional_astar(graph: nx.Graph, source: int, target: int, bound_to: Callable[[int], Callable[[int], float]],
+                        weight: Weight = 'length') -> Tuple[float, List[int]]:
+    """
+    Find the shortest path from source to target with a bidirectional A* search, guided by bound_to(v)(u), a lower
+    bound of the distance between u and v that satisfies the triangle inequality, such as the great-circle distance.
+
+    Both searches use the average of the forward and reverse potentials, which keeps the reduced weight of every edge
+    non-negative in both directions, so the search stops as soon as the least keys of the two frontiers add up to the
+    length of the best path found. The frontier with fewer entries is expanded first.
+    """
+    weight = weight_function(weight)
+    profiler.count('astar_runs')
+    if source == target:
+        return 0, [source]
+    adj = graph.adj
+    to_target, to_source = bound_to(target), bound_to(source)
+    potentials: Dict[int, float] = {}
+
+    def potential(node: int) -> float:
+        if node not in potentials:
+            potentials[node] = (to_target(node) - to_source(node)) / 2
+        return potentials[node]
+
+    # Index 0 holds the forward search from source and index 1 the reverse search from target
+    signs = (1, -1)
+    dists: Tuple[Dict[int, float], Dict[int, float]] = ({}, {})
+    seen: Tuple[Dict[int, float], Dict[int, float]] = ({source: 0}, {target: 0})
+    preds: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+    c = count()
+    fringes = ([(potential(source), next(c), source)], [(-potential(target), next(c), target)])
+    best, meet = float('inf'), None
+
+    while fringes[0] and fringes[1] and fringes[0][0][0] + fringes[1][0][0] < best:
+        side = 0 if len(fringes[0]) <= len(fringes[1]) else 1
+        fringe, dist, other = fringes[side], dists[side], seen[1 - side]
+        _, _, node = heapq.heappop(fringe)
+        if node in dist:
+            continue
+        d = dist[node] = seen[side][node]
+        for neighbour, data in adj[node].items():
+            neighbour_dist = d + weight(node, neighbour, data)
+            if neighbour not in dist and neighbour_dist < seen[side].get(neighbour, float('inf')):
+                seen[side][neighbour] = neighbour_dist
+                preds[side][neighbour] = node
+                heapq.heappush(fringe, (neighbour_dist + signs[side] * potential(neighbour), next(c), neighbour))
+                if neighbour in other and neighbour_dist + other[neighbour] < best:
+                    best, meet = neighbour_dist + other[neighbour], neighbour
+
+    profiler.count('nodes_settled', len(dists[0]) + len(dists[1]))
+    if meet is None:
+        raise nx.NetworkXNoPath(f'No path between {source} and {target}')
+    return best, get_path(preds[0], meet) + list(reversed(get_path(preds[1], meet)))[1:]
+
+
+def get_path(pred: Dict[int, int], node: int) -> List[int]:
+    path = [node]
+    while node in pred:
+        node = pred[node]
+        path.append(node)
+    return list(reversed(path))
@@ -0,0 +1,283 @@
+import argparse
+import asyncio
+import copy
+import dataclasses
+import json
+import networkx as nx
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from scripts.config import Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.pipeline import STRATEGIES, get_data_fetcher, get_path_result
+from scripts.trees import PathTrees
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Graphs kept for thresholds other than the configured one, and results kept by the server
+MAX_GRAPHS = 4
+CACHE_SIZE = 1024
+MAX_BODY = 1 << 16
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        # Both are arguments of the exception so that it can be raised in a worker and unpickled by the server
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class PlanningService:
+    """
+    The queries the server answers, on the graphs of one area. Graphs at other thresholds than the configured one are
+    built from the same model when first asked for, and the last MAX_GRAPHS of them are kept. The searches of path
+    queries are kept with each graph, so that queries from the same component share them.
+    """
+    def __init__(self, graph: GraphProcessing, components: List[Set[int]]):
+        self.model = graph.model
+        self.threshold = graph.config.threshold
+        self.graphs: Dict[float, Tuple[GraphProcessing, List[Set[int]]]] = OrderedDict()
+        self.graphs[self.threshold] = (graph, components)
+        self.trees: Dict[float, PathTrees] = {self.threshold: PathTrees(graph)}
+
+    def get_graph(self, threshold: float) -> Tuple[GraphProcessing, List[Set[int]]]:
+        if threshold in self.graphs:
+            self.graphs.move_to_end(threshold)
+            return self.graphs[threshold]
+        # The model only depends on the threshold through its config, so the store and the scores are shared
+        model = copy.copy(self.model)
+        model.config = dataclasses.replace(self.model.config, threshold=threshold)
+        graph = GraphProcessing(model)
+        components = graph.preprocessing()
+        # Nor does the unfiltered graph, so its contraction hierarchy is shared as well
+        base = self.graphs[self.threshold][0]
+        graph.hierarchy, graph.use_hierarchy = base.hierarchy, base.use_hierarchy
+        self.graphs[threshold] = (graph, components)
+        self.trees[threshold] = PathTrees(graph)
+        others = [key for key in self.graphs if key != self.threshold]
+        if len(others) > MAX_GRAPHS:
+            del self.graphs[others[0]]
+            del self.trees[others[0]]
+        return self.graphs[threshold]
+
+    def list_components(self, threshold: float) -> Dict:
+        graph, components = self.get_graph(threshold)
+        return {
+            'threshold': threshold,
+            'components': [{'index': i, 'size': len(component), 'length_km': graph.group_size(component)}
+                           for i, component in enumerate(components)]
+        }
+
+    def shortest_path(self, strategy: str, from_index: int, to_index: int, threshold: float) -> Dict:
+        graph, components = self.get_graph(threshold)
+        for index in (from_index, to_index):
+            if not 0 <= index < len(components):
+                raise HTTPError(400, f'Component {index} does not exist, there are {len(components)}')
+        if from_index == to_index:
+            raise HTTPError(400, 'The components of a path must differ')
+        method, _ = STRATEGIES[strategy]
+        try:
+            dist, path = getattr(graph, method)(components[from_index], components[to_index],
+                                                trees=self.trees[threshold])
+        except nx.NetworkXNoPath:
+            raise HTTPError(404, f'No path between components {from_index} and {to_index}')
+        result = {'strategy': strategy, 'from': from_index, 'to': to_index, 'threshold': threshold}
+        result.update(get_path_result(graph, dist, path))
+        return result
+
+
+_worker_service: Optional[PlanningService] = None
+
+
+def set_worker_service(service: PlanningService):
+    global _worker_service
+    _worker_service = service
+
+
+def call_in_worker(method: str, *args):
+    return getattr(_worker_service, method)(*args)
+
+
+class PlanningServer:
+    """
+    An HTTP server answering queries on the graphs of one area, which are loaded once and kept warm:
+
+    GET /components?threshold=t     the components, largest first, with their sizes and lengths
+    GET /path?strategy=s&from=i&to=j&threshold=t
+                                    the path suggested by strategy s between components i and j
+    GET /threshold                  the threshold used when a query gives none
+    POST /threshold {"threshold": t}
+                                    change that threshold, and get the components at it
+
+    Queries run in a pool of worker processes, each holding its own copy of the service, so that searches do not block
+    each other or the server. Results are cached by query, and a query arriving while the same one runs waits for it.
+    Errors are not cached.
+    """
+    def __init__(self, service: PlanningService, workers: Optional[int] = None, cache_size: int = CACHE_SIZE):
+        self.service = service
+        self.threshold = service.threshold
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache: Dict[tuple, asyncio.Future] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> int:
+        """
+        Start the worker pool and listen on host and port. Get the port listened on, which is chosen by the system when
+        port is 0.
+        """
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=set_worker_service,
+                                            initargs=(self.service,))
+        # Start the workers before listening, as forked workers would otherwise inherit the sockets of the
+        # connections open at the time and keep them from closing
+        await asyncio.get_running_loop().run_in_executor(self.executor, os.getpid)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def query(self, method: str, *args):
+        key = (method,) + args
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return await asyncio.shield(self.cache[key])
+        self.misses += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, call_in_worker, method, *args)
+        self.cache[key] = future
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            if self.cache.get(key) is future:
+                del self.cache[key]
+            raise
+
+    def get_threshold(self, params: Dict[str, str]) -> float:
+        if 'threshold' not in params:
+            return self.threshold
+        return parse_threshold(params['threshold'])
+
+    async def route(self, method: str, path: str, params: Dict[str, str], body: bytes) -> Dict:
+        if path == '/components':
+            require_method(method, 'GET')
+            return await self.query('list_components', self.get_threshold(params))
+        if path == '/path':
+            require_method(method, 'GET')
+            strategy = params.get('strategy', 'overall')
+            if strategy not in STRATEGIES:
+                raise HTTPError(400, f'Unknown strategy {strategy}, expected one of {list(STRATEGIES)}')
+            try:
+                from_index, to_index = int(params.get('from', 0)), int(params.get('to', 1))
+            except ValueError:
+                raise HTTPError(400, 'from and to must be component indices')
+            return await self.query('shortest_path', strategy, from_index, to_index, self.get_threshold(params))
+        if path == '/threshold':
+            if method == 'GET':
+                return {'threshold': self.threshold}
+            require_method(method, 'POST')
+            try:
+                threshold = parse_threshold(json.loads(body or b'{}').get('threshold'))
+            except (json.JSONDecodeError, AttributeError):
+                raise HTTPError(400, 'Expected a JSON object with a threshold')
+            result = await self.query('list_components', threshold)
+            self.threshold = threshold
+            return result
+        raise HTTPError(404, f'Unknown path {path}')
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, result = 200, None
+            try:
+                method, path, params, body = await read_request(reader)
+                result = await self.route(method, path, params, body)
+            except HTTPError as e:
+                status, result = e.status, {'error': str(e)}
+            except Exception as e:
+                status, result = 500, {'error': f'{type(e).__name__}: {e}'}
+            content = json.dumps(result).encode('utf-8')
+            writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n'
+                         f'Content-Length: {len(content)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + content)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def require_method(method: str, allowed: str):
+    if method != allowed:
+        raise HTTPError(405, f'Expected {allowed}')
+
+
+def parse_threshold(value) -> float:
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, 'threshold must be a number')
+    if not 0 <= threshold <= 1:
+        raise HTTPError(400, 'threshold must be between 0 and 1')
+    return threshold
+
+
+async def read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        method, target = request_line[0], request_line[1]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if line == '':
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+    except (IndexError, ValueError):
+        raise HTTPError(400, 'Malformed request')
+    if length > MAX_BODY:
+        raise HTTPError(400, 'Request body too large')
+    body = await reader.readexactly(length) if length > 0 else b''
+    url = urlsplit(target)
+    params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return method.upper(), url.path, params, body
+
+
+def serve(config: Config, args: argparse.Namespace, root: str):
+    """
+    Build the graphs of the area of config as set by the command line arguments, and answer queries on them until
+    interrupted.
+    """
+    graph = GraphProcessing(Model(get_data_fetcher(args, config, root)))
+    components = graph.preprocessing()
+    if args.hierarchy:
+        graph.build_hierarchy()
+    service = PlanningService(graph, components)
+    server = PlanningServer(service, workers=args.workers)
+
+    async def run():
+        port = await server.start(args.host, args.port)
+        print(f'Serving {config.area} on http://{args.host}:{port}')
+        try:
+            await server.server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
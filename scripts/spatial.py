@@ -0,0 +1,162 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from scripts.geodesic import EARTH_RADIUS_M
+from typing import Collection, Dict, List, Optional, Tuple
+
+NEAREST_K = 16
+
+
+class IndexPart:
+    """
+    A k-d tree over the projected positions of some nodes, of which the entry of node i is points[i].
+    """
+    def __init__(self, part_id: int, nodes: List[int], points: np.ndarray):
+        self.id = part_id
+        self.nodes = nodes
+        self.points = points
+        self.tree = cKDTree(points)
+
+
+class SpatialIndex:
+    """
+    k-d trees over node positions, shared by every query.
+
+    Positions are projected onto a sphere of mean earth radius in geocentric coordinates in metres, so a search radius
+    is the same real distance at any latitude and in any direction. Distances between projected points are chords,
+    which are shorter than the great circle distance by less than a millimetre for points a kilometre apart.
+
+    The index starts as one tree over all nodes. An update adds a tree over only the nodes it adds or moves, and trees
+    of about the same size are merged, so that an update costs in proportion to its size, amortised, and there are
+    only logarithmically many trees. The old entries of moved and removed nodes are skipped by queries until the tree
+    holding them is merged, or all trees are merged once half of the entries are stale.
+    """
+    def __init__(self, layout: Dict[int, Tuple[float, float]]):
+        self.parts: List[IndexPart] = []
+        self.location: Dict[int, Tuple[int, int]] = {}
+        self.next_id = 0
+        nodes = list(layout.keys())
+        pos = np.array([layout[node] for node in nodes], dtype=np.float64).reshape(-1, 2)
+        self.add_part(nodes, self.project(pos[:, 0], pos[:, 1]))
+
+    @staticmethod
+    def project(lon, lat) -> np.ndarray:
+        lon, lat = np.radians(np.asarray(lon, dtype=np.float64)), np.radians(np.asarray(lat, dtype=np.float64))
+        return EARTH_RADIUS_M * np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+    @staticmethod
+    def chord(radius: float) -> float:
+        return 2 * EARTH_RADIUS_M * np.sin(min(radius / (2 * EARTH_RADIUS_M), np.pi / 2))
+
+    def __len__(self) -> int:
+        return len(self.location)
+
+    def __contains__(self, node: int) -> bool:
+        return node in self.location
+
+    def add_part(self, nodes: List[int], points: np.ndarray):
+        part = IndexPart(self.next_id, nodes, points.reshape(-1, 3))
+        self.next_id += 1
+        self.parts.append(part)
+        for i, node in enumerate(nodes):
+            self.location[node] = (part.id, i)
+
+    def is_live(self, part: IndexPart, i: int) -> bool:
+        return self.location.get(part.nodes[i]) == (part.id, i)
+
+    def live_entries(self, parts: List[IndexPart]) -> Tuple[List[int], np.ndarray]:
+        nodes, points = [], []
+        for part in parts:
+            live = [i for i in range(len(part.nodes)) if self.is_live(part, i)]
+            nodes += [part.nodes[i] for i in live]
+            points.append(part.points[live])
+        return nodes, np.concatenate(points) if len(points) > 0 else np.zeros((0, 3))
+
+    def update(self, layout: Dict[int, Tuple[float, float]], removed: Collection[int] = ()):
+        """
+        Add the nodes of layout, or move them if they are in the index, and remove the nodes in removed.
+        """
+        for node in removed:
+            self.location.pop(node, None)
+        nodes = list(layout.keys())
+        if len(nodes) > 0:
+            pos = np.array([layout[node] for node in nodes], dtype=np.float64).reshape(-1, 2)
+            self.add_part(nodes, self.project(pos[:, 0], pos[:, 1]))
+        while len(self.parts) > 1 and len(self.parts[-2].nodes) <= 2 * len(self.parts[-1].nodes):
+            self.merge(self.parts[-2:])
+        if sum(len(part.nodes) for part in self.parts) > 2 * len(self.location) + NEAREST_K:
+            self.merge(self.parts)
+
+    def merge(self, parts: List[IndexPart]):
+        nodes, points = self.live_entries(parts)
+        self.parts = self.parts[:len(self.parts) - len(parts)]
+        self.add_part(nodes, points)
+
+    def get_point(self, node: int) -> np.ndarray:
+        part_id, i = self.location[node]
+        return next(part for part in self.parts if part.id == part_id).points[i]
+
+    def query_pairs(self, radius: float) -> List[Tuple[int, int]]:
+        """
+        Find all pairs of nodes within radius metres of each other.
+        """
+        chord = self.chord(radius)
+        result = []
+        for part in self.parts:
+            if len(part.nodes) < 2:
+                continue
+            pairs = part.tree.query_pairs(chord, output_type='ndarray')
+            result += [(part.nodes[i], part.nodes[j]) for i, j in pairs.tolist()
+                       if self.is_live(part, i) and self.is_live(part, j)]
+        for k, part in enumerate(self.parts):
+            # Later parts are smaller, so each of their points is searched for in the earlier ones
+            for other in self.parts[:k]:
+                if len(part.nodes) == 0 or len(other.nodes) == 0:
+                    continue
+                for i, found in enumerate(part.tree.query_ball_tree(other.tree, chord)):
+                    if self.is_live(part, i):
+                        result += [(other.nodes[j], part.nodes[i]) for j in found if self.is_live(other, j)]
+        return result
+
+    def query_ball_point(self, node: int, radius: float) -> List[int]:
+        """
+        Find the nodes within radius metres of a node of the index, including itself.
+        """
+        point, chord = self.get_point(node), self.chord(radius)
+        return [part.nodes[i] for part in self.parts if len(part.nodes) > 0
+                for i in part.tree.query_ball_point(point, chord) if self.is_live(part, i)]
+
+    def nearest(self, pos: Tuple[float, float], nodes: Optional[Collection[int]] = None) -> int:
+        """
+        Find the node nearest to a (lon, lat) position, optionally only among the given nodes.
+
+        Each tree is searched for the nearest few nodes, then more, until one of them is in nodes. Once that would
+        search more nodes than there are in nodes, their distances are compared directly instead.
+        """
+        point = self.project(pos[0], pos[1])
+        if nodes is not None and len(nodes) == 0:
+            raise ValueError('Cannot find the nearest of no nodes')
+        best = None
+        for part in self.parts:
+            if len(part.nodes) == 0:
+                continue
+            k, found = NEAREST_K if nodes is not None else 1, None
+            while nodes is None or k < len(nodes):
+                dists, indices = part.tree.query(point, k=min(k, len(part.nodes)))
+                found = next(((d, part.nodes[i]) for d, i in zip(np.atleast_1d(dists).tolist(),
+                                                                np.atleast_1d(indices).tolist())
+                              if i < len(part.nodes) and self.is_live(part, i)
+                              and (nodes is None or part.nodes[i] in nodes)), None)
+                if found is not None or k >= len(part.nodes):
+                    break
+                k *= 4
+            else:
+                return self.nearest_brute_force(point, list(nodes))
+            if found is not None and (best is None or found[0] < best[0]):
+                best = found
+        if best is None:
+            raise ValueError('None of the nodes are in the index')
+        return best[1]
+
+    def nearest_brute_force(self, point: np.ndarray, nodes: List[int]) -> int:
+        points = np.array([self.get_point(node) for node in nodes]).reshape(-1, 3)
+        return nodes[int(np.argmin(((points - point) ** 2).sum(axis=1)))]
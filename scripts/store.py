@@ -0,0 +1,209 @@
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+
+class TagTable:
+    """
+    Interned table of (key, value) tag pairs, so that every distinct tag is stored once however many ways use it.
+    """
+    def __init__(self):
+        self.pairs: List[Tuple[str, str]] = []
+        self.index: Dict[Tuple[str, str], int] = {}
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __getitem__(self, item: int) -> Tuple[str, str]:
+        return self.pairs[item]
+
+    def intern(self, key: str, value: str) -> int:
+        pair = (key, value)
+        i = self.index.get(pair)
+        if i is None:
+            i = len(self.pairs)
+            self.pairs.append(pair)
+            self.index[pair] = i
+        return i
+
+
+class NodeWayStore:
+    """
+    Columnar store of the nodes and ways of an area.
+
+    Nodes are kept in arrays of OSM ids, longitudes and latitudes, sorted by id. The nodes of way i are
+    way_nodes[way_indptr[i]:way_indptr[i + 1]], given as indices into the node arrays, and its tags are
+    tag_table[t] for t in way_tags[tag_indptr[i]:tag_indptr[i + 1]].
+    """
+    def __init__(self, node_ids: np.ndarray, lon: np.ndarray, lat: np.ndarray, way_ids: np.ndarray,
+                 way_indptr: np.ndarray, way_nodes: np.ndarray, tag_table: TagTable, tag_indptr: np.ndarray,
+                 way_tags: np.ndarray):
+        self.node_ids = node_ids
+        self.lon = lon
+        self.lat = lat
+        self.way_ids = way_ids
+        self.way_indptr = way_indptr
+        self.way_nodes = way_nodes
+        self.tag_table = tag_table
+        self.tag_indptr = tag_indptr
+        self.way_tags = way_tags
+
+    @classmethod
+    def from_fetcher(cls, data_fetcher) -> 'NodeWayStore':
+        if hasattr(data_fetcher, 'get_store'):
+            return data_fetcher.get_store()
+        builder = StoreBuilder()
+        nodes_on_ways = data_fetcher.get_nodes_on_ways()
+        for way in data_fetcher.get_ways():
+            node_ids = []
+            for node in nodes_on_ways.get(way.id, []):
+                if node.id not in builder.node_index:
+                    builder.add_node(node.id, float(node.lon), float(node.lat))
+                node_ids.append(node.id)
+            builder.add_way(way.id, way.tags, node_ids)
+        return builder.build()
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def n_ways(self) -> int:
+        return len(self.way_ids)
+
+    def get_nodes(self, way: int) -> np.ndarray:
+        return self.way_nodes[self.way_indptr[way]:self.way_indptr[way + 1]]
+
+    def get_tags(self, way: int) -> Dict[str, str]:
+        return dict(self.tag_table[t] for t in self.way_tags[self.tag_indptr[way]:self.tag_indptr[way + 1]])
+
+    def select_ways(self, ways: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the nodes of the given ways as a CSR pair (indptr, nodes).
+        """
+        return select_rows(self.way_indptr, self.way_nodes, ways)
+
+    def take_ways(self, ways: np.ndarray) -> 'NodeWayStore':
+        """
+        Get a store of only the given ways and the nodes on them.
+        """
+        way_indptr, way_nodes = self.select_ways(ways)
+        used = np.unique(way_nodes)
+        rank = np.zeros(self.n_nodes, dtype=np.int32)
+        rank[used] = np.arange(len(used))
+        tag_indptr, way_tags = select_rows(self.tag_indptr, self.way_tags, ways)
+        return NodeWayStore(
+            node_ids=self.node_ids[used],
+            lon=self.lon[used],
+            lat=self.lat[used],
+            way_ids=self.way_ids[np.asarray(ways, dtype=np.int64)],
+            way_indptr=way_indptr,
+            way_nodes=rank[way_nodes],
+            tag_table=self.tag_table,
+            tag_indptr=tag_indptr,
+            way_tags=way_tags
+        )
+
+    @classmethod
+    def merge(cls, stores: List['NodeWayStore']) -> 'NodeWayStore':
+        """
+        Merge stores holding different ways into one store, joining the ways of different stores at the nodes with the
+        same OSM ids.
+        """
+        node_ids, first = np.unique(np.concatenate([store.node_ids for store in stores]), return_index=True)
+        tag_table = TagTable()
+        way_nodes, way_tags = [], []
+        way_indptr, tag_indptr = [np.zeros(1, dtype=np.int64)], [np.zeros(1, dtype=np.int64)]
+        n_way_nodes, n_way_tags = 0, 0
+        for store in stores:
+            way_nodes.append(np.searchsorted(node_ids, store.node_ids[store.way_nodes]).astype(np.int32))
+            way_indptr.append(store.way_indptr[1:] + n_way_nodes)
+            n_way_nodes += len(store.way_nodes)
+            tag_index = np.array([tag_table.intern(key, value) for key, value in store.tag_table.pairs],
+                                 dtype=np.int32)
+            way_tags.append(tag_index[store.way_tags])
+            tag_indptr.append(store.tag_indptr[1:] + n_way_tags)
+            n_way_tags += len(store.way_tags)
+        return cls(
+            node_ids=node_ids,
+            lon=np.concatenate([store.lon for store in stores])[first],
+            lat=np.concatenate([store.lat for store in stores])[first],
+            way_ids=np.concatenate([store.way_ids for store in stores]),
+            way_indptr=np.concatenate(way_indptr),
+            way_nodes=np.concatenate(way_nodes),
+            tag_table=tag_table,
+            tag_indptr=np.concatenate(tag_indptr),
+            way_tags=np.concatenate(way_tags)
+        )
+
+    def node_index(self, node_ids: Iterable[int]) -> np.ndarray:
+        node_ids = np.fromiter(node_ids, dtype=np.int64)
+        index = np.searchsorted(self.node_ids, node_ids)
+        found = index < self.n_nodes
+        found[found] = self.node_ids[index[found]] == node_ids[found]
+        if not np.all(found):
+            raise KeyError(f'Nodes {node_ids[~found].tolist()} are not in the store')
+        return index
+
+    def get_node_pos_by_ids(self, node_ids: List[int]) -> Dict[int, Tuple[float, float]]:
+        index = self.node_index(node_ids)
+        return dict(zip(node_ids, zip(self.lon[index].tolist(), self.lat[index].tolist())))
+
+
+def select_rows(indptr: np.ndarray, values: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the given rows of a CSR pair (indptr, values) as a new CSR pair.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts, ends = indptr[rows], indptr[rows + 1]
+    lengths = ends - starts
+    new_indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    offsets = np.repeat(starts - new_indptr[:-1], lengths)
+    return new_indptr, values[np.arange(new_indptr[-1]) + offsets]
+
+
+class StoreBuilder:
+    """
+    Accumulates nodes and ways one at a time and packs them into a NodeWayStore.
+    """
+    def __init__(self):
+        self.node_index: Dict[int, int] = {}
+        self.node_ids: List[int] = []
+        self.lon: List[float] = []
+        self.lat: List[float] = []
+        self.way_ids: List[int] = []
+        self.way_indptr: List[int] = [0]
+        self.way_nodes: List[int] = []
+        self.tag_table = TagTable()
+        self.tag_indptr: List[int] = [0]
+        self.way_tags: List[int] = []
+
+    def add_node(self, node_id: int, lon: float, lat: float):
+        self.node_index[node_id] = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.lon.append(lon)
+        self.lat.append(lat)
+
+    def add_way(self, way_id: int, tags: Dict[str, str], node_ids: List[int]):
+        self.way_ids.append(way_id)
+        self.way_nodes.extend(self.node_index[node_id] for node_id in node_ids)
+        self.way_indptr.append(len(self.way_nodes))
+        self.way_tags.extend(self.tag_table.intern(k, v) for k, v in tags.items())
+        self.tag_indptr.append(len(self.way_tags))
+
+    def build(self) -> NodeWayStore:
+        node_ids = np.array(self.node_ids, dtype=np.int64)
+        order = np.argsort(node_ids, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return NodeWayStore(
+            node_ids=node_ids[order],
+            lon=np.array(self.lon, dtype=np.float64)[order],
+            lat=np.array(self.lat, dtype=np.float64)[order],
+            way_ids=np.array(self.way_ids, dtype=np.int64),
+            way_indptr=np.array(self.way_indptr, dtype=np.int64),
+            way_nodes=rank[np.array(self.way_nodes, dtype=np.int64)].astype(np.int32),
+            tag_table=self.tag_table,
+            tag_indptr=np.array(self.tag_indptr, dtype=np.int64),
+            way_tags=np.array(self.way_tags, dtype=np.int32)
+        )
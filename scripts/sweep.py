@@ -0,0 +1,97 @@
+import heapq
+from scripts.graph import GraphProcessing
+from scripts.union_find import UnionFind
+from typing import Dict, List
+
+
+class ThresholdSweep:
+    """
+    Report how the cycle-friendly network is connected at many thresholds in one pass.
+
+    Every edge of the unfiltered graph is active at the score of the way it lies on, every node at the highest
+    threshold at which it is a node of the filtered graph, and every pair of close nodes once both its nodes are
+    active. Adding these in descending order into a union-find structure gives the components at every threshold
+    without rebuilding the graph. Component counts and node counts match a full rebuild. Component lengths are
+    summed over the edges of the unfiltered graph, which split ways at more points than the filtered graph does, so
+    they can be slightly longer than the lengths from GraphProcessing.group_size.
+    """
+    def __init__(self, graph: GraphProcessing, top: int = 2):
+        self.graph = graph
+        self.model = graph.model
+        self.top = top
+
+    def get_events(self) -> List[tuple]:
+        events = []
+        u, v, scores = self.model.get_segments(threshold=0)
+        edges: Dict[tuple, float] = {}
+        for edge_u, edge_v, score in zip(u.tolist(), v.tolist(), scores.tolist()):
+            edge = (edge_u, edge_v) if edge_u < edge_v else (edge_v, edge_u)
+            edges[edge] = max(score, edges.get(edge, score))
+        for (edge_u, edge_v), score in edges.items():
+            events.append((score, edge_u, edge_v, self.get_length(edge_u, edge_v), False))
+
+        activation = self.model.get_node_activation()
+        for node, score in activation.items():
+            events.append((score, node, None, 0, False))
+
+        # A pair of close nodes is linked once both are nodes of the graph, which may be before the way between them
+        # scores enough to be in it
+        pairs = self.graph.get_close_pairs(list(activation.keys()))
+        for (pair_u, pair_v), length in zip(pairs, self.graph.get_edge_lengths(pairs)):
+            events.append((min(activation[pair_u], activation[pair_v]), pair_u, pair_v, length, True))
+
+        events.sort(key=lambda event: event[0], reverse=True)
+        return events
+
+    def get_length(self, u: int, v: int) -> float:
+        edge_length = self.graph.edge_length
+        return edge_length[(u, v)] if (u, v) in edge_length else edge_length[(v, u)]
+
+    def run(self, thresholds: List[float]) -> List[Dict]:
+        events = self.get_events()
+        components = UnionFind()
+        length: Dict[int, float] = {}
+        node_count: Dict[int, int] = {}
+
+        def add(node):
+            if components.add(node):
+                length[node], node_count[node] = 0, 0
+
+        results = []
+        i = 0
+        for threshold in sorted(thresholds, reverse=True):
+            while i < len(events) and events[i][0] >= threshold:
+                _, u, v, edge_length, proximity = events[i]
+                add(u)
+                if v is None:
+                    node_count[components.find(u)] += 1
+                else:
+                    add(v)
+                    merged = components.union(u, v)
+                    if merged is not None:
+                        root, absorbed = merged
+                        length[root] += length.pop(absorbed)
+                        node_count[root] += node_count.pop(absorbed)
+                    # Close nodes are only linked where they join different components
+                    if merged is not None or not proximity:
+                        length[components.find(u)] += edge_length
+                i += 1
+
+            roots = [root for root, count in node_count.items() if count > 0]
+            top = heapq.nlargest(self.top, roots, key=length.get)
+            results.append({
+                'threshold': threshold,
+                'components': len(roots),
+                'largest_length': length[top[0]] if len(top) > 0 else 0,
+                'top_components': [{'nodes': node_count[root], 'length': length[root]} for root in top]
+            })
+        return sorted(results, key=lambda result: result['threshold'])
+
+    @staticmethod
+    def format_table(results: List[Dict]) -> str:
+        lines = [f"{'threshold':>10} {'components':>11} {'largest (km)':>13} {'second (km)':>12}"]
+        for result in results:
+            lengths = [component['length'] for component in result['top_components']] + [0, 0]
+            lines.append(f"{result['threshold']:>10.3f} {result['components']:>11} {lengths[0]:>13.3f} "
+                         f"{lengths[1]:>12.3f}")
+        return '\n'.join(lines)
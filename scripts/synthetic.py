@@ -0,0 +1,259 @@
+import math
+import numpy as np
+from dataclasses import dataclass
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
+from scipy.spatial import Delaunay
+from scripts.config import BoundingBox, Config
+from scripts.osm_file import OsmNode, OsmWay
+from scripts.geodesic import EARTH_RADIUS_M
+from scripts.store import NodeWayStore, StoreBuilder
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LAYOUTS = ('grid', 'organic')
+
+# Shares of highway values and of extra tags, roughly as in the ways of the areas in configuration.json
+HIGHWAY_VALUES = {
+    'residential': 0.40, 'service': 0.17, 'footway': 0.12, 'tertiary': 0.07, 'unclassified': 0.05,
+    'secondary': 0.04, 'path': 0.04, 'cycleway': 0.04, 'primary': 0.03, 'track': 0.04
+}
+MAXSPEEDS = {
+    'residential': ['20 mph', '30 mph'], 'unclassified': ['30 mph'], 'tertiary': ['30 mph', '40 mph'],
+    'secondary': ['30 mph', '40 mph'], 'primary': ['30 mph', '60 mph']
+}
+ROAD_CYCLEWAYS = ['lane', 'track', 'shared_lane']
+CYCLEWAY_SHARE = 0.2
+BICYCLE_SHARE = 0.3
+SURFACES = ['asphalt', 'paving_stones', 'gravel']
+
+# Distances in metres between junctions, between components, and the most shape nodes between two junctions
+SPACING = 100
+COMPONENT_GAP = 500
+MAX_SHAPE_NODES = 2
+# Share of the shortest Delaunay edges kept by the organic layout, besides those of the minimum spanning tree
+ORGANIC_EXTRA_EDGES = 0.35
+
+
+@dataclass
+class SyntheticNetwork:
+    """
+    A generated street network, with the nodes and highway-tagged ways of an OSM extract and a bounding box around it
+    whose centre node is the node nearest the middle of the first component.
+    """
+    nodes: Dict[int, Tuple[float, float]]
+    ways: List[OsmWay]
+    bounding_box: BoundingBox
+
+    def get_config(self, config_json: Dict, area: str = 'Synthetic') -> Config:
+        """
+        Get the configuration of config_json for the bounding box of the network.
+        """
+        box = self.bounding_box
+        config_json = dict(config_json, area=area, boundingBoxes={area: {
+            'nodeId': box.node_id, 'south': box.south, 'west': box.west, 'north': box.north, 'east': box.east
+        }})
+        return Config.from_dict(config_json)
+
+
+class SyntheticFetcher:
+    """
+    Data source serving a SyntheticNetwork in place of Overpass or an OSM extract.
+    """
+    highways_only = False
+
+    def __init__(self, config: Config, network: SyntheticNetwork):
+        self.config = config
+        self.network = network
+
+    def get_node_pos_by_ids(self, node_ids: List[int]) -> Dict[int, Tuple[float, float]]:
+        return {node_id: self.network.nodes[node_id] for node_id in node_ids}
+
+    def get_nodes_on_ways(self) -> Dict[int, List[OsmNode]]:
+        return {way.id: list(self.iter_nodes(way)) for way in self.network.ways}
+
+    def iter_nodes(self, way: OsmWay) -> Iterator[OsmNode]:
+        for node_id in way.node_ids:
+            lon, lat = self.network.nodes[node_id]
+            yield OsmNode(id=node_id, lon=lon, lat=lat)
+
+    def get_store(self) -> NodeWayStore:
+        builder = StoreBuilder()
+        for node_id, (lon, lat) in self.network.nodes.items():
+            builder.add_node(node_id, lon, lat)
+        for way in self.network.ways:
+            builder.add_way(way.id, way.tags, way.node_ids)
+        return builder.build()
+
+    def get_ways(self) -> List[OsmWay]:
+        return self.network.ways
+
+    def get_centre(self) -> Tuple[float, float]:
+        return self.network.nodes[self.network.bounding_box.node_id]
+
+
+def generate_network(layout: str = 'grid', nodes: int = 10000, ways: Optional[int] = None, components: int = 1,
+                     seed: int = 0, origin: Tuple[float, float] = (-2.80, 56.33)) -> SyntheticNetwork:
+    """
+    Generate a street network of about the given number of nodes and ways, split into the given number of components
+    that are COMPONENT_GAP metres apart, with its south-west corner at origin (lon, lat).
+
+    The grid layout is a jittered grid of junctions with a few streets missing, and the organic layout joins random
+    junctions by the edges of their minimum spanning tree and the shortest other edges of their Delaunay triangulation.
+    Streets between junctions get up to MAX_SHAPE_NODES shape nodes, and are chained into ways of about the same
+    number of streets. Without a number of ways, ways are about four streets long.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f'Unknown layout {layout}, expected one of {LAYOUTS}')
+    rng = np.random.default_rng(seed)
+    # Each junction has about two streets, each with one shape node on average
+    junctions = max(4, nodes // (3 * components))
+    streets_per_way = 4.0 if ways is None else max(1.0, 2 * junctions * components / ways)
+
+    positions: List[np.ndarray] = []
+    network_ways: List[List[int]] = []
+    offset = 0.0
+    n_nodes = 0
+    for _ in range(components):
+        points, edges = get_grid(junctions, rng) if layout == 'grid' else get_organic(junctions, rng)
+        points[:, 0] += offset - points[:, 0].min()
+        offset = points[:, 0].max() + COMPONENT_GAP
+        for chain in chain_edges(points, edges, streets_per_way, rng):
+            network_ways.append([n_nodes + node for node in chain])
+        positions.append(points)
+        n_nodes += len(points)
+    points = np.concatenate(positions)
+
+    # Shape nodes are numbered after the junctions, and shared by no other way
+    node_ids: List[List[int]] = []
+    shape_points = []
+    next_id = n_nodes
+    for chain in network_ways:
+        node_list = [chain[0]]
+        for u, v in zip(chain[:-1], chain[1:]):
+            n_shape = int(rng.integers(0, MAX_SHAPE_NODES + 1))
+            for k in range(1, n_shape + 1):
+                shape_points.append(points[u] + (points[v] - points[u]) * k / (n_shape + 1))
+                node_list.append(next_id)
+                next_id += 1
+            node_list.append(v)
+        node_ids.append(node_list)
+    if len(shape_points) > 0:
+        points = np.concatenate([points, np.array(shape_points)])
+
+    lon0, lat0 = origin
+    lat = lat0 + np.degrees(points[:, 1] / EARTH_RADIUS_M)
+    lon = lon0 + np.degrees(points[:, 0] / (EARTH_RADIUS_M * math.cos(math.radians(lat0))))
+    # OSM ids start at 1
+    network_nodes = {i + 1: (float(x), float(y)) for i, (x, y) in enumerate(zip(lon.tolist(), lat.tolist()))}
+    network_ways = [OsmWay(id=i + 1, tags=get_tags(rng), node_ids=[node + 1 for node in node_list])
+                    for i, node_list in enumerate(node_ids)]
+
+    first = positions[0]
+    middle = (first.min(axis=0) + first.max(axis=0)) / 2
+    centre = int(np.argmin(((first - middle) ** 2).sum(axis=1))) + 1
+    margin = 0.001
+    box = BoundingBox(node_id=centre, south=float(lat.min()) - margin, west=float(lon.min()) - margin,
+                      north=float(lat.max()) + margin, east=float(lon.max()) + margin)
+    return SyntheticNetwork(nodes=network_nodes, ways=network_ways, bounding_box=box)
+
+
+def get_grid(junctions: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the junctions in metres and the streets between them of a jittered grid, with a tenth of the streets that are
+    not needed to keep it connected missing.
+    """
+    side = max(2, int(round(math.sqrt(junctions))))
+    i, j = np.divmod(np.arange(side * side), side)
+    points = np.stack([j, i], axis=1) * SPACING + rng.normal(0, SPACING * 0.1, (side * side, 2))
+    index = i * side + j
+    horizontal = np.stack([index[j < side - 1], index[j < side - 1] + 1], axis=1)
+    vertical = np.stack([index[i < side - 1], index[i < side - 1] + side], axis=1)
+    edges = np.concatenate([horizontal, vertical])
+    weights = rng.random(len(edges))
+    return points, prune_edges(len(points), edges, weights, keep=0.9, rng=rng)
+
+
+def get_organic(junctions: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get random junctions in metres and streets along the edges of their minimum spanning tree and the shortest other
+    edges of their Delaunay triangulation.
+    """
+    side = math.sqrt(junctions) * SPACING
+    points = rng.random((junctions, 2)) * side
+    triangles = Delaunay(points).simplices
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [0, 2]]])
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    lengths = np.linalg.norm(points[edges[:, 0]] - points[edges[:, 1]], axis=1)
+    return points, prune_edges(len(points), edges, lengths, keep=ORGANIC_EXTRA_EDGES, rng=rng, by_weight=True)
+
+
+def prune_edges(n: int, edges: np.ndarray, weights: np.ndarray, keep: float, rng: np.random.Generator,
+                by_weight: bool = False) -> np.ndarray:
+    """
+    Keep the edges of the minimum spanning tree by weights, so that the junctions stay connected, and a share keep of
+    the other edges, either the lightest ones or random ones.
+    """
+    tree = minimum_spanning_tree(coo_matrix((weights + 1e-9, (edges[:, 0], edges[:, 1])), shape=(n, n))).tocoo()
+    in_tree = set(zip(np.minimum(tree.row, tree.col).tolist(), np.maximum(tree.row, tree.col).tolist()))
+    is_tree = np.array([(min(u, v), max(u, v)) in in_tree for u, v in edges.tolist()], dtype=bool)
+    others = np.flatnonzero(~is_tree)
+    if by_weight:
+        others = others[np.argsort(weights[others])]
+    else:
+        others = rng.permutation(others)
+    kept = np.concatenate([np.flatnonzero(is_tree), others[:int(len(others) * keep)]])
+    return edges[np.sort(kept)]
+
+
+def chain_edges(points: np.ndarray, edges: np.ndarray, streets_per_way: float,
+                rng: np.random.Generator) -> List[List[int]]:
+    """
+    Split the edges into chains of junctions, each of a random number of edges around streets_per_way, that continue
+    as straight as they can.
+    """
+    adj: List[List[int]] = [[] for _ in range(len(points))]
+    for e, (u, v) in enumerate(edges.tolist()):
+        adj[u].append(e)
+        adj[v].append(e)
+    used = np.zeros(len(edges), dtype=bool)
+    chains = []
+    for e in rng.permutation(len(edges)).tolist():
+        if used[e]:
+            continue
+        used[e] = True
+        u, v = edges[e].tolist()
+        chain = [u, v]
+        length = max(1, int(rng.poisson(streets_per_way - 1)) + 1)
+        # Extend the chain forwards, then backwards once it reaches a junction without unused streets
+        for _ in range(2):
+            while len(chain) - 1 < length:
+                prev, node = chain[-2], chain[-1]
+                options = [other for other in adj[node] if not used[other]]
+                if len(options) == 0:
+                    break
+                # The street most in line with the last one, as for a grid street crossing a junction
+                direction = points[node] - points[prev]
+                ends = [int(edges[other].sum()) - node for other in options]
+                turns = [np.dot(direction, points[end] - points[node]) /
+                         (np.linalg.norm(points[end] - points[node]) + 1e-9) for end in ends]
+                best = int(np.argmax(turns))
+                used[options[best]] = True
+                chain.append(ends[best])
+            chain.reverse()
+        chains.append(chain)
+    return chains
+
+
+def get_tags(rng: np.random.Generator) -> Dict[str, str]:
+    shares = np.array(list(HIGHWAY_VALUES.values()))
+    highway = list(HIGHWAY_VALUES.keys())[int(rng.choice(len(shares), p=shares / shares.sum()))]
+    tags = {'highway': highway}
+    if highway in MAXSPEEDS:
+        tags['maxspeed'] = MAXSPEEDS[highway][int(rng.integers(len(MAXSPEEDS[highway])))]
+    if highway in ('primary', 'secondary', 'tertiary') and rng.random() < CYCLEWAY_SHARE:
+        tags['cycleway'] = ROAD_CYCLEWAYS[int(rng.integers(len(ROAD_CYCLEWAYS)))]
+    if highway in ('footway', 'path', 'track') and rng.random() < BICYCLE_SHARE:
+        tags['bicycle'] = 'designated'
+    if rng.random() < 0.5:
+        tags['surface'] = SURFACES[int(rng.integers(len(SURFACES)))]
+    return tags
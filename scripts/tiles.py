@@ -0,0 +1,94 @@
+import dataclasses
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from scripts.config import BoundingBox, Config
+from scripts.store import NodeWayStore
+from typing import Callable, List, Optional, Tuple
+
+# Called with the config of a tile and the bounding box of the whole area, and returning a data fetcher for the tile
+FetcherFactory = Callable[[Config, BoundingBox], object]
+
+
+class TileGrid:
+    """
+    Grid of rows x cols equal tiles covering a bounding box, numbered row by row from the south west corner.
+    """
+    def __init__(self, box: BoundingBox, rows: int, cols: int):
+        self.box = box
+        self.rows = rows
+        self.cols = cols
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def get_tile(self, index: int) -> BoundingBox:
+        row, col = divmod(index, self.cols)
+        return dataclasses.replace(self.box, south=self.get_lat(row), north=self.get_lat(row + 1),
+                                   west=self.get_lon(col), east=self.get_lon(col + 1))
+
+    def get_lat(self, row: int) -> float:
+        # Both tiles along an edge compute it the same way, and the outer edges are those of the box
+        if row == self.rows:
+            return self.box.north
+        return self.box.south + (self.box.north - self.box.south) * row / self.rows
+
+    def get_lon(self, col: int) -> float:
+        if col == self.cols:
+            return self.box.east
+        return self.box.west + (self.box.east - self.box.west) * col / self.cols
+
+    def tile_of(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """
+        Get the index of the first tile containing each position, or -1 for positions outside the box. Positions on
+        the edge between two tiles are contained in both, as in BoundingBox.contains.
+        """
+        lon, lat = np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+        tile_of = np.full(lon.shape, -1, dtype=np.int64)
+        for index in reversed(range(len(self))):
+            tile = self.get_tile(index)
+            tile_of[(lon >= tile.west) & (lon <= tile.east) & (lat >= tile.south) & (lat <= tile.north)] = index
+        return tile_of
+
+
+def fetch_tile(make_fetcher: FetcherFactory, config: Config, grid: TileGrid,
+               index: int) -> Tuple[NodeWayStore, Tuple[float, float], bool]:
+    """
+    Fetch one tile and get the store of the ways it owns, together with the position of the centre node and whether
+    the source keeps only highway-tagged ways. A way is
+    owned by the first tile containing its first node, so that every way is owned by exactly one tile.
+    """
+    tile_config = dataclasses.replace(config, bounding_box=grid.get_tile(index))
+    fetcher = make_fetcher(tile_config, config.bounding_box)
+    store = NodeWayStore.from_fetcher(fetcher)
+    ways = np.flatnonzero(np.diff(store.way_indptr) > 0)
+    first = store.way_nodes[store.way_indptr[ways]]
+    owned = ways[grid.tile_of(store.lon[first], store.lat[first]) == index]
+    return store.take_ways(owned), fetcher.get_centre(), fetcher.highways_only
+
+
+class TiledFetcher:
+    """
+    Data source splitting the bounding box of config into a grid of tiles, which are fetched in parallel worker
+    processes and stitched together at the nodes they share.
+
+    Each worker only holds the network of one tile and the ways crossing its edges, and sends back the compact store
+    of the ways it owns. Ways crossing the edge of a tile keep all their nodes inside the bounding box, so the stitched
+    store holds the same ways and nodes as an untiled fetch, and the graphs built from it are the same.
+    """
+    def __init__(self, config: Config, make_fetcher: FetcherFactory, rows: int, cols: int,
+                 workers: Optional[int] = None):
+        self.config = config
+        self.grid = TileGrid(config.bounding_box, rows, cols)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch_tile, repeat(make_fetcher), repeat(config), repeat(self.grid),
+                                        range(len(self.grid))))
+        self.stores: List[NodeWayStore] = [store for store, _, _ in results]
+        self.centre = results[0][1]
+        self.highways_only = results[0][2]
+
+    def get_store(self) -> NodeWayStore:
+        return NodeWayStore.merge(self.stores)
+
+    def get_centre(self) -> Tuple[float, float]:
+        return self.centre
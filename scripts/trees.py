@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from scripts.csr import CsrGraph, CsrPathTree
+from scripts.search import DijkstraTree
+from typing import TYPE_CHECKING, Collection, Dict, FrozenSet, List, Set, Tuple, Union
+
+if TYPE_CHECKING:
+    from scripts.graph import GraphProcessing
+
+MAX_TREES = 8
+
+
+class PathTrees:
+    """
+    Shortest path trees over the unfiltered graph of a GraphProcessing, shared by the strategies run on it while it is
+    unchanged. A tree is kept for its edge costs, 'length' or 'existing', and its sources, and grows only as far as the
+    paths asked of it, so that paths from the same sources cost one search: from a region to other regions, and from a
+    centre node for both centre strategies. The last max_trees trees are kept.
+
+    With the networkx engine, a centre path is found by A* the first time it starts from a node, as a Dijkstra tree
+    costs more than A* for a single path, and from a tree from then on.
+    """
+    def __init__(self, graph: 'GraphProcessing', max_trees: int = MAX_TREES):
+        self.graph = graph
+        self.max_trees = max_trees
+        self.trees: Dict[Tuple[str, FrozenSet[int]], Union[DijkstraTree, CsrPathTree]] = OrderedDict()
+        self.costs = {}
+        self.asked: Set[Tuple[str, FrozenSet[int]]] = set()
+
+    def get_costs(self, name: str):
+        if name not in self.costs:
+            self.costs[name] = self.graph.get_costs(name)
+        return self.costs[name]
+
+    def get_tree(self, name: str, sources: Collection[int]) -> Union[DijkstraTree, CsrPathTree]:
+        key = (name, frozenset(sources))
+        if key in self.trees:
+            self.trees.move_to_end(key)
+            return self.trees[key]
+        costs = self.get_costs(name)
+        if isinstance(costs, CsrGraph):
+            tree = costs.shortest_path_tree(sources)
+        else:
+            tree = DijkstraTree(self.graph.graph_unfiltered, sources, weight=costs)
+        self.trees[key] = tree
+        if len(self.trees) > self.max_trees:
+            self.trees.popitem(last=False)
+        return tree
+
+    def nearest(self, name: str, sources: Collection[int], targets: Collection[int]) -> Tuple[float, List[int]]:
+        """
+        Find the shortest path from any node in sources to any node in targets with the named edge costs.
+        """
+        return self.get_tree(name, sources).nearest(targets)
+
+    def is_shared(self, name: str, sources: Collection[int]) -> bool:
+        """
+        Check whether paths from sources were asked for before, so that a tree from them pays off.
+        """
+        key = (name, frozenset(sources))
+        shared = key in self.asked or key in self.trees
+        self.asked.add(key)
+        return shared
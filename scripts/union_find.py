@@ -0,0 +1,43 @@
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class UnionFind:
+    """
+    Disjoint sets over hashable items, with union by size and path compression. Items are added on first use.
+    """
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.parent
+
+    def add(self, item: Hashable) -> bool:
+        if item in self.parent:
+            return False
+        self.parent[item] = item
+        self.size[item] = 1
+        return True
+
+    def find(self, item: Hashable) -> Hashable:
+        self.add(item)
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: Hashable, b: Hashable) -> Optional[Tuple[Hashable, Hashable]]:
+        """
+        Merge the sets containing a and b. Returns (root, absorbed) where root is the root of the merged set and
+        absorbed is the root that was merged into it, or None if a and b were already in the same set.
+        """
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return None
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size.pop(root_b)
+        return root_a, root_b
@@ -0,0 +1,400 @@
+import bz2
+import gzip
+import numpy as np
+import pickle
+from collections import Counter
+from dataclasses import dataclass, field
+from scripts.components import DynamicComponents
+from scripts.geodesic import haversine
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.osm_file import OsmWay
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse
+
+Edge = Tuple[int, int]
+
+# Straight-line distances between nodes are compared with path lengths with this margin, as the lengths of edges are
+# measured on the ellipsoid while the distances are measured on a sphere
+DISTANCE_MARGIN = 1.01
+
+
+@dataclass
+class OsmChange:
+    """
+    The nodes and ways created, modified and deleted by an osmChange (.osc) file.
+    """
+    nodes: Dict[int, Tuple[float, float]] = field(default_factory=dict)
+    ways: Dict[int, OsmWay] = field(default_factory=dict)
+    deleted_nodes: Set[int] = field(default_factory=set)
+    deleted_ways: Set[int] = field(default_factory=set)
+
+    @classmethod
+    def parse(cls, filepath: str) -> 'OsmChange':
+        change = cls()
+        if filepath.endswith('.gz'):
+            f = gzip.open(filepath, 'rb')
+        elif filepath.endswith('.bz2'):
+            f = bz2.open(filepath, 'rb')
+        else:
+            f = open(filepath, 'rb')
+        with f:
+            action = None
+            tags: Dict[str, str] = {}
+            node_ids: List[int] = []
+            for event, element in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag in ('create', 'modify', 'delete'):
+                        action = element.tag
+                    elif element.tag in ('node', 'way', 'relation'):
+                        # Relations are skipped, but their tags must not be added to those of the last way
+                        tags, node_ids = {}, []
+                    continue
+                if element.tag == 'tag':
+                    tags[element.get('k')] = element.get('v')
+                elif element.tag == 'nd':
+                    node_ids.append(int(element.get('ref')))
+                elif element.tag == 'node':
+                    change.add_node(action, int(element.get('id')), element.get('lon'), element.get('lat'))
+                    element.clear()
+                elif element.tag == 'way':
+                    change.add_way(action, OsmWay(id=int(element.get('id')), tags=tags, node_ids=node_ids))
+                    element.clear()
+                elif element.tag == 'relation':
+                    element.clear()
+        return change
+
+    def add_node(self, action: str, node_id: int, lon: Optional[str], lat: Optional[str]):
+        if action == 'delete':
+            self.deleted_nodes.add(node_id)
+            self.nodes.pop(node_id, None)
+        else:
+            self.nodes[node_id] = (float(lon), float(lat))
+            self.deleted_nodes.discard(node_id)
+
+    def add_way(self, action: str, way: OsmWay):
+        if action == 'delete':
+            self.deleted_ways.add(way.id)
+            self.ways.pop(way.id, None)
+        else:
+            self.ways[way.id] = way
+            self.deleted_ways.discard(way.id)
+
+
+@dataclass
+class UpdateReport:
+    ways: int = 0
+    added_edges: List[Edge] = field(default_factory=list)
+    removed_edges: List[Edge] = field(default_factory=list)
+    changed_edges: List[Edge] = field(default_factory=list)
+    regions_changed: bool = False
+
+    @property
+    def edges(self) -> List[Edge]:
+        return self.added_edges + self.removed_edges + self.changed_edges
+
+
+class SegmentIndex:
+    """
+    The segments that each way contributes to one graph, built as in Model.split_ways, with the number of ways that
+    contribute each edge and the connected components of the graph.
+    """
+    def __init__(self, graph, threshold: float, link_count: Counter):
+        self.graph = graph
+        self.threshold = threshold
+        self.link_count = link_count
+        self.segments: Dict[int, List[Edge]] = {}
+        self.way_count: Counter = Counter()
+        self.components = DynamicComponents(graph)
+
+    def split_way(self, node_ids: List[int]) -> List[Edge]:
+        if len(node_ids) == 0:
+            return []
+        split = [node_ids[0]] + [node for node in node_ids[1:-1] if self.link_count[node] > 1] + [node_ids[-1]]
+        return [(u, v) for u, v in zip(split[:-1], split[1:]) if u != v]
+
+
+class GraphUpdater:
+    """
+    Apply osmChange diffs to the graphs of a GraphProcessing in place, instead of fetching and rebuilding everything.
+
+    Only the ways touched by a diff are scored again, with Model.eval_way, and split into segments again, together with
+    the ways sharing a node whose number of links changed, since that decides where those ways are split. Edges are
+    added to and removed from both graphs, and the components are updated with DynamicComponents. Close nodes are
+    linked when they are new to a graph or moved, and the links of removed nodes go with them. The result matches a
+    full rebuild, except that close nodes are not linked again where an edit splits a component. Nodes of a way are
+    dropped unless their positions are already known or given by the diff, as for nodes outside the bounding box.
+    Ways are kept as the data source keeps them: only highway-tagged ways if highways_only, as from an OSM file, or
+    every way, as from Overpass.
+
+    The updater is pickled between runs together with the graph and the results of the strategies.
+    """
+    def __init__(self, model: Model, graph: GraphProcessing, components: List[Set[int]],
+                 highways_only: bool = False):
+        self.model = model
+        self.graph = graph
+        self.highways_only = highways_only
+        self.config = graph.config
+        self.box = self.config.bounding_box
+        store = model.store
+
+        node_ids = store.node_ids.tolist()
+        self.pos: Dict[int, Tuple[float, float]] = dict(zip(node_ids, zip(store.lon.tolist(), store.lat.tolist())))
+        self.ways: Dict[int, OsmWay] = {}
+        self.scores: Dict[int, float] = dict(zip(store.way_ids.tolist(), model.get_scores().tolist()))
+        self.node_ways: Dict[int, Set[int]] = {}
+        for i, way_id in enumerate(store.way_ids.tolist()):
+            nodes = [node_ids[node] for node in store.get_nodes(i).tolist()]
+            self.ways[way_id] = OsmWay(id=way_id, tags=store.get_tags(i), node_ids=nodes)
+            for node in nodes:
+                self.node_ways.setdefault(node, set()).add(way_id)
+
+        self.indexes = {
+            'graph': self.get_segment_index(graph.graph, self.config.threshold),
+            'graph_unfiltered': self.get_segment_index(graph.graph_unfiltered, 0)
+        }
+        self.regions: List[Set[int]] = [set(component) for component in components[:2]]
+        self.results: Dict[str, Tuple[float, List[Edge]]] = {}
+
+    def get_segment_index(self, graph, threshold: float) -> SegmentIndex:
+        ways = [way for way_id, way in self.ways.items() if self.scores[way_id] >= threshold]
+        index = SegmentIndex(graph, threshold, Counter(node for way in ways for node in way.node_ids))
+        for way in ways:
+            index.segments[way.id] = index.split_way(way.node_ids)
+            index.way_count.update((min(u, v), max(u, v)) for u, v in index.segments[way.id])
+        return index
+
+    def apply(self, change: OsmChange) -> UpdateReport:
+        report = UpdateReport()
+
+        moved, deleted = set(), set(change.deleted_nodes)
+        for node, (lon, lat) in change.nodes.items():
+            if not self.box.contains(lon, lat):
+                # Nodes moved out of the bounding box are dropped from their ways, as the data fetchers do
+                deleted.add(node)
+            elif self.pos.get(node) != (lon, lat):
+                moved.add(node)
+                self.pos[node] = (lon, lat)
+        deleted = {node for node in deleted if node in self.pos}
+        for node in deleted:
+            del self.pos[node]
+
+        touched = set(change.ways) | {way_id for way_id in change.deleted_ways if way_id in self.ways}
+        for node in moved | deleted:
+            touched |= self.node_ways.get(node, set())
+        report.ways = len(touched)
+
+        old_ways = {way_id: self.ways.get(way_id) for way_id in touched}
+        for way_id in touched:
+            self.update_way(way_id, change)
+
+        new_nodes, dropped, removed = {}, {}, []
+        for name, index in self.indexes.items():
+            new_nodes[name], dropped[name], removed_edges = self.update_segments(
+                index, old_ways, moved, report if name == 'graph_unfiltered' else None)
+            removed += removed_edges
+        for edge in removed:
+            if all(edge not in index.way_count for index in self.indexes.values()):
+                self.graph.edge_length.pop(edge, None)
+                self.graph.edge_length.pop((edge[1], edge[0]), None)
+
+        self.update_layout(new_nodes['graph_unfiltered'] | moved, dropped['graph_unfiltered'] | deleted)
+        for name, index in self.indexes.items():
+            self.connect_close_nodes(index, new_nodes[name] | {node for node in moved if index.graph.has_node(node)})
+        if len(touched) > 0:
+            self.graph.invalidate()
+
+        regions = self.get_components()[:2]
+        report.regions_changed = regions != self.regions
+        self.regions = [set(region) for region in regions]
+        return report
+
+    def update_way(self, way_id: int, change: OsmChange):
+        old_way = self.ways.pop(way_id, None)
+        if old_way is not None:
+            for node in old_way.node_ids:
+                self.node_ways.get(node, set()).discard(way_id)
+        self.scores.pop(way_id, None)
+
+        if way_id in change.deleted_ways:
+            return
+        way = change.ways.get(way_id, old_way)
+        if self.highways_only and 'highway' not in way.tags:
+            return
+        node_ids = [node for node in way.node_ids if node in self.pos]
+        if len(node_ids) == 0:
+            return
+        self.ways[way_id] = OsmWay(id=way_id, tags=way.tags, node_ids=node_ids)
+        self.scores[way_id] = self.model.eval_way(way)
+        for node in node_ids:
+            self.node_ways.setdefault(node, set()).add(way_id)
+
+    def update_segments(self, index: SegmentIndex, old_ways: Dict[int, Optional[OsmWay]], moved: Set[int],
+                        report: Optional[UpdateReport]) -> Tuple[Set[int], Set[int], List[Edge]]:
+        """
+        Split the touched ways of one graph again and patch the graph. Returns the nodes added to and removed from the
+        graph, and the edges from ways removed from it.
+        """
+        graph = index.graph
+        changed_links = set()
+        for way_id, old_way in old_ways.items():
+            if old_way is not None and way_id in index.segments:
+                for node in old_way.node_ids:
+                    index.link_count[node] -= 1
+                    changed_links.add(node)
+            if way_id in self.ways and self.scores[way_id] >= index.threshold:
+                for node in self.ways[way_id].node_ids:
+                    index.link_count[node] += 1
+                    changed_links.add(node)
+
+        affected = set(old_ways)
+        for node in changed_links:
+            affected |= {way_id for way_id in self.node_ways.get(node, set()) if way_id in index.segments}
+
+        removed: Counter = Counter()
+        added: Counter = Counter()
+        for way_id in affected:
+            for u, v in index.segments.pop(way_id, []):
+                removed[(min(u, v), max(u, v))] += 1
+            if way_id in self.ways and self.scores[way_id] >= index.threshold:
+                index.segments[way_id] = index.split_way(self.ways[way_id].node_ids)
+                for u, v in index.segments[way_id]:
+                    added[(min(u, v), max(u, v))] += 1
+        for node in changed_links:
+            if index.link_count[node] <= 0:
+                del index.link_count[node]
+
+        edges_added, edges_removed = [], []
+        for edge in set(removed) | set(added):
+            before = index.way_count[edge]
+            index.way_count[edge] += added[edge] - removed[edge]
+            if index.way_count[edge] <= 0:
+                del index.way_count[edge]
+                if before > 0:
+                    edges_removed.append(edge)
+            elif before == 0:
+                edges_added.append(edge)
+
+        # Add edges first, so that the components are those of the graph with both old and new edges when the old
+        # ones are removed
+        new_nodes = {node for edge in edges_added for node in edge if not graph.has_node(node)}
+        lengths = self.get_lengths(edges_added)
+        for (u, v), length in zip(edges_added, lengths):
+            graph.add_edge(u, v, length=length)
+            graph.nodes[u]['pos'], graph.nodes[v]['pos'] = self.pos[u], self.pos[v]
+            self.graph.edge_length[(u, v)] = length
+            index.components.add_edge(u, v, length)
+
+        new_edges = set(edges_added)
+        moved = [node for node in moved if graph.has_node(node)]
+        changed = [(u, v) for u, v in graph.edges(moved) if (min(u, v), max(u, v)) not in new_edges]
+        for (u, v), length in zip(changed, self.get_lengths(changed)):
+            index.components.change_length(u, length - graph.edges[u, v]['length'])
+            graph.edges[u, v]['length'] = length
+            graph.nodes[u]['pos'], graph.nodes[v]['pos'] = self.pos[u], self.pos[v]
+            if (u, v) in self.graph.edge_length or (v, u) in self.graph.edge_length:
+                self.graph.edge_length.pop((v, u), None)
+                self.graph.edge_length[(u, v)] = length
+
+        removed_edges = [(u, v, graph.edges[u, v]['length']) for u, v in edges_removed]
+        graph.remove_edges_from(edges_removed)
+        # Nodes left without an edge from a way are no longer split points, and their links to close nodes go too
+        dropped = {node for edge in edges_removed for node in edge
+                   if not any(tuple(sorted((node, neighbour))) in index.way_count for neighbour in graph.adj[node])}
+        for node in dropped:
+            removed_edges += [(node, neighbour, length) for _, neighbour, length in graph.edges(node, data='length')]
+        graph.remove_nodes_from(dropped)
+        index.components.remove_edges(removed_edges)
+        for node in dropped:
+            index.components.remove_node(node)
+
+        if report is not None:
+            report.added_edges += edges_added
+            report.removed_edges += [(u, v) for u, v, _ in removed_edges]
+            report.changed_edges += changed
+        return new_nodes, dropped, edges_removed
+
+    def update_layout(self, changed: Set[int], removed: Set[int]):
+        """
+        Update the layout and the spatial index of the graph for the nodes of the unfiltered graph that were added,
+        moved or removed, without building the index again over all nodes.
+        """
+        graph = self.graph.graph_unfiltered
+        layout = {node: self.pos[node] for node in changed if graph.has_node(node)}
+        removed = [node for node in removed if not graph.has_node(node)]
+        for node in removed:
+            self.graph.layout.pop(node, None)
+        self.graph.layout.update(layout)
+        self.graph.index.update(layout, removed)
+        self.graph.close_pairs = None
+
+    def connect_close_nodes(self, index: SegmentIndex, nodes: Iterable[int]):
+        """
+        Link the given nodes to the nodes within neighbour_radius of them in other components, as connect_close_nodes
+        does for the whole graph.
+        """
+        graph, components = index.graph, index.components
+        spatial = self.graph.index
+        pairs = set()
+        for node in nodes:
+            for other in spatial.query_ball_point(node, self.config.neighbour_radius):
+                if other != node and graph.has_node(other) and \
+                        components.component_of[node] != components.component_of[other]:
+                    pairs.add((min(node, other), max(node, other)))
+        pairs = sorted(pairs)
+        for (u, v), length in zip(pairs, self.get_lengths(pairs)):
+            graph.add_edge(u, v, length=length)
+            components.add_edge(u, v, length)
+
+    def get_lengths(self, edges: List[Edge]) -> List[float]:
+        if len(edges) == 0:
+            return []
+        for edge in edges:
+            for node in edge:
+                self.graph.layout[node] = self.pos[node]
+        return self.graph.get_edge_lengths(edges)
+
+    def get_components(self) -> List[Set[int]]:
+        return self.indexes['graph'].components.get_components()
+
+    def affected_strategies(self, report: UpdateReport, strategies: List[str]) -> List[str]:
+        """
+        Get the strategies whose paths may have changed. Every strategy is affected when the two largest components
+        changed. Otherwise the overall strategy is only affected by changed edges on its path, or with an end within
+        the length of its path of the first region, as no shorter path can reach any further. The other strategies
+        cost paths from fixed nodes or with cycle-friendly edges at no cost, so any changed edge affects them.
+        """
+        if report.regions_changed:
+            return list(strategies)
+        if len(report.edges) == 0:
+            return [strategy for strategy in strategies if strategy not in self.results]
+        affected = []
+        for strategy in strategies:
+            if strategy == 'overall' and strategy in self.results and \
+                    not self.near_path(report, *self.results[strategy]):
+                continue
+            affected.append(strategy)
+        return affected
+
+    def near_path(self, report: UpdateReport, dist: float, path: List[Edge]) -> bool:
+        path_edges = {tuple(sorted(edge)) for edge in path}
+        if any(tuple(sorted(edge)) in path_edges for edge in report.removed_edges + report.changed_edges):
+            return True
+        region = self.regions[0]
+        nodes = list({node for edge in report.edges for node in edge if node in self.pos})
+        nearest = [self.graph.index.nearest(self.pos[node], region) for node in nodes]
+        pos = np.array([self.pos[node] + self.pos[other] for node, other in zip(nodes, nearest)]).reshape(-1, 4)
+        distances = haversine(pos[:, 0], pos[:, 1], pos[:, 2], pos[:, 3])
+        return bool(np.any(distances <= dist * DISTANCE_MARGIN))
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> Optional['GraphUpdater']:
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
@@ -0,0 +1,127 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set, Tuple
+
+
+class OverpassStub:
+    """
+    Local stand-in for an Overpass server, answering the queries sent by DataFetcher and overpy from a fixed set of
+    nodes and ways. Every request is recorded in self.queries.
+
+    Each query is answered after delay seconds, and the first queries with the error statuses in failures, such as 429
+    or 504, as a busy server would. The status endpoint reports status. The most queries run at once and the client
+    connections seen are recorded as well.
+    """
+    def __init__(self, nodes: Dict[int, Tuple[float, float]], ways: Dict[int, List[int]], delay: float = 0.0,
+                 failures: List[int] = (), status: str = 'Rate limit: 2\n2 slots available now.\n'):
+        self.nodes = nodes
+        self.ways = ways
+        self.delay = delay
+        self.failures = list(failures)
+        self.status = status
+        self.queries: List[str] = []
+        self.active = 0
+        self.max_active = 0
+        self.clients: Set[Tuple[str, int]] = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.url = f'http://127.0.0.1:{self.server.server_port}/api/interpreter'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open between requests, as the Overpass servers do
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                query = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                with stub.lock:
+                    stub.queries.append(query)
+                    stub.clients.add(self.client_address)
+                    failure = stub.failures.pop(0) if len(stub.failures) > 0 else None
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    time.sleep(stub.delay)
+                    if failure is not None:
+                        self.send(failure, 'text/html', f'<html><body>Error {failure}</body></html>'.encode('utf-8'))
+                    else:
+                        self.send(*stub.respond(query))
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+            def do_GET(self):
+                if self.path.endswith('/status'):
+                    self.send(200, 'text/plain', stub.status.encode('utf-8'))
+                else:
+                    self.send(404, 'text/plain', b'')
+
+            def send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, query: str) -> Tuple[int, str, bytes]:
+        node_ids, way_ids = self.evaluate(query)
+        if '[out:json]' in query:
+            return 200, 'application/json', self.to_json(node_ids, way_ids)
+        return 200, 'application/osm3s+xml', self.to_xml(node_ids, way_ids)
+
+    def evaluate(self, query: str) -> Tuple[List[int], List[int]]:
+        bbox = re.search(r'nwr\(([-\d.]+), ([-\d.]+), ([-\d.]+), ([-\d.]+)\)', query)
+        if bbox:
+            south, west, north, east = map(float, bbox.groups())
+            node_ids = [n for n, (lat, lon) in self.nodes.items() if south <= lat <= north and west <= lon <= east]
+            inside = set(node_ids)
+            way_ids = [w for w, refs in self.ways.items() if inside.intersection(refs)]
+            return node_ids, way_ids
+        ways = re.search(r'way\((?:id:)?([\d,]+)\);\s*node\(w\)', query)
+        if ways:
+            way_ids = [int(w) for w in ways.group(1).split(',')]
+            node_ids = sorted({n for w in way_ids for n in self.ways[w]})
+            return node_ids, []
+        nodes = re.search(r'node\((?:id:)?([\d,]+)\)', query)
+        if nodes:
+            return [int(n) for n in nodes.group(1).split(',') if int(n) in self.nodes], []
+        return [], []
+
+    def to_xml(self, node_ids: List[int], way_ids: List[int]) -> bytes:
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+        for n in node_ids:
+            lat, lon = self.nodes[n]
+            lines.append(f'<node id="{n}" lat="{lat}" lon="{lon}"/>')
+        for w in way_ids:
+            lines.append(f'<way id="{w}">')
+            lines.extend(f'<nd ref="{n}"/>' for n in self.ways[w])
+            lines.append('<tag k="highway" v="cycleway"/>')
+            lines.append('</way>')
+        lines.append('</osm>')
+        return '\n'.join(lines).encode('utf-8')
+
+    def to_json(self, node_ids: List[int], way_ids: List[int]) -> bytes:
+        elements = [{'type': 'node', 'id': n, 'lat': self.nodes[n][0], 'lon': self.nodes[n][1]} for n in node_ids]
+        elements += [{'type': 'way', 'id': w, 'nodes': self.ways[w], 'tags': {'highway': 'cycleway'}}
+                     for w in way_ids]
+        return json.dumps({'elements': elements}).encode('utf-8')
@@ -0,0 +1,164 @@
+import dataclasses
+import json
+import networkx as nx
+import numpy as np
+import os
+import random
+import tempfile
+import unittest
+from scripts.artifact import ARTIFACT_VERSION, GraphArtifact
+from scripts.config import Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.store import StoreBuilder
+from unittest.mock import Mock
+
+
+class GraphArtifactTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config_json = {
+            'area': 'SomePlace',
+            'threshold': 0.5,
+            'neighbourEps': 0.0003,
+            'centreMethod': 'sweep',
+            'boundingBoxes': {
+                'SomePlace': {'nodeId': 1, 'south': 0, 'west': 0, 'north': 1, 'east': 1}
+            },
+            'weightedTags': {
+                'highway': {
+                    'weight': 1,
+                    'values': {'cycleway': 1, 'residential': 0.7, 'tertiary': 0.3, 'primary': 0.1}
+                }
+            }
+        }
+        self.config = Config.from_dict(self.config_json)
+
+        rng = random.Random(1)
+        builder = StoreBuilder()
+        for i in range(8):
+            for j in range(8):
+                builder.add_node(100 * i + j, 0.001 * i, 0.001 * j)
+        for way_id in range(30):
+            i, j = rng.randrange(8), rng.randrange(8)
+            nodes = [100 * i + j]
+            for _ in range(rng.randrange(1, 4)):
+                i, j = (min(7, i + 1), j) if rng.random() < 0.5 else (i, min(7, j + 1))
+                nodes.append(100 * i + j)
+            builder.add_way(way_id, {'highway': rng.choice(['cycleway', 'residential', 'primary'])}, nodes)
+        data_fetcher = Mock(config=self.config)
+        data_fetcher.get_store.return_value = builder.build()
+        data_fetcher.get_centre.return_value = (0.003, 0.003)
+
+        self.graph = GraphProcessing(Model(data_fetcher))
+        self.components = self.graph.preprocessing()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.artifact = GraphArtifact(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_save_load(self):
+        self.artifact.save(self.config, self.graph, self.components)
+
+        graph, components = self.artifact.load(self.config)
+
+        self.assertEqual(self.components, components)
+        self.assertEqual(self.graph.layout, graph.layout)
+        self.assertEqual(self.graph.centre, graph.centre)
+        for name in ['graph', 'graph_unfiltered']:
+            expected = {frozenset((u, v)): d for u, v, d in getattr(self.graph, name).edges(data='length')}
+            actual = {frozenset((u, v)): d for u, v, d in getattr(graph, name).edges(data='length')}
+            self.assertEqual(expected, actual)
+        self.assertEqual({frozenset(edge) for edge in self.graph.edge_length},
+                         {frozenset(edge) for edge in graph.edge_length})
+        reachable = nx.node_connected_component(graph.graph_unfiltered, min(components[0]))
+        to_component = next(component for component in components[1:] if len(component & reachable) > 0)
+        self.assertAlmostEqual(self.graph.shortest_path_existing(self.components[0], to_component)[0],
+                               graph.shortest_path_existing(components[0], to_component)[0])
+
+    def test_load_csr_memmapped(self):
+        self.artifact.save(self.config, self.graph, self.components)
+        config = dataclasses.replace(self.config, graph_engine='csr')
+
+        graph, components = self.artifact.load(config)
+
+        self.assertEqual(self.components, components)
+        for name in ['graph', 'graph_unfiltered']:
+            matrix = graph.get_csr(name).matrix
+            for array in [matrix.data, matrix.indices, matrix.indptr]:
+                while not isinstance(array, np.memmap) and array.base is not None:
+                    array = array.base
+                self.assertIsInstance(array, np.memmap)
+            expected = {frozenset((u, v)): d for u, v, d in getattr(self.graph, name).edges(data='length')}
+            actual = {frozenset((u, v)): d for u, v, d in graph.get_graph(name).edges(data='length')}
+            self.assertEqual(expected, actual)
+        reachable = nx.node_connected_component(self.graph.graph_unfiltered, min(components[0]))
+        to_component = next(component for component in components[1:] if len(component & reachable) > 0)
+        self.assertAlmostEqual(self.graph.shortest_path_existing(self.components[0], to_component)[0],
+                               graph.shortest_path_existing(components[0], to_component)[0])
+
+    def test_save_load_hierarchy(self):
+        self.graph.build_hierarchy()
+        self.artifact.save(self.config, self.graph, self.components)
+
+        graph, components = self.artifact.load(self.config, hierarchy=True)
+
+        self.assertEqual(self.graph.hierarchy.up, graph.hierarchy.up)
+        self.assertEqual(self.graph.hierarchy.middle, graph.hierarchy.middle)
+        self.assertTrue(graph.use_hierarchy)
+        reachable = nx.node_connected_component(graph.graph_unfiltered, min(components[0]))
+        to_component = next(component for component in components[1:] if len(component & reachable) > 0)
+        self.assertAlmostEqual(self.graph.shortest_path_overall(self.components[0], to_component)[0],
+                               graph.shortest_path_overall(components[0], to_component)[0])
+
+    def test_load_hierarchy_not_asked(self):
+        self.graph.build_hierarchy()
+        self.artifact.save(self.config, self.graph, self.components)
+
+        graph, _ = self.artifact.load(self.config)
+
+        self.assertIsNone(graph.hierarchy)
+        self.assertFalse(graph.use_hierarchy)
+
+    def test_save_stale_hierarchy(self):
+        self.graph.build_hierarchy()
+        self.graph.graph_unfiltered.remove_edge(*next(iter(self.graph.graph_unfiltered.edges)))
+        self.artifact.save(self.config, self.graph, self.components)
+
+        graph, _ = self.artifact.load(self.config, hierarchy=True)
+
+        self.assertIsNone(graph.hierarchy)
+
+    def test_load_missing(self):
+        self.assertIsNone(self.artifact.load(self.config))
+
+    def test_load_other_version(self):
+        self.artifact.save(self.config, self.graph, self.components)
+        meta_path = os.path.join(self.artifact.path(self.config), 'meta.json')
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        meta['version'] = ARTIFACT_VERSION - 1
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+        self.assertIsNone(self.artifact.load(self.config))
+
+    def test_load_expired(self):
+        self.artifact.save(self.config, self.graph, self.components)
+        self.artifact.ttl = -1
+
+        self.assertIsNone(self.artifact.load(self.config))
+
+    def test_key(self):
+        key = GraphArtifact.key(self.config)
+
+        self.assertEqual(key, GraphArtifact.key(Config.from_dict(self.config_json)))
+        self.assertNotEqual(key, GraphArtifact.key(self.config, source='extract.osm'))
+        self.config_json['centreMethod'] = 'exact'
+        self.assertEqual(key, GraphArtifact.key(Config.from_dict(self.config_json)))
+        self.config_json['threshold'] = 0.6
+        self.assertNotEqual(key, GraphArtifact.key(Config.from_dict(self.config_json)))
+        self.config_json['threshold'] = 0.5
+        self.config_json['weightedTags']['highway']['values']['primary'] = 0.2
+        self.assertNotEqual(key, GraphArtifact.key(Config.from_dict(self.config_json)))
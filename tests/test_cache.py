@@ -0,0 +1,53 @@
+import os
+import tempfile
+import time
+import unittest
+from scripts.cache import QueryCache
+
+
+class QueryCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = QueryCache(self.tmp_dir.name, ttl=60, max_size=None)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_query(self):
+        self.assertEqual(self.cache.key('node(1); out;'), self.cache.key('node(1); out;'))
+        self.assertNotEqual(self.cache.key('node(1); out;'), self.cache.key('node(2); out;'))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('node(1); out;'))
+
+    def test_put_get(self):
+        self.cache.put('node(1); out;', {'id': 1})
+
+        self.assertEqual({'id': 1}, self.cache.get('node(1); out;'))
+
+    def test_get_expired(self):
+        self.cache.put('node(1); out;', {'id': 1})
+        past = time.time() - 120
+        os.utime(self.cache.path('node(1); out;'), (past, past))
+
+        self.assertEqual({'id': 1}, self.cache.get('node(1); out;', allow_expired=True))
+        self.assertIsNone(self.cache.get('node(1); out;'))
+        self.assertFalse(os.path.exists(self.cache.path('node(1); out;')))
+
+    def test_evict_oldest_over_max_size(self):
+        self.cache.put('node(1); out;', 'a' * 100)
+        past = time.time() - 30
+        os.utime(self.cache.path('node(1); out;'), (past, past))
+        self.cache.max_size = 300
+
+        self.cache.put('node(2); out;', 'b' * 100)
+        self.cache.put('node(3); out;', 'c' * 100)
+
+        self.assertIsNone(self.cache.get('node(1); out;'))
+        self.assertEqual('c' * 100, self.cache.get('node(3); out;'))
+
+    def test_clear(self):
+        self.cache.put('node(1); out;', 1)
+        self.cache.clear()
+
+        self.assertEqual([], self.cache.entries())
@@ -0,0 +1,83 @@
+import networkx as nx
+import random
+import unittest
+from scripts.components import DynamicComponents
+
+
+class DynamicComponentsTestCase(unittest.TestCase):
+    def assert_components(self, graph: nx.Graph, components: DynamicComponents):
+        expected = {frozenset(component) for component in nx.connected_components(graph)}
+        self.assertEqual(expected, {frozenset(component) for component in components.get_components()})
+        for component in components.get_components():
+            label = components.component_of[next(iter(component))]
+            length = sum(d for _, _, d in graph.subgraph(component).edges(data='length'))
+            self.assertAlmostEqual(length, components.length[label])
+
+    def test_initial(self):
+        graph = nx.Graph()
+        graph.add_weighted_edges_from([(0, 1, 1.0), (1, 2, 2.0), (3, 4, 0.5)], weight='length')
+        components = DynamicComponents(graph)
+
+        self.assertEqual([{0, 1, 2}, {3, 4}], components.get_components())
+        self.assertEqual(3.0, components.length[components.component_of[0]])
+
+    def test_equal_lengths_ordered_by_least_node(self):
+        graph = nx.Graph()
+        graph.add_weighted_edges_from([(5, 6, 1.0), (7, 8, 2.0), (1, 9, 1.0)], weight='length')
+        components = DynamicComponents(graph)
+
+        graph.add_edge(0, 5, length=1.0)
+        components.add_edge(0, 5, 1.0)
+        graph.add_edge(2, 1, length=1.0)
+        components.add_edge(2, 1, 1.0)
+
+        # All three have a length of 2, as in the order of GraphProcessing.get_connected_components
+        self.assertEqual([{0, 5, 6}, {1, 2, 9}, {7, 8}], components.get_components())
+
+    def test_split(self):
+        graph = nx.path_graph(6)
+        nx.set_edge_attributes(graph, 1.0, 'length')
+        components = DynamicComponents(graph)
+
+        graph.remove_edge(1, 2)
+        components.remove_edges([(1, 2, 1.0)])
+
+        self.assertEqual([{2, 3, 4, 5}, {0, 1}], components.get_components())
+
+    def test_remove_node(self):
+        graph = nx.star_graph(3)
+        nx.set_edge_attributes(graph, 1.0, 'length')
+        components = DynamicComponents(graph)
+
+        edges = [(0, v, 1.0) for v in graph.adj[0]]
+        graph.remove_node(0)
+        components.remove_edges(edges)
+        components.remove_node(0)
+
+        self.assertEqual(3, len(components))
+        self.assert_components(graph, components)
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        graph = nx.gnm_random_graph(60, 70, seed=0)
+        nx.set_edge_attributes(graph, 1.0, 'length')
+        components = DynamicComponents(graph)
+
+        for _ in range(200):
+            if rng.random() < 0.5:
+                u, v = rng.sample(range(70), 2)
+                if not graph.has_edge(u, v):
+                    length = rng.random()
+                    graph.add_edge(u, v, length=length)
+                    components.add_edge(u, v, length)
+            elif rng.random() < 0.8 and graph.number_of_edges() > 0:
+                removed = rng.sample(sorted(graph.edges(data='length')), min(3, graph.number_of_edges()))
+                graph.remove_edges_from(removed)
+                components.remove_edges(removed)
+            elif graph.number_of_nodes() > 0:
+                node = rng.choice(sorted(graph.nodes))
+                removed = list(graph.edges(node, data='length'))
+                graph.remove_node(node)
+                components.remove_edges(removed)
+                components.remove_node(node)
+            self.assert_components(graph, components)
@@ -35,6 +35,26 @@ class ConfigTestCase(unittest.TestCase):
         self.assertEqual(Tag(weight=4, values={'val': 1}), weighted_tags['cycleway:right'])
         self.assertEqual(Tag(weight=0, values={}), weighted_tags['key_does_not_exist'])
 
+    def test_compiled_tags(self):
+        weighted_tags = WeightedTags({
+            'cycleway': {
+                'weight': 2,
+                'values': {'track': 1, 'lane': 0.5}
+            },
+            'maxspeed': {
+                'weight': 1,
+                'values': {'0,20': 1, '20,30': 0.5}
+            }
+        })
+
+        compiled_tags = weighted_tags.compile()
+
+        self.assertEqual(3, compiled_tags.max_score)
+        self.assertEqual({'track': 2, 'lane': 1}, compiled_tags.scores['cycleway:left'])
+        self.assertEqual([(0, 20, 1), (20, 30, 0.5)], compiled_tags.speed_ranges)
+        self.assertEqual(0.5, compiled_tags.score({'cycleway:both': 'lane', 'maxspeed': '25 mph'}))
+        self.assertEqual(0, compiled_tags.score({'cycleway': 'none', 'maxspeed': '40'}))
+
     def test_config(self):
         data = {
             'area': 'SomePlace',
@@ -47,6 +67,23 @@ class ConfigTestCase(unittest.TestCase):
         config = Config.from_dict(data)
 
         self.assertEqual('SomePlace', config.area)
+        self.assertEqual('ellipsoidal', config.length_method)
+        self.assertEqual('sweep', config.centre_method)
+        self.assertIsNone(config.neighbour_radius)
+
+    def test_config_neighbour_radius(self):
+        data = {
+            'area': 'SomePlace',
+            'neighbourEps': 0.001,
+            'boundingBoxes': {
+                'SomePlace': self.box_data
+            },
+            'weightedTags': {}
+        }
+
+        self.assertAlmostEqual(111.2, Config.from_dict(data).neighbour_radius, places=1)
+        data['neighbourRadius'] = 50
+        self.assertEqual(50, Config.from_dict(data).neighbour_radius)
 
     def test_config_no_such_area(self):
         data = {
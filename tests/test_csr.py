@@ -0,0 +1,190 @@
+import dataclasses
+import networkx as nx
+import numpy as np
+import random
+import tempfile
+import unittest
+from scripts.artifact import GraphArtifact
+from scripts.csr import CsrGraph
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.search import DijkstraTree
+from scripts.synthetic import SyntheticFetcher, generate_network
+
+
+class CsrGraphTestCase(unittest.TestCase):
+    @staticmethod
+    def random_graph(seed: int) -> nx.Graph:
+        rng = random.Random(seed)
+        graph = nx.gnm_random_graph(60, 90, seed=seed)
+        graph = nx.relabel_nodes(graph, {node: 1000 + 7 * node for node in graph})
+        for u, v in graph.edges:
+            graph.edges[u, v]['length'] = rng.random()
+        return graph
+
+    def test_networkx_round_trip(self):
+        graph = self.random_graph(0)
+
+        csr = CsrGraph.from_networkx(graph)
+
+        self.assertEqual(graph.number_of_nodes(), csr.number_of_nodes())
+        self.assertEqual(graph.number_of_edges(), csr.number_of_edges())
+        self.assertTrue(nx.utils.graphs_equal(graph, csr.to_networkx()))
+
+    def test_parallel_edges_keep_last(self):
+        node_ids = np.array([1, 2], dtype=np.int64)
+
+        csr = CsrGraph.from_edges(node_ids, np.array([1, 2]), np.array([2, 1]), np.array([3.0, 5.0]))
+
+        self.assertEqual([(1, 2, 5.0)], csr.edges(data='length'))
+
+    def test_shortest_path(self):
+        for seed in range(10):
+            graph = self.random_graph(seed)
+            csr = CsrGraph.from_networkx(graph)
+            rng = random.Random(seed)
+            sources = set(rng.sample(sorted(graph.nodes), 3))
+            targets = set(rng.sample(sorted(graph.nodes), 4)) - sources
+            try:
+                expected, expected_path = DijkstraTree(graph, sources).nearest(targets)
+            except nx.NetworkXNoPath:
+                with self.assertRaises(nx.NetworkXNoPath):
+                    csr.shortest_path(sources, targets)
+                continue
+
+            dist, path = csr.shortest_path(sources, targets)
+
+            self.assertAlmostEqual(expected, dist)
+            self.assertEqual(expected_path, path)
+
+    def test_zero_lengths(self):
+        graph = nx.Graph([(1, 2, {'length': 0.0}), (2, 3, {'length': 0.0}), (1, 3, {'length': 1.0})])
+
+        self.assertEqual((0.0, [1, 2, 3]), CsrGraph.from_networkx(graph).shortest_path([1], [3]))
+
+    def test_connected_components(self):
+        graph = self.random_graph(3)
+        csr = CsrGraph.from_networkx(graph)
+
+        components, lengths = csr.connected_components()
+
+        self.assertEqual(sorted(map(sorted, nx.connected_components(graph))), sorted(c.tolist() for c in components))
+        for component, length in zip(components, lengths):
+            subgraph = graph.subgraph(component.tolist())
+            self.assertAlmostEqual(subgraph.size(weight='length'), length)
+
+    def test_add_edges(self):
+        graph = self.random_graph(4)
+        csr = CsrGraph.from_networkx(graph)
+        u, v = 1000, 1000 + 7 * 59
+        graph.remove_edges_from([(u, v)])
+        csr = CsrGraph.from_networkx(graph)
+
+        added = csr.add_edges([(u, v, 0.5)])
+
+        self.assertEqual(csr.number_of_edges() + 1, added.number_of_edges())
+        self.assertEqual([True, False], added.has_edges(np.array([u, u]), np.array([v, 1])).tolist())
+        self.assertEqual([0.5], added.get_lengths([(v, u)]).tolist())
+
+    def test_unknown_node(self):
+        with self.assertRaises(nx.NodeNotFound):
+            CsrGraph.from_networkx(self.random_graph(0)).shortest_path([1], [1000])
+
+
+class GraphEngineTestCase(unittest.TestCase):
+    """
+    Cross-check the csr engine against the networkx engine on a synthetic network, which the threshold splits into
+    several components.
+    """
+    def setUp(self) -> None:
+        config_json = {
+            'threshold': 0.5,
+            'neighbourRadius': 20,
+            'strategies': {},
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'footway': 0.8, 'residential': 0.7,
+                                                    'tertiary': 0.3, 'primary': 0.1}}
+            },
+            'boundingBoxes': {}
+        }
+        self.network = generate_network('organic', nodes=3000, seed=3)
+        self.config = self.network.get_config(config_json)
+
+    def get_graph(self, engine: str) -> GraphProcessing:
+        config = dataclasses.replace(self.config, graph_engine=engine)
+        return GraphProcessing(Model(SyntheticFetcher(config, self.network)))
+
+    def test_same_components_and_paths(self):
+        graphs = {engine: self.get_graph(engine) for engine in ['networkx', 'csr']}
+        components = {engine: graph.preprocessing() for engine, graph in graphs.items()}
+
+        self.assertEqual(components['networkx'], components['csr'])
+        self.assertGreater(len(components['csr']), 2)
+        self.assertIsNone(graphs['csr'].graphs['graph'])
+        for component in components['csr'][:5]:
+            self.assertAlmostEqual(graphs['networkx'].group_size(component), graphs['csr'].group_size(component))
+        from_region, to_region = components['csr'][0], components['csr'][1]
+        for method in ['shortest_path_overall', 'shortest_path_town_centre', 'shortest_path_local_centre',
+                       'shortest_path_existing']:
+            expected_dist, expected_path = getattr(graphs['networkx'], method)(from_region, to_region)
+
+            dist, path = getattr(graphs['csr'], method)(from_region, to_region)
+
+            self.assertAlmostEqual(expected_dist, dist)
+            self.assertEqual(expected_path, path)
+
+    def test_centre_methods(self):
+        graphs = {engine: self.get_graph(engine) for engine in ['networkx', 'csr']}
+        nodes = {engine: graph.preprocessing()[1] for engine, graph in graphs.items()}
+
+        for method in ['exact', 'sweep', 'medoid']:
+            for graph in graphs.values():
+                graph.config = dataclasses.replace(graph.config, centre_method=method)
+
+            self.assertEqual(graphs['networkx'].get_centre_of_nodes(nodes['networkx']),
+                             graphs['csr'].get_centre_of_nodes(nodes['csr']))
+
+    def test_networkx_graphs_built_when_asked_for(self):
+        graph = self.get_graph('csr')
+        graph.preprocessing()
+
+        expected = self.get_graph('networkx')
+        expected.preprocessing()
+
+        for name in ['graph', 'graph_unfiltered']:
+            expected_edges = {frozenset((u, v)): d for u, v, d in getattr(expected, name).edges(data='length')}
+            actual_edges = {frozenset((u, v)): d for u, v, d in getattr(graph, name).edges(data='length')}
+            self.assertEqual(expected_edges, actual_edges)
+            self.assertEqual(dict(getattr(expected, name).nodes(data='pos')),
+                             dict(getattr(graph, name).nodes(data='pos')))
+
+    def test_changed_networkx_graph(self):
+        graph = self.get_graph('csr')
+        components = graph.preprocessing()
+        from_region, to_region = components[0], components[1]
+        u, v = min(from_region), min(to_region)
+
+        graph.graph_unfiltered.add_edge(u, v, length=0.0001)
+        graph.invalidate()
+
+        self.assertEqual((0.0001, [(u, v)]), graph.shortest_path_overall(from_region, to_region))
+
+    def test_artifact(self):
+        config = dataclasses.replace(self.config, graph_engine='csr')
+        graph = self.get_graph('csr')
+        components = graph.preprocessing()
+        with tempfile.TemporaryDirectory() as directory:
+            artifact = GraphArtifact(directory)
+            artifact.save(config, graph, components)
+
+            loaded, loaded_components = artifact.load(config)
+
+        self.assertEqual(components, loaded_components)
+        self.assertIsInstance(loaded.get_graph('graph'), CsrGraph)
+        self.assertEqual(graph.get_graph('graph').edges(data='length'), loaded.get_graph('graph').edges(data='length'))
+        self.assertEqual(graph.shortest_path_existing(components[0], components[1]),
+                         loaded.shortest_path_existing(components[0], components[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,17 @@
 import overpy
+import tempfile
 import unittest
+from scripts.cache import QueryCache
 from scripts.config import BoundingBox, Config
-from scripts.data_fetcher import DataFetcher
+from scripts.data_fetcher import CachedOverpass, DataFetcher
+from scripts.exception import CacheMissException
+from scripts.overpass import OverpassClient
+from tests.overpass_server import OverpassStub
 from unittest.mock import Mock, patch, call
 
 
 class DataFetcherTestCase(unittest.TestCase):
-    @patch('overpy.Overpass')
+    @patch('scripts.data_fetcher.get_client')
     def setUp(self, mock_api) -> None:
         self.mock_api = mock_api
         self.mock_config = Mock(spec=Config)
@@ -44,6 +49,17 @@ class DataFetcherTestCase(unittest.TestCase):
 
         self.assertEqual(expected, mapping)
 
+    def test_resolve_missing_nodes_complete(self):
+        mock_result = Mock(spec=overpy.Result)
+        mock_way = Mock(spec=overpy.Way)
+        mock_way.get_nodes.return_value = [self.mock_node]
+        mock_result.ways = [mock_way]
+        self.data_fetcher.result = mock_result
+
+        self.data_fetcher.resolve_missing_nodes()
+
+        mock_result.expand.assert_not_called()
+
     def test_get_ways(self):
         mock_result = Mock(spec=overpy.Result)
         mock_result.ways = []
@@ -85,3 +101,95 @@ class DataFetcherTestCase(unittest.TestCase):
         in_area = self.data_fetcher.node_in_area(mock_node)
 
         self.assertTrue(in_area)
+
+
+class DataFetcherServerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock_config = Mock(spec=Config)
+        self.mock_config.bounding_box = BoundingBox(node_id=123, south=0.1, west=0.2, north=0.3, east=0.4)
+
+        self.nodes = {123: (0.2, 0.3)}
+        self.ways = {}
+        for i in range(50):
+            inside, outside = 1000 + 2 * i, 1001 + 2 * i
+            self.nodes[inside] = (0.2, 0.2 + 0.001 * i)
+            self.nodes[outside] = (0.35, 0.2 + 0.001 * i)
+            self.ways[i] = [inside, outside]
+
+    def test_get_nodes_on_ways_batched(self):
+        with OverpassStub(self.nodes, self.ways) as server, patch.object(overpy.Overpass, 'default_url', server.url):
+            data_fetcher = DataFetcher(self.mock_config)
+            mapping = data_fetcher.get_nodes_on_ways()
+
+        self.assertEqual(3, len(server.queries))
+        self.assertEqual({i: [1000 + 2 * i] for i in range(50)},
+                         {way_id: [node.id for node in nodes] for way_id, nodes in mapping.items()})
+
+    def test_get_nodes_on_ways_unbatched(self):
+        with OverpassStub(self.nodes, self.ways) as server, patch.object(overpy.Overpass, 'default_url', server.url):
+            data_fetcher = DataFetcher(self.mock_config)
+            for way in data_fetcher.result.ways:
+                way.get_nodes(resolve_missing=True)
+
+        self.assertEqual(2 + len(self.ways), len(server.queries))
+
+    @patch('scripts.data_fetcher.RESOLVE_CHUNK_SIZE', 10)
+    def test_get_nodes_on_ways_slots(self):
+        with OverpassStub(self.nodes, self.ways, delay=0.1) as server:
+            data_fetcher = DataFetcher(self.mock_config, api=OverpassClient(url=server.url, slots=3))
+            data_fetcher.get_nodes_on_ways()
+
+        self.assertEqual(2 + 5, len(server.queries))
+        self.assertEqual(3, server.max_active)
+
+    def test_busy_server(self):
+        with OverpassStub(self.nodes, self.ways, delay=0.01, failures=[429, 504, 429]) as server:
+            data_fetcher = DataFetcher(self.mock_config, api=OverpassClient(url=server.url, backoff=0.01))
+            mapping = data_fetcher.get_nodes_on_ways()
+
+        self.assertEqual(6, len(server.queries))
+        self.assertEqual({i: [1000 + 2 * i] for i in range(50)},
+                         {way_id: [node.id for node in nodes] for way_id, nodes in mapping.items()})
+
+
+class CachedOverpassTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = QueryCache(self.tmp_dir.name)
+        self.api = overpy.Overpass()
+        self.api.query = Mock(side_effect=lambda query: self.api.parse_xml(
+            '<osm><node id="1" lat="0.1" lon="0.2"/></osm>'))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_query_cached(self):
+        api = CachedOverpass(self.api, self.cache)
+
+        api.query('node(1); out;')
+        result = api.query('node(1); out;')
+
+        self.api.query.assert_called_once_with('node(1); out;')
+        self.assertEqual([1], result.get_node_ids())
+        self.assertIs(api, result.api)
+
+    def test_query_offline_hit(self):
+        CachedOverpass(self.api, self.cache).query('node(1); out;')
+        api = CachedOverpass(self.api, self.cache, offline=True)
+
+        result = api.query('node(1); out;')
+
+        self.api.query.assert_called_once_with('node(1); out;')
+        self.assertEqual([1], result.get_node_ids())
+
+    def test_query_offline_miss(self):
+        api = CachedOverpass(self.api, self.cache, offline=True)
+
+        with self.assertRaises(CacheMissException):
+            api.query('node(1); out;')
+        self.api.query.assert_not_called()
+
+    @patch('scripts.data_fetcher.get_client')
+    def test_data_fetcher_offline_requires_cache(self, mock_api):
+        with self.assertRaises(CacheMissException):
+            DataFetcher(Mock(spec=Config), offline=True)
@@ -0,0 +1,55 @@
+import numpy as np
+import unittest
+from geopy import distance
+from scripts.geodesic import degrees_to_metres, distance_bound_to, geodesic_lengths
+
+
+class GeodesicTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.lat1, self.lon1 = rng.uniform(-80, 80, 200), rng.uniform(-180, 180, 200)
+        self.lat2, self.lon2 = self.lat1 + rng.uniform(-1, 1, 200), self.lon1 + rng.uniform(-1, 1, 200)
+        self.expected = np.array([distance.distance(p1, p2).km for p1, p2 in
+                                  zip(zip(self.lat1, self.lon1), zip(self.lat2, self.lon2))])
+
+    def test_ellipsoidal(self):
+        lengths = geodesic_lengths(self.lon1, self.lat1, self.lon2, self.lat2, method='ellipsoidal')
+
+        np.testing.assert_allclose(lengths, self.expected, rtol=0, atol=1e-6)
+
+    def test_haversine(self):
+        lengths = geodesic_lengths(self.lon1, self.lat1, self.lon2, self.lat2, method='haversine')
+
+        np.testing.assert_allclose(lengths, self.expected, rtol=0.006)
+
+    def test_degrees_to_metres(self):
+        self.assertAlmostEqual(111195, degrees_to_metres(1), delta=1)
+
+    def test_same_point(self):
+        lengths = geodesic_lengths([0.3], [0.4], [0.3], [0.4])
+
+        self.assertEqual([0], lengths.tolist())
+
+    def test_empty(self):
+        lengths = geodesic_lengths([], [], [], [])
+
+        self.assertEqual([], lengths.tolist())
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            geodesic_lengths([0.3], [0.4], [0.3], [0.4], method='flat')
+
+    def test_distance_bound(self):
+        for method in ['ellipsoidal', 'haversine']:
+            lengths = geodesic_lengths(self.lon1, self.lat1, self.lon2, self.lat2, method=method)
+            bounds = np.array([distance_bound_to(lon2, lat2, method=method)(lon1, lat1)
+                               for lon1, lat1, lon2, lat2 in zip(self.lon1, self.lat1, self.lon2, self.lat2)])
+
+            self.assertTrue(np.all(bounds <= lengths))
+            np.testing.assert_allclose(bounds, lengths, rtol=0.01)
+
+    def test_distance_bound_meridian(self):
+        # Along the meridian at the equator, the ellipsoid curves the least
+        length = geodesic_lengths([10], [-0.01], [10], [0.01])[0]
+
+        self.assertLessEqual(distance_bound_to(10, 0.01)(10, -0.01), length)
@@ -1,4 +1,6 @@
+import networkx as nx
 import unittest
+from geopy import distance
 from scripts.config import Config
 from scripts.graph import GraphProcessing
 from scripts.model import Model
@@ -9,7 +11,10 @@ class GraphProcessingTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.mock_config = Mock(spec=Config)
         self.mock_config.zero_cost = False
-        self.mock_config.neighbour_eps = 0.1
+        self.mock_config.neighbour_radius = 10000
+        self.mock_config.length_method = 'ellipsoidal'
+        self.mock_config.centre_method = 'sweep'
+        self.mock_config.graph_engine = 'networkx'
 
         self.mock_model = Mock(spec=Model)
         self.mock_model.config = self.mock_config
@@ -42,6 +47,142 @@ class GraphProcessingTestCase(unittest.TestCase):
         expected = [{0, 1}, {2, 3}]
         self.assertEqual(expected, components)
 
+    def test_preprocessing_links_close_nodes_across_components(self):
+        # 0-1-2 is one component, and 3 lies close to both 2 and 4
+        self.mock_model.get_adj_list.return_value = {0: [1], 1: [2], 2: [], 3: [4], 4: []}
+        self.mock_model.get_node_pos.return_value = {0: (0.0, 0.0),
+                                                     1: (0.0001, 0.0),
+                                                     2: (0.0002, 0.0),
+                                                     3: (0.0003, 0.0),
+                                                     4: (0.0004, 0.0)}
+        self.mock_config.neighbour_radius = 25
+
+        graph = GraphProcessing(self.mock_model)
+        components = graph.preprocessing()
+
+        self.assertEqual(1, len(components))
+        self.assertFalse(graph.graph.has_edge(0, 2))
+        self.assertEqual({(0, 1), (1, 2), (1, 3), (2, 3), (2, 4), (3, 4)},
+                         {tuple(sorted(edge)) for edge in graph.graph.edges})
+
+    def get_path_graph(self) -> GraphProcessing:
+        self.mock_model.get_adj_list.side_effect = lambda threshold=None: {0: [1], 1: [2], 2: [3], 3: []} \
+            if threshold == 0 else {0: [1], 1: [], 2: [3], 3: []}
+        self.mock_model.get_node_pos.return_value = {0: (0.0, 0.0),
+                                                     1: (0.01, 0.0),
+                                                     2: (0.02, 0.0),
+                                                     3: (0.03, 0.0)}
+        self.mock_config.neighbour_radius = 100
+        graph = GraphProcessing(self.mock_model)
+        graph.preprocessing()
+        return graph
+
+    def test_shortest_path_overall(self):
+        graph = self.get_path_graph()
+
+        dist, path = graph.shortest_path_overall({0, 1}, {2, 3})
+
+        self.assertEqual([(1, 2)], path)
+        self.assertAlmostEqual(graph.get_edge_lengths([(1, 2)])[0], dist)
+
+    def test_shortest_path_existing(self):
+        graph = self.get_path_graph()
+
+        dist, path = graph.shortest_path_existing({0, 1}, {2, 3})
+
+        self.assertEqual([(1, 2)], path)
+        self.assertAlmostEqual(graph.get_edge_lengths([(1, 2)])[0], dist)
+        self.assertNotEqual(0, graph.edge_length[(0, 1)])
+
+    def get_grid_graph(self) -> GraphProcessing:
+        adj_list = {10 * i + j: [] for i in range(7) for j in range(5)}
+        for i in range(7):
+            for j in range(5):
+                if i < 6:
+                    adj_list[10 * i + j].append(10 * (i + 1) + j)
+                if j < 4:
+                    adj_list[10 * i + j].append(10 * i + j + 1)
+        self.mock_model.get_adj_list.return_value = adj_list
+        self.mock_model.get_node_pos.return_value = {node: (0.001 * (node // 10), 56 + 0.001 * (node % 10))
+                                                     for node in adj_list}
+        self.mock_config.neighbour_radius = 10
+        graph = GraphProcessing(self.mock_model)
+        graph.preprocessing()
+        return graph
+
+    def test_centre_methods_agree(self):
+        graph = self.get_grid_graph()
+        nodes = set(graph.graph.nodes)
+
+        centres = {}
+        for method in ['exact', 'sweep', 'medoid']:
+            self.mock_config.centre_method = method
+            centres[method] = graph.get_centre_of_nodes(nodes)
+
+        self.assertEqual(graph.layout[32], centres['exact'])
+        self.assertEqual(centres['exact'], centres['sweep'])
+        self.assertEqual(centres['exact'], centres['medoid'])
+
+    def test_centre_paths_match_dijkstra(self):
+        graph = self.get_grid_graph()
+        graph.graph_unfiltered.remove_edges_from([(22, 32), (23, 33), (24, 34), (21, 31)])
+        from_region, to_region = {0, 1, 10, 11}, {60, 61, 62, 63, 64}
+
+        for method in [graph.shortest_path_town_centre, graph.shortest_path_local_centre]:
+            dist, path = method(from_region, to_region)
+
+            node_from = path[0][0]
+            node_to = path[-1][1]
+            expected = nx.single_source_dijkstra(graph.graph_unfiltered, node_from, node_to, weight='length')[0]
+            self.assertAlmostEqual(expected, dist)
+
+    def test_distance_bound(self):
+        graph = self.get_grid_graph()
+        lengths = nx.single_source_dijkstra_path_length(graph.graph_unfiltered, 0, weight='length')
+        bound = graph.get_distance_bound_to(0)
+
+        self.assertTrue(all(bound(node) <= length for node, length in lengths.items()))
+
+    def test_hierarchy_paths_match(self):
+        graph = self.get_grid_graph()
+        graph.graph_unfiltered.remove_edges_from([(22, 32), (23, 33), (24, 34), (21, 31)])
+        from_region, to_region = {0, 1, 10, 11}, {60, 61, 62, 63, 64}
+        methods = ['shortest_path_overall', 'shortest_path_town_centre', 'shortest_path_local_centre']
+        expected = [getattr(graph, method)(from_region, to_region)[0] for method in methods]
+
+        graph.build_hierarchy()
+
+        for method, dist in zip(methods, expected):
+            self.assertAlmostEqual(dist, getattr(graph, method)(from_region, to_region)[0])
+
+    def test_hierarchy_rebuilt(self):
+        graph = self.get_grid_graph()
+        graph.build_hierarchy()
+        hierarchy = graph.hierarchy
+
+        graph.connect_close_nodes()
+        self.assertIsNone(graph.hierarchy)
+        graph.graph_unfiltered.add_edge(0, 64, length=0.001)
+        dist, path = graph.shortest_path_overall({0}, {64})
+
+        self.assertIsNot(hierarchy, graph.hierarchy)
+        self.assertEqual(0.001, dist)
+        self.assertEqual([(0, 64)], path)
+        graph.graph_unfiltered.add_edge(1, 63, length=0.001)
+        self.assertTrue(graph.get_hierarchy().matches(graph.graph_unfiltered))
+
+    def test_centre_unknown_method(self):
+        self.mock_config.centre_method = 'random'
+
+        with self.assertRaises(ValueError):
+            self.graph.get_centre_of_nodes({0, 1})
+
+    def test_edge_length(self):
+        for (u, v), length in self.graph.edge_length.items():
+            (lon1, lat1), (lon2, lat2) = self.graph.layout[u], self.graph.layout[v]
+            expected = distance.distance((lat1, lon1), (lat2, lon2)).km
+            self.assertAlmostEqual(expected, length, places=6)
+
     def test_trim_path_no_cycle(self):
         path = [(0, 1), (1, 2)]
         from_region = {0}
@@ -0,0 +1,102 @@
+import networkx as nx
+import numpy as np
+import random
+import unittest
+from scripts.hierarchy import ContractionHierarchy
+
+
+class ContractionHierarchyTestCase(unittest.TestCase):
+    @staticmethod
+    def random_graph(seed: int) -> nx.Graph:
+        rng = random.Random(seed)
+        graph = nx.gnm_random_graph(80, 160, seed=seed)
+        for u, v in graph.edges:
+            graph.edges[u, v]['length'] = rng.random()
+        return graph
+
+    def assert_valid_path(self, graph: nx.Graph, sources, targets, dist: float, path):
+        self.assertIn(path[0], sources)
+        self.assertIn(path[-1], targets)
+        self.assertTrue(all(node not in sources for node in path[1:]))
+        self.assertTrue(all(node not in targets for node in path[:-1]))
+        self.assertAlmostEqual(dist, nx.path_weight(graph, path, weight='length'))
+
+    def test_matches_dijkstra_between_nodes(self):
+        for seed in range(10):
+            graph = self.random_graph(seed)
+            hierarchy = ContractionHierarchy.build(graph)
+            lengths = dict(nx.all_pairs_dijkstra_path_length(graph, weight='length'))
+            rng = random.Random(seed)
+            for _ in range(50):
+                source, target = rng.sample(range(80), 2)
+                if target not in lengths[source]:
+                    with self.assertRaises(nx.NetworkXNoPath):
+                        hierarchy.query([source], [target])
+                    continue
+
+                dist, path = hierarchy.query([source], [target])
+
+                self.assertAlmostEqual(lengths[source][target], dist)
+                self.assert_valid_path(graph, {source}, {target}, dist, path)
+
+    def test_matches_dijkstra_between_sets(self):
+        for seed in range(10):
+            graph = self.random_graph(seed)
+            hierarchy = ContractionHierarchy.build(graph)
+            rng = random.Random(seed)
+            for _ in range(20):
+                sources = set(rng.sample(range(80), rng.randrange(1, 6)))
+                targets = set(rng.sample(range(80), rng.randrange(1, 6))) - sources
+                if len(targets) == 0:
+                    continue
+                lengths = nx.multi_source_dijkstra_path_length(graph, sources, weight='length')
+                expected = min((lengths[target] for target in targets if target in lengths), default=None)
+                if expected is None:
+                    continue
+
+                dist, path = hierarchy.query(sources, targets)
+
+                self.assertAlmostEqual(expected, dist)
+                self.assert_valid_path(graph, sources, targets, dist, path)
+
+    def test_source_in_targets(self):
+        hierarchy = ContractionHierarchy.build(nx.Graph([(0, 1, {'length': 1})]))
+
+        self.assertEqual((0, [1]), hierarchy.query({0, 1}, {1}))
+
+    def test_shortcuts_unpacked(self):
+        # Contracting the inner nodes of a line needs shortcuts, which queries must expand to its edges
+        graph = nx.path_graph(12)
+        nx.set_edge_attributes(graph, 1.0, 'length')
+        graph.add_edge(0, 11, length=20.0)
+        hierarchy = ContractionHierarchy.build(graph)
+
+        dist, path = hierarchy.query([0], [11])
+
+        self.assertGreater(len(hierarchy.middle), 0)
+        self.assertEqual(11, dist)
+        self.assertEqual(list(range(12)), path)
+
+    def test_matches(self):
+        graph = self.random_graph(0)
+        hierarchy = ContractionHierarchy.build(graph)
+
+        self.assertTrue(hierarchy.matches(graph))
+        graph.add_edge(0, 80, length=1)
+        self.assertFalse(hierarchy.matches(graph))
+
+    def test_arrays(self):
+        graph = self.random_graph(1)
+        hierarchy = ContractionHierarchy.build(graph)
+        node_ids = np.array(sorted(graph.nodes), dtype=np.int64)
+
+        restored = ContractionHierarchy.from_arrays(node_ids, hierarchy.to_arrays(node_ids))
+
+        self.assertEqual(hierarchy.rank, restored.rank)
+        self.assertEqual(hierarchy.up, restored.up)
+        self.assertEqual(hierarchy.middle, restored.middle)
+        self.assertTrue(restored.matches(graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
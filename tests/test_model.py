@@ -1,8 +1,10 @@
+import numpy as np
 import overpy
 import unittest
 from scripts.config import BoundingBox, Config, WeightedTags
 from scripts.data_fetcher import DataFetcher
 from scripts.model import Model
+from scripts.store import StoreBuilder
 from unittest.mock import Mock
 
 
@@ -15,18 +17,37 @@ class ModelTestCase(unittest.TestCase):
         self.mock_data_fetcher = Mock(spec=DataFetcher)
         self.mock_data_fetcher.config = self.mock_config
         self.mock_data_fetcher.get_ways.return_value = []
+        self.mock_data_fetcher.get_nodes_on_ways.return_value = {}
 
         self.model = Model(self.mock_data_fetcher)
 
+    def test_store_from_data_fetcher(self):
+        mock_node_0 = Mock(spec=overpy.Node, id=456, lon=0.3, lat=0.2)
+        mock_node_1 = Mock(spec=overpy.Node, id=123, lon=0.35, lat=0.25)
+        mock_way = Mock(spec=overpy.Way, id=12, tags={'highway': 'cycleway'})
+        self.mock_data_fetcher.get_ways.return_value = [mock_way]
+        self.mock_data_fetcher.get_nodes_on_ways.return_value = {12: [mock_node_0, mock_node_1]}
+
+        model = Model(self.mock_data_fetcher)
+
+        self.assertEqual([123, 456], model.store.node_ids.tolist())
+        self.assertEqual([456, 123], model.store.node_ids[model.store.get_nodes(0)].tolist())
+        self.assertEqual({'highway': 'cycleway'}, model.store.get_tags(0))
+
     def test_get_node_pos(self):
-        adj_list = {123: [], 456: []}
-        self.model.get_node_pos(adj_list)
-        self.mock_data_fetcher.get_node_pos_by_ids.assert_called_once_with([123, 456])
+        builder = StoreBuilder()
+        builder.add_node(456, 0.3, 0.2)
+        builder.add_node(123, 0.35, 0.25)
+        self.model.store = builder.build()
+
+        node_pos = self.model.get_node_pos({123: [], 456: []})
+
+        self.assertEqual({123: (0.35, 0.25), 456: (0.3, 0.2)}, node_pos)
 
     def test_get_node_pos_empty(self):
-        adj_list = {}
-        self.model.get_node_pos(adj_list)
-        self.mock_data_fetcher.get_node_pos_by_ids.assert_called_once_with([])
+        node_pos = self.model.get_node_pos({})
+
+        self.assertEqual({}, node_pos)
 
     def test_eval_way_one_tag(self):
         weighted_tags = WeightedTags({
@@ -159,62 +180,92 @@ class ModelTestCase(unittest.TestCase):
         self.assertEqual(0.5, score)
 
     def test_count_node_links(self):
-        mock_node_0 = Mock(spec=overpy.Node, id=0)
-        mock_node_1 = Mock(spec=overpy.Node, id=1)
-        mock_node_2 = Mock(spec=overpy.Node, id=2)
-        hyper_edges = [[mock_node_0, mock_node_1], [mock_node_0, mock_node_2]]
+        nodes = np.array([0, 1, 0, 2])
 
-        link_counter = self.model.count_node_links(hyper_edges)
-        expected = {0: 2, 1: 1, 2: 1}
+        link_counter = self.model.count_node_links(nodes, 4)
+        expected = [2, 1, 1, 0]
 
-        self.assertEqual(expected, link_counter)
+        self.assertEqual(expected, link_counter.tolist())
 
     def test_ways_to_adj_list(self):
-        mock_node_0 = Mock(spec=overpy.Node, id=0)
-        mock_node_1 = Mock(spec=overpy.Node, id=1)
-        mock_node_2 = Mock(spec=overpy.Node, id=2)
-        hyper_edges = [[mock_node_0, mock_node_1], [mock_node_0, mock_node_2]]
-        link_counter = {0: 2, 1: 1, 2: 1}
+        indptr, nodes = np.array([0, 2, 4]), np.array([0, 1, 0, 2])
+        link_counter = np.array([2, 1, 1])
+        node_ids = np.array([10, 11, 12])
 
-        adj_list = self.model.ways_to_adj_list(hyper_edges, link_counter)
-        expected = {0, 1, 2}
+        adj_list = self.model.ways_to_adj_list(indptr, nodes, link_counter, node_ids)
+        expected = {10: [11, 12], 11: [], 12: []}
 
-        self.assertEqual(expected, adj_list.keys())
+        self.assertEqual(expected, adj_list)
 
     def test_ways_to_adj_list_empty_edge(self):
-        mock_node_0 = Mock(spec=overpy.Node, id=0)
-        mock_node_1 = Mock(spec=overpy.Node, id=1)
-        mock_node_2 = Mock(spec=overpy.Node, id=2)
-        hyper_edges = [[], [mock_node_0, mock_node_2]]
-        link_counter = {0: 1, 2: 1}
+        indptr, nodes = np.array([0, 0, 2]), np.array([0, 2])
+        link_counter = np.array([1, 0, 1])
+        node_ids = np.array([10, 11, 12])
 
-        adj_list = self.model.ways_to_adj_list(hyper_edges, link_counter)
-        expected = {0, 2}
+        adj_list = self.model.ways_to_adj_list(indptr, nodes, link_counter, node_ids)
+        expected = {10, 12}
 
         self.assertEqual(expected, adj_list.keys())
 
     def test_ways_to_adj_list_cycle_edge(self):
-        mock_node_0 = Mock(spec=overpy.Node, id=0)
-        mock_node_1 = Mock(spec=overpy.Node, id=1)
-        mock_node_2 = Mock(spec=overpy.Node, id=2)
-        hyper_edges = [[mock_node_0, mock_node_0], [mock_node_1, mock_node_2]]
-        link_counter = {0: 2, 1: 1, 2: 1}
+        indptr, nodes = np.array([0, 2, 4]), np.array([0, 0, 1, 2])
+        link_counter = np.array([2, 1, 1])
+        node_ids = np.array([10, 11, 12])
 
-        adj_list = self.model.ways_to_adj_list(hyper_edges, link_counter)
-        expected = {1, 2}
+        adj_list = self.model.ways_to_adj_list(indptr, nodes, link_counter, node_ids)
+        expected = {11, 12}
 
         self.assertEqual(expected, adj_list.keys())
 
+    def test_ways_to_adj_list_skips_unshared_nodes(self):
+        indptr, nodes = np.array([0, 4, 6]), np.array([0, 1, 2, 3, 2, 4])
+        link_counter = np.array([1, 1, 2, 1, 1])
+        node_ids = np.array([10, 11, 12, 13, 14])
+
+        adj_list = self.model.ways_to_adj_list(indptr, nodes, link_counter, node_ids)
+        expected = {10: [12], 12: [13, 14], 13: [], 14: []}
+
+        self.assertEqual(expected, adj_list)
+
+    def test_ways_to_adj_list_links_consecutive_split_points(self):
+        # The way 1-2-3-4-5 is split at 3, which it shares with the way 3-9
+        indptr, nodes = np.array([0, 5, 7]), np.array([0, 1, 2, 3, 4, 2, 5])
+        link_counter = np.array([1, 1, 2, 1, 1, 1])
+        node_ids = np.array([1, 2, 3, 4, 5, 9])
+
+        adj_list = self.model.ways_to_adj_list(indptr, nodes, link_counter, node_ids)
+
+        self.assertEqual({1: [3], 3: [5, 9], 5: [], 9: []}, adj_list)
+        # Not a star from the first node of the way, as the adjacency used to be built, which skipped the way between
+        # its split points
+        self.assertNotEqual({1: [3, 5], 3: [9], 5: [], 9: []}, adj_list)
+
     def test_get_adj_list(self):
-        mock_way = Mock(spec=overpy.Way, id=12)
-        self.model.all_ways = [mock_way]
-        self.model.nodes_on_ways = {12: [1, 2]}
-        self.model.eval_way = Mock(return_value=0.7)
-        self.model.count_node_links = Mock(return_value={1: 1, 2: 1})
-        self.model.ways_to_adj_list = Mock(return_value={1: [2], 2: []})
+        builder = StoreBuilder()
+        for node_id in [1, 2, 3]:
+            builder.add_node(node_id, 0.3, 0.2)
+        builder.add_way(12, {'highway': 'cycleway'}, [1, 2])
+        builder.add_way(13, {'highway': 'primary'}, [2, 3])
+        self.model.store = builder.build()
+        self.model.eval_tags = Mock(side_effect=lambda tags: 0.7 if tags['highway'] == 'cycleway' else 0.1)
 
         adj_list = self.model.get_adj_list()
 
         self.assertEqual({1: [2], 2: []}, adj_list)
-        self.model.eval_way.assert_called_once_with(mock_way)
-        self.model.ways_to_adj_list.assert_called_once_with([[1, 2]], {1: 1, 2: 1})
+        self.assertEqual(2, self.model.eval_tags.call_count)
+
+    def test_get_scores_once(self):
+        builder = StoreBuilder()
+        for node_id in [1, 2, 3]:
+            builder.add_node(node_id, 0.3, 0.2)
+        builder.add_way(12, {'highway': 'cycleway'}, [1, 2])
+        builder.add_way(13, {'highway': 'primary'}, [2, 3])
+        builder.add_way(14, {'highway': 'cycleway'}, [1, 3])
+        self.model.store = builder.build()
+        self.model.eval_tags = Mock(side_effect=lambda tags: 0.7 if tags['highway'] == 'cycleway' else 0.1)
+
+        self.model.get_adj_list(threshold=0)
+        self.model.get_adj_list()
+
+        self.assertEqual([0.7, 0.1, 0.7], self.model.get_scores().tolist())
+        self.assertEqual(2, self.model.eval_tags.call_count)
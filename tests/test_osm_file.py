@@ -0,0 +1,120 @@
+import gzip
+import os
+import tempfile
+import unittest
+from scripts.config import BoundingBox, Config
+from scripts.exception import NodeNotFoundException
+from scripts.osm_file import OsmFileFetcher, OsmNode
+from unittest.mock import Mock
+
+try:
+    import osmium
+except ImportError:
+    osmium = None
+
+OSM_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="test">
+  <bounds minlat="0" minlon="0" maxlat="1" maxlon="1"/>
+  <node id="1" lat="0.15" lon="0.25"/>
+  <node id="2" lat="0.2" lon="0.3">
+    <tag k="amenity" v="bench"/>
+  </node>
+  <node id="3" lat="0.5" lon="0.3"/>
+  <node id="4" lat="0.25" lon="0.35"/>
+  <node id="123" lat="0.6" lon="0.6"/>
+  <way id="10">
+    <nd ref="1"/>
+    <nd ref="2"/>
+    <nd ref="3"/>
+    <tag k="highway" v="cycleway"/>
+    <tag k="surface" v="asphalt"/>
+  </way>
+  <way id="11">
+    <nd ref="2"/>
+    <nd ref="4"/>
+    <tag k="building" v="yes"/>
+  </way>
+  <way id="12">
+    <nd ref="3"/>
+    <nd ref="123"/>
+    <tag k="highway" v="primary"/>
+  </way>
+  <relation id="20">
+    <member type="way" ref="10" role=""/>
+    <tag k="type" v="route"/>
+  </relation>
+</osm>
+'''
+
+
+class OsmFileFetcherTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mock_config = Mock(spec=Config)
+        self.mock_config.bounding_box = BoundingBox(node_id=123, south=0.1, west=0.2, north=0.3, east=0.4)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmp_dir.name, 'extract.osm')
+        with open(self.filepath, 'w') as f:
+            f.write(OSM_XML)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def assert_extract(self, data_fetcher: OsmFileFetcher):
+        self.assertEqual([10], [way.id for way in data_fetcher.get_ways()])
+        self.assertEqual({'highway': 'cycleway', 'surface': 'asphalt'}, data_fetcher.get_ways()[0].tags)
+        self.assertEqual({10: [OsmNode(id=1, lon=0.25, lat=0.15), OsmNode(id=2, lon=0.3, lat=0.2)]},
+                         data_fetcher.get_nodes_on_ways())
+        self.assertEqual({1: (0.25, 0.15), 2: (0.3, 0.2)}, data_fetcher.get_node_pos_by_ids([1, 2]))
+        self.assertEqual((0.6, 0.6), data_fetcher.get_centre())
+
+    def test_parse_xml(self):
+        self.assert_extract(OsmFileFetcher(self.mock_config, self.filepath))
+
+    def test_parse_xml_gzip(self):
+        filepath = self.filepath + '.gz'
+        with gzip.open(filepath, 'wt') as f:
+            f.write(OSM_XML)
+
+        self.assert_extract(OsmFileFetcher(self.mock_config, filepath))
+
+    def test_relation_tags_not_added_to_way(self):
+        xml = OSM_XML.replace('</osm>', '''  <way id="13">
+    <nd ref="1"/>
+    <nd ref="4"/>
+    <tag k="highway" v="primary"/>
+  </way>
+  <relation id="21">
+    <member type="way" ref="13" role=""/>
+    <tag k="highway" v="cycleway"/>
+    <tag k="bicycle" v="designated"/>
+  </relation>
+</osm>''')
+        with open(self.filepath, 'w') as f:
+            f.write(xml)
+
+        data_fetcher = OsmFileFetcher(self.mock_config, self.filepath)
+
+        self.assertEqual({10: {'highway': 'cycleway', 'surface': 'asphalt'}, 13: {'highway': 'primary'}},
+                         {way.id: way.tags for way in data_fetcher.get_ways()})
+
+    def test_drops_nodes_outside_area(self):
+        data_fetcher = OsmFileFetcher(self.mock_config, self.filepath)
+
+        self.assertEqual({1, 2}, data_fetcher.nodes.keys())
+
+    def test_centre_not_found(self):
+        self.mock_config.bounding_box = BoundingBox(node_id=999, south=0.1, west=0.2, north=0.3, east=0.4)
+
+        with self.assertRaises(NodeNotFoundException):
+            OsmFileFetcher(self.mock_config, self.filepath)
+
+    @unittest.skipIf(osmium is None, 'osmium is not installed')
+    def test_parse_pbf(self):
+        filepath = os.path.join(self.tmp_dir.name, 'extract.osm.pbf')
+        writer = osmium.SimpleWriter(filepath)
+        for node in osmium.FileProcessor(self.filepath):
+            writer.add(node)
+        writer.close()
+
+        self.assert_extract(OsmFileFetcher(self.mock_config, filepath))
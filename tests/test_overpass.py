@@ -0,0 +1,129 @@
+import overpy
+import threading
+import unittest
+from scripts.overpass import OverpassClient, get_client, parse_status
+from tests.overpass_server import OverpassStub
+from unittest.mock import patch
+
+STATUS_BUSY = '''Connected as: 1234
+Current time: 2024-05-01T12:00:00Z
+Rate limit: 2
+Slot available after: 2024-05-01T12:00:03Z, in 3 seconds.
+Slot available after: 2024-05-01T12:00:07Z, in 7 seconds.
+Currently running queries (pid, space limit, time limit, start time):
+'''
+
+
+class ParseStatusTestCase(unittest.TestCase):
+    def test_slot_available(self):
+        self.assertEqual(0, parse_status('Rate limit: 2\n1 slots available now.\n'))
+
+    def test_slot_available_after(self):
+        self.assertEqual(3, parse_status(STATUS_BUSY))
+
+    def test_unknown(self):
+        self.assertIsNone(parse_status('Rate limit: 0\n'))
+
+
+class OverpassClientTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.nodes = {i: (0.1 * i, 0.2) for i in range(1, 4)}
+        self.ways = {10: [1, 2, 3]}
+
+    def get_client(self, server: OverpassStub, **kwargs) -> OverpassClient:
+        return OverpassClient(url=server.url, backoff=0.01, **kwargs)
+
+    def test_query(self):
+        with OverpassStub(self.nodes, self.ways) as server:
+            result = self.get_client(server).query('nwr(0, 0, 1, 1); out;')
+
+        self.assertEqual([1, 2, 3], sorted(result.get_node_ids()))
+        self.assertEqual([1, 2, 3], [node.id for node in result.ways[0].nodes])
+
+    def test_connections_reused(self):
+        with OverpassStub(self.nodes, self.ways) as server:
+            client = self.get_client(server)
+            for _ in range(5):
+                client.query('node(1); out;')
+
+        self.assertEqual(5, len(server.queries))
+        self.assertEqual(1, len(server.clients))
+
+    def test_too_many_requests(self):
+        with OverpassStub(self.nodes, self.ways, failures=[429, 429]) as server:
+            client = self.get_client(server)
+            result = client.query('node(1); out;')
+
+        self.assertEqual([1], result.get_node_ids())
+        self.assertEqual(3, len(server.queries))
+        self.assertEqual(2, client.retries)
+
+    def test_gateway_timeout(self):
+        with OverpassStub(self.nodes, self.ways, failures=[504, 503]) as server:
+            client = self.get_client(server)
+            result = client.query('node(1); out;')
+
+        self.assertEqual([1], result.get_node_ids())
+        self.assertEqual(2, client.retries)
+
+    def test_read_timeout(self):
+        with OverpassStub(self.nodes, self.ways, delay=0.3) as server:
+            client = self.get_client(server, timeout=0.1, max_retries=1)
+            with self.assertRaises(overpy.exception.MaxRetriesReached) as context:
+                client.query('node(1); out;')
+
+        self.assertEqual(2, len(context.exception.exceptions))
+
+    def test_max_retries(self):
+        with OverpassStub(self.nodes, self.ways, failures=[429] * 5) as server:
+            client = self.get_client(server, max_retries=2)
+            with self.assertRaises(overpy.exception.MaxRetriesReached) as context:
+                client.query('node(1); out;')
+
+        self.assertEqual(3, len(server.queries))
+        self.assertTrue(all(isinstance(e, overpy.exception.OverpassTooManyRequests)
+                            for e in context.exception.exceptions))
+
+    def test_bad_request(self):
+        with OverpassStub(self.nodes, self.ways, failures=[400]) as server:
+            with self.assertRaises(overpy.exception.OverpassBadRequest):
+                self.get_client(server).query('node(1); out;')
+
+        self.assertEqual(1, len(server.queries))
+
+    def test_slots(self):
+        with OverpassStub(self.nodes, self.ways, delay=0.1) as server:
+            client = self.get_client(server, slots=2)
+            threads = [threading.Thread(target=client.query, args=('node(1); out;',)) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(6, client.queries)
+        self.assertEqual(2, server.max_active)
+
+    def test_backoff_when_slot_available(self):
+        with OverpassStub(self.nodes, self.ways) as server:
+            client = OverpassClient(url=server.url, backoff=1.0)
+
+            wait = client.get_wait(429, {}, 2)
+
+        self.assertGreaterEqual(wait, 2.0)
+
+    @patch.dict('scripts.overpass._clients', clear=True)
+    def test_get_client_settings(self):
+        client = get_client(slots=1)
+
+        self.assertIs(client, get_client(slots=1))
+        self.assertEqual(3, get_client(slots=3).slots)
+        self.assertIs(print, get_client(slots=3, log=print).log)
+
+    def test_resolves_missing_nodes(self):
+        with OverpassStub(self.nodes, self.ways) as server:
+            client = self.get_client(server)
+            result = client.query('nwr(0, 0, 0.15, 1); out;')
+            nodes = result.ways[0].get_nodes(resolve_missing=True)
+
+        self.assertEqual([1, 2, 3], [node.id for node in nodes])
+        self.assertEqual(2, len(server.queries))
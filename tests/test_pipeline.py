@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from scripts.pipeline import format_summary, run_batch, run_configured_area
+from unittest.mock import patch
+
+OSM_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="test">
+  <node id="1" lat="0.10" lon="0.10"/>
+  <node id="2" lat="0.10" lon="0.11"/>
+  <node id="3" lat="0.10" lon="0.12"/>
+  <node id="4" lat="0.10" lon="0.13"/>
+  <way id="10">
+    <nd ref="1"/>
+    <nd ref="2"/>
+    <tag k="highway" v="cycleway"/>
+  </way>
+  <way id="11">
+    <nd ref="2"/>
+    <nd ref="3"/>
+    <tag k="highway" v="primary"/>
+  </way>
+  <way id="12">
+    <nd ref="3"/>
+    <nd ref="4"/>
+    <tag k="highway" v="cycleway"/>
+  </way>
+</osm>
+'''
+
+
+class PipelineTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        with open(os.path.join(self.root, 'extract.osm'), 'w') as f:
+            f.write(OSM_XML)
+
+        box = {'south': 0.05, 'west': 0.05, 'north': 0.15, 'east': 0.15}
+        self.config_json = {
+            'area': 'Town',
+            'threshold': 0.5,
+            'neighbourEps': 0.0001,
+            'strategies': {'overall': True, 'existing': True},
+            'boundingBoxes': {
+                'Town': dict(box, nodeId=2),
+                # The centre node of this area is not in the extract
+                'Missing': dict(box, nodeId=999)
+            },
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'primary': 0.1}}
+            }
+        }
+        self.args = argparse.Namespace(save='images', osm_file=os.path.join(self.root, 'extract.osm'), sweep=None,
+                                       connect_all=False, planner='greedy', budget=None, tiles=None,
+                                       artifacts='artifacts', no_artifacts=False, update=None,
+                                       format='svg', no_plot=False, plot_workers=None,
+                                       profile=False, cprofile=None, output='text', hierarchy=False)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_import_is_light(self):
+        code = ("import sys, scripts.pipeline; "
+                "print(sorted(m for m in ['networkx', 'scipy', 'matplotlib', 'overpy'] if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+
+        self.assertEqual('[]', output.strip())
+
+    def test_run_configured_area(self):
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        self.assertEqual('ok', summary['status'])
+        self.assertEqual(2, summary['components'])
+        self.assertEqual({'overall', 'existing'}, set(summary['paths'].keys()))
+        self.assertIn('preprocessing', summary['timings'])
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'images', 'Town', 'path_overall.svg')))
+
+    def test_run_configured_area_reuses_artifact(self):
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+        rerun = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        self.assertIn('save', summary['timings'])
+        self.assertIn('load', rerun['timings'])
+        self.assertNotIn('model', rerun['timings'])
+        self.assertEqual(summary['components'], rerun['components'])
+        self.assertEqual(summary['paths'], rerun['paths'])
+
+    def test_run_configured_area_hierarchy(self):
+        expected = run_configured_area(self.config_json, 'Town', self.args, self.root)
+        self.args.artifacts = 'hierarchy_artifacts'
+        self.args.hierarchy = True
+
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+        rerun = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        self.assertIn('hierarchy', summary['timings'])
+        self.assertIn('save', summary['timings'])
+        self.assertNotIn('hierarchy', rerun['timings'])
+        self.assertNotIn('save', rerun['timings'])
+        self.assertEqual(expected['paths'], summary['paths'])
+        self.assertEqual(expected['paths'], rerun['paths'])
+
+    def test_run_configured_area_hierarchy_not_asked(self):
+        self.args.hierarchy = True
+        run_configured_area(self.config_json, 'Town', self.args, self.root)
+        self.args.hierarchy = False
+
+        with patch('scripts.artifact.ContractionHierarchy.from_arrays') as from_arrays:
+            summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        self.assertEqual('ok', summary['status'])
+        self.assertNotIn('save', summary['timings'])
+        from_arrays.assert_not_called()
+
+    def test_run_configured_area_failure(self):
+        summary = run_configured_area(self.config_json, 'Missing', self.args, self.root)
+
+        self.assertEqual('failed', summary['status'])
+        self.assertIn('NodeNotFoundException', summary['error'])
+
+    def test_run_batch(self):
+        summaries = run_batch(self.config_json, ['Missing', 'Town', 'Nowhere'], self.args, self.root, workers=2)
+
+        self.assertEqual(['Missing', 'Town', 'Nowhere'], [summary['area'] for summary in summaries])
+        self.assertEqual(['failed', 'ok', 'failed'], [summary['status'] for summary in summaries])
+        self.assertIn('AreaNotDefinedException', summaries[2]['error'])
+        self.assertEqual(4, len(format_summary(summaries).splitlines()))
+
+    def test_run_configured_area_update(self):
+        self.args.update = os.path.join(self.root, 'change.osc')
+        with open(self.args.update, 'w') as f:
+            f.write('<osmChange version="0.6"><modify><way id="12"><nd ref="3"/><nd ref="4"/>'
+                    '<tag k="highway" v="cycleway"/><tag k="name" v="Path"/></way></modify></osmChange>')
+
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+        rerun = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        self.assertEqual({'ways': 1, 'edges': 0}, rerun['update'])
+        self.assertEqual(['overall', 'existing'], summary['rerun'])
+        self.assertEqual([], rerun['rerun'])
+        self.assertNotIn('model', rerun['timings'])
+        self.assertEqual(summary['paths'], rerun['paths'])
+
+    def test_run_configured_area_profile(self):
+        self.args.profile = True
+        self.args.cprofile = 'paths/overall'
+
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        stages = summary['profile']['stages']
+        self.assertIn('graph/edge_lengths', stages)
+        self.assertIn('preprocessing/connect_close_nodes', stages)
+        self.assertEqual(1, stages['paths/overall']['counts']['dijkstra_runs'])
+        self.assertEqual(3, summary['profile']['counts']['ways_scored'])
+        self.assertNotIn('paths/overall', summary['timings'])
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'images', 'Town', 'profile.json')))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'images', 'Town', 'profile_paths_overall.prof')))
+
+    def test_run_configured_area_cprofile(self):
+        self.args.cprofile = 'preprocessing/connect_close_nodes'
+
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        self.assertNotIn('profile', summary)
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'images', 'Town',
+                                                    'profile_preprocessing_connect_close_nodes.prof')))
+
+    def test_run_configured_area_json(self):
+        self.args.output = 'json'
+
+        summary = run_configured_area(self.config_json, 'Town', self.args, self.root)
+
+        results = summary['results']
+        self.assertEqual([[1, 2], [3, 4]], sorted(component['nodes'] for component in results['components']))
+        self.assertEqual([2, 2], [component['size'] for component in results['components']])
+        overall = results['paths']['overall']
+        self.assertEqual({2, 3}, set(overall['nodes']))
+        self.assertEqual([overall['nodes']], overall['edges'])
+        self.assertAlmostEqual(summary['paths']['overall'], overall['length_km'])
+        self.assertAlmostEqual(overall['length_km'], results['paths']['existing']['cost_km'])
+        self.assertNotIn('display', summary['timings'])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'images', 'Town', 'components.svg')))
+        with open(os.path.join(self.root, 'images', 'Town', 'results.json'), 'r') as f:
+            self.assertEqual(results, json.load(f))
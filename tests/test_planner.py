@@ -0,0 +1,165 @@
+import networkx as nx
+import unittest
+from scripts.config import Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.planner import NetworkPlanner
+from scripts.profiler import Profiler
+from scripts.synthetic import SyntheticFetcher, generate_network
+from unittest.mock import Mock
+
+
+class NetworkPlannerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        mock_config = Mock(spec=Config)
+        mock_config.neighbour_radius = 10
+        mock_config.length_method = 'ellipsoidal'
+        mock_config.graph_engine = 'networkx'
+
+        # Three cycle-friendly components 0-1, 2-3 and 4-5 along a road, with a detour from 3 to 6 to 4
+        adj_list_unfiltered = {0: [1], 1: [2], 2: [3], 3: [4, 6], 4: [5], 5: [], 6: [4]}
+        adj_list = {0: [1], 1: [], 2: [3], 3: [], 4: [5], 5: []}
+        mock_model = Mock(spec=Model)
+        mock_model.config = mock_config
+        mock_model.centre = (0.0, 0.0)
+        mock_model.get_adj_list.side_effect = lambda threshold=None: adj_list_unfiltered if threshold == 0 \
+            else adj_list
+        mock_model.get_node_pos.return_value = {0: (0.0, 0.0), 1: (0.01, 0.0), 2: (0.03, 0.0), 3: (0.04, 0.0),
+                                                4: (0.05, 0.0), 5: (0.07, 0.0), 6: (0.045, 0.01)}
+
+        self.graph = GraphProcessing(mock_model)
+        self.components = self.graph.preprocessing()
+
+    def test_plan_greedy(self):
+        suggested = NetworkPlanner(self.graph, self.components).plan(method='greedy')
+
+        self.assertEqual(2, len(suggested))
+        self.assertEqual({(1, 2), (3, 4)}, {tuple(sorted(edge)) for path in suggested for edge in path.path})
+        self.assertEqual(0, suggested[0].from_component)
+        self.assertAlmostEqual(self.graph.get_edge_lengths([(1, 2)])[0] + self.graph.get_edge_lengths([(3, 4)])[0],
+                               sum(path.length for path in suggested))
+
+    def test_plan_mst(self):
+        suggested = NetworkPlanner(self.graph, self.components).plan(method='mst')
+
+        self.assertEqual(2, len(suggested))
+        self.assertEqual({(1, 2), (3, 4)}, {tuple(sorted(edge)) for path in suggested for edge in path.path})
+        self.assertEqual(sorted(path.length for path in suggested), [path.length for path in suggested])
+
+    def test_plan_budget(self):
+        budget = min(self.graph.get_edge_lengths([(1, 2)])[0], self.graph.get_edge_lengths([(3, 4)])[0]) + 0.001
+
+        for method in ['greedy', 'mst']:
+            suggested = NetworkPlanner(self.graph, self.components).plan(method=method, budget=budget)
+            self.assertEqual(1, len(suggested))
+
+    def get_synthetic_graph(self) -> GraphProcessing:
+        network = generate_network('organic', nodes=1000, seed=5)
+        config = network.get_config({
+            'threshold': 0.5,
+            'neighbourRadius': 20,
+            'strategies': {},
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'footway': 0.8, 'residential': 0.7,
+                                                    'tertiary': 0.3, 'primary': 0.1}}
+            },
+            'boundingBoxes': {}
+        })
+        return GraphProcessing(Model(SyntheticFetcher(config, network)))
+
+    def assert_paths_valid(self, graph: GraphProcessing, components, suggested):
+        self.assertGreater(len(suggested), 10)
+        for path in suggested:
+            self.assertIn(path.path[-1][1], components[path.to_component])
+            self.assertAlmostEqual(path.length, graph.get_path_length(path.path))
+
+    def test_plan_mst_matches_shortest_paths(self):
+        graph = self.get_synthetic_graph()
+        components = graph.preprocessing()
+        # The shortest paths between every pair of components, with each component contracted to one node
+        component_of = {node: i for i, component in enumerate(components) for node in component}
+        contracted = nx.Graph()
+        for u, v, length in graph.graph_unfiltered.edges(data='length'):
+            a, b = (('component', component_of[n]) if n in component_of else n for n in (u, v))
+            if a != b and (not contracted.has_edge(a, b) or length < contracted[a][b]['length']):
+                contracted.add_edge(a, b, length=length)
+        distances = nx.Graph()
+        for i in range(len(components)):
+            for node, dist in nx.single_source_dijkstra_path_length(contracted, ('component', i),
+                                                                    weight='length').items():
+                if isinstance(node, tuple) and node[1] > i:
+                    distances.add_edge(i, node[1], length=dist)
+        expected = nx.minimum_spanning_tree(distances, weight='length').size(weight='length')
+
+        p = Profiler(detailed=True)
+        with p.activate():
+            suggested = NetworkPlanner(graph, components).plan(method='mst')
+
+        self.assert_paths_valid(graph, components, suggested)
+        self.assertAlmostEqual(expected, sum(path.length for path in suggested))
+        self.assertEqual(1, p.get_counts()['dijkstra_runs'])
+        for path in suggested:
+            self.assertIn(path.path[0][0], components[path.from_component])
+
+    def test_plan_greedy_matches_new_searches(self):
+        graph = self.get_synthetic_graph()
+        components = graph.preprocessing()
+        # A new search from everything connected so far for every path
+        expected = []
+        sources = set(components[0])
+        targets = set().union(*components[1:])
+        while True:
+            dists, paths = nx.multi_source_dijkstra(graph.graph_unfiltered, sources, weight='length')
+            reached = [node for node in targets if node in dists]
+            if len(reached) == 0:
+                break
+            node = min(reached, key=dists.get)
+            expected.append(dists[node])
+            component = next(component for component in components if node in component)
+            sources.update(paths[node])
+            sources.update(component)
+            targets.difference_update(component)
+
+        p = Profiler(detailed=True)
+        with p.activate():
+            suggested = NetworkPlanner(graph, components).plan(method='greedy')
+
+        self.assert_paths_valid(graph, components, suggested)
+        self.assertEqual(len(expected), len(suggested))
+        for dist, path in zip(expected, suggested):
+            self.assertAlmostEqual(dist, path.length)
+        self.assertEqual(1, p.get_counts()['dijkstra_runs'])
+
+    def test_plan_greedy_branches_from_paths(self):
+        mock_config = Mock(spec=Config)
+        mock_config.neighbour_radius = 10
+        mock_config.length_method = 'ellipsoidal'
+        mock_config.graph_engine = 'networkx'
+        # Components 0-1, 4-5 and 6-7, where the road from 1 to 4 passes 2, from which a road leads to 6
+        adj_list_unfiltered = {0: [1], 1: [2], 2: [3, 6], 3: [4], 4: [5], 5: [], 6: [7], 7: []}
+        adj_list = {0: [1], 1: [], 4: [5], 5: [], 6: [7], 7: []}
+        mock_model = Mock(spec=Model)
+        mock_model.config = mock_config
+        mock_model.centre = (0.0, 0.0)
+        mock_model.get_adj_list.side_effect = lambda threshold=None: adj_list_unfiltered if threshold == 0 \
+            else adj_list
+        mock_model.get_node_pos.return_value = {0: (0.0, 0.0), 1: (0.01, 0.0), 2: (0.02, 0.0), 3: (0.03, 0.0),
+                                                4: (0.04, 0.0), 5: (0.05, 0.0), 6: (0.025, 0.006), 7: (0.035, 0.006)}
+        graph = GraphProcessing(mock_model)
+        components = graph.preprocessing()
+
+        greedy = NetworkPlanner(graph, components).plan(method='greedy')
+        mst = NetworkPlanner(graph, components).plan(method='mst')
+
+        self.assertEqual([[1, 2, 6], [2, 3, 4]], [[path.path[0][0]] + [v for _, v in path.path] for path in greedy])
+        self.assertEqual(greedy[0].to_component, greedy[1].from_component)
+        self.assertLess(sum(path.length for path in greedy), sum(path.length for path in mst))
+
+    def test_plan_connected(self):
+        suggested = NetworkPlanner(self.graph, self.components[:1]).plan()
+
+        self.assertEqual([], suggested)
+
+    def test_plan_unknown_method(self):
+        with self.assertRaises(ValueError):
+            NetworkPlanner(self.graph, self.components).plan(method='random')
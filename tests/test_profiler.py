@@ -0,0 +1,61 @@
+import os
+import pstats
+import tempfile
+import unittest
+from scripts import profiler
+from scripts.profiler import NULL_STAGE, Profiler
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def test_disabled(self):
+        self.assertIs(NULL_STAGE, profiler.stage('anything'))
+        profiler.count('anything')
+
+        with Profiler().activate():
+            self.assertIs(NULL_STAGE, profiler.stage('anything'))
+
+    def test_nested_stages(self):
+        p = Profiler(detailed=True)
+        with p.activate():
+            with p.stage('outer'):
+                profiler.count('ways', 3)
+                for _ in range(2):
+                    with profiler.stage('inner'):
+                        profiler.count('runs')
+                        data = [0] * 100000
+            with p.stage('other'):
+                pass
+
+        self.assertEqual({'outer', 'other'}, set(p.get_timings()))
+        self.assertEqual(2, p.stages['outer/inner'].calls)
+        self.assertEqual({'runs': 2}, p.stages['outer/inner'].counts)
+        self.assertEqual({'ways': 3, 'runs': 2}, p.get_counts())
+        self.assertGreaterEqual(p.stages['outer'].wall, p.stages['outer/inner'].wall)
+        self.assertGreaterEqual(p.stages['outer'].peak_rss, p.stages['outer/inner'].peak_rss)
+        self.assertGreater(p.stages['outer/inner'].peak_rss, 0)
+        self.assertEqual(4, len(p.format().splitlines()))
+        self.assertIsNone(profiler._active)
+        del data
+
+    def test_cprofile(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            p = Profiler(detailed=True, cprofile_stage='inner', directory=tmp_dir)
+            with p.activate():
+                with p.stage('outer'):
+                    with profiler.stage('inner'):
+                        sorted(range(1000), key=lambda x: -x)
+
+            filepath = os.path.join(tmp_dir, 'profile_outer_inner.prof')
+            self.assertTrue(os.path.exists(filepath))
+            self.assertGreater(pstats.Stats(filepath).total_calls, 0)
+
+    def test_cprofile_without_detail(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            p = Profiler(cprofile_stage='inner', directory=tmp_dir)
+            with p.activate():
+                with p.stage('outer'):
+                    with profiler.stage('inner'):
+                        sorted(range(1000), key=lambda x: -x)
+
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'profile_outer_inner.prof')))
+            self.assertEqual({'outer'}, set(p.get_timings()))
@@ -0,0 +1,59 @@
+import networkx as nx
+import numpy as np
+import os
+import tempfile
+import unittest
+from scripts.render import GraphRenderer, Layer
+
+
+class GraphRendererTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.graph = nx.grid_2d_graph(30, 30)
+        self.graph = nx.convert_node_labels_to_integers(self.graph, label_attribute='pos')
+        self.layout = {node: (0.001 * i, 0.001 * j) for node, (i, j) in self.graph.nodes(data='pos')}
+        # A node in the layout but not the graph, as for nodes only on ways below the threshold
+        self.layout[-1] = (0.0305, 0.0305)
+        self.renderer = GraphRenderer(self.graph, self.layout)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_get_layer(self):
+        nodes = {0, 1, 30, 31, 900}
+        nodes_index, edges = self.renderer.get_layer(Layer('r', nodes=nodes, edges=[(31, -1)]))
+
+        self.assertEqual({0, 1, 30, 31, -1}, set(self.renderer.nodes[nodes_index].tolist()))
+        expected = {frozenset(edge) for edge in self.graph.subgraph(nodes).edges} | {frozenset((31, -1))}
+        self.assertEqual(expected, {frozenset(self.renderer.nodes[edge].tolist()) for edge in edges})
+
+    def test_simplify(self):
+        nodes, edges = self.renderer.graph_nodes, self.renderer.graph_edges
+        renderer = GraphRenderer(self.graph, self.layout, dpi=5)
+
+        points, segments = renderer.get_shapes(nodes, edges, simplify=True)
+
+        self.assertLess(len(points), len(nodes))
+        self.assertLess(len(segments), len(edges))
+        self.assertEqual(len(points), len(np.unique(points, axis=0)))
+        self.assertFalse(np.any(np.all(segments[:, 0] == segments[:, 1], axis=1)))
+        self.assertEqual((len(nodes), 2), self.renderer.get_shapes(nodes, edges, simplify=False)[0].shape)
+
+    def test_render_reuses_base(self):
+        layers = [Layer('m', nodes=set(range(100))), Layer('y', edges=[(0, 899)])]
+        for extension in ['svg', 'png', 'svg']:
+            filepath = os.path.join(self.tmp_dir.name, f'plot.{extension}')
+            self.renderer.render(layers, filepath)
+
+            self.assertGreater(os.path.getsize(filepath), 0)
+            self.assertEqual(1, len(self.renderer.ax.collections))
+            self.assertEqual(1, len(self.renderer.ax.patches))
+
+    def test_render_all(self):
+        jobs = [([Layer('m', nodes={i, i + 1})], os.path.join(self.tmp_dir.name, f'plot_{i}.png')) for i in range(4)]
+
+        self.renderer.render_all(jobs, workers=2)
+
+        for _, filepath in jobs:
+            self.assertTrue(os.path.exists(filepath))
+        self.assertIsNone(self.renderer.fig)
@@ -0,0 +1,138 @@
+import math
+import networkx as nx
+import random
+import unittest
+from scripts.search import DijkstraTree, bidirectional_astar
+
+
+class SearchTestCase(unittest.TestCase):
+    @staticmethod
+    def random_graph(seed: int) -> nx.Graph:
+        rng = random.Random(seed)
+        graph = nx.gnm_random_graph(60, 120, seed=seed)
+        for u, v in graph.edges:
+            graph.edges[u, v]['length'] = rng.random()
+        return graph
+
+    def test_matches_search_per_target(self):
+        for seed in range(20):
+            graph = self.random_graph(seed)
+            rng = random.Random(seed)
+            sources, targets = set(rng.sample(range(60), 5)), set(rng.sample(range(60), 8))
+            targets -= sources
+
+            expected = float('inf')
+            for target in targets:
+                try:
+                    expected = min(expected, nx.multi_source_dijkstra(graph, sources, target, weight='length')[0])
+                except nx.NetworkXNoPath:
+                    pass
+            if expected == float('inf'):
+                continue
+
+            dist, path = DijkstraTree(graph, sources, weight='length').nearest(targets)
+
+            self.assertAlmostEqual(expected, dist)
+            self.assertIn(path[0], sources)
+            self.assertIn(path[-1], targets)
+            self.assertAlmostEqual(dist, nx.path_weight(graph, path, weight='length'))
+
+    def test_weight_function(self):
+        graph = nx.Graph([(0, 1, {'length': 1}), (1, 2, {'length': 1}), (0, 2, {'length': 1.5})])
+
+        tree = DijkstraTree(graph, {0}, weight=lambda u, v, data: 0 if {u, v} == {0, 1} else data['length'])
+        dist, path = tree.nearest({2})
+
+        self.assertEqual(1, dist)
+        self.assertEqual([0, 1, 2], path)
+
+    def test_source_in_targets(self):
+        graph = nx.Graph([(0, 1, {'length': 1})])
+
+        dist, path = DijkstraTree(graph, {0, 1}).nearest({1})
+
+        self.assertEqual(0, dist)
+        self.assertEqual([1], path)
+
+    def test_no_path(self):
+        graph = nx.Graph([(0, 1, {'length': 1}), (2, 3, {'length': 1})])
+
+        with self.assertRaises(nx.NetworkXNoPath):
+            DijkstraTree(graph, {0}).nearest({2, 3})
+
+
+class DijkstraTreeTestCase(unittest.TestCase):
+    def test_queries_match_new_searches(self):
+        for seed in range(20):
+            graph = SearchTestCase.random_graph(seed)
+            rng = random.Random(seed)
+            sources = set(rng.sample(range(60), 3))
+            tree = DijkstraTree(graph, sources)
+            # Later queries may ask for nodes the tree has already settled or grow it further
+            for _ in range(5):
+                targets = set(rng.sample(range(60), rng.randrange(1, 6)))
+                try:
+                    expected = DijkstraTree(graph, sources).nearest(targets)
+                except nx.NetworkXNoPath:
+                    with self.assertRaises(nx.NetworkXNoPath):
+                        tree.nearest(targets)
+                    continue
+
+                self.assertEqual(expected, tree.nearest(targets))
+
+    def test_search_shared(self):
+        graph = nx.path_graph(10)
+        nx.set_edge_attributes(graph, 1.0, 'length')
+        tree = DijkstraTree(graph, {0})
+
+        self.assertEqual((9.0, list(range(10))), tree.nearest({9}))
+        self.assertEqual(10, len(tree.dist))
+        self.assertEqual((3.0, [0, 1, 2, 3]), tree.nearest({3, 7}))
+        self.assertEqual(10, len(tree.dist))
+
+
+class BidirectionalAStarTestCase(unittest.TestCase):
+    @staticmethod
+    def geometric_graph(seed: int) -> nx.Graph:
+        rng = random.Random(seed)
+        graph = nx.random_geometric_graph(80, 0.2, seed=seed)
+        for u, v in graph.edges:
+            # Edges are at least as long as the straight line between their ends, as roads are
+            graph.edges[u, v]['length'] = math.dist(graph.nodes[u]['pos'], graph.nodes[v]['pos']) * rng.uniform(1, 2)
+        return graph
+
+    def test_matches_dijkstra(self):
+        for seed in range(20):
+            graph = self.geometric_graph(seed)
+            pos = nx.get_node_attributes(graph, 'pos')
+            rng = random.Random(seed)
+            for _ in range(5):
+                source, target = rng.sample(list(graph), 2)
+                try:
+                    expected = nx.single_source_dijkstra(graph, source, target, weight='length')[0]
+                except nx.NetworkXNoPath:
+                    with self.assertRaises(nx.NetworkXNoPath):
+                        bidirectional_astar(graph, source, target, lambda v: lambda u: math.dist(pos[u], pos[v]))
+                    continue
+
+                dist, path = bidirectional_astar(graph, source, target, lambda v: lambda u: math.dist(pos[u], pos[v]))
+
+                self.assertAlmostEqual(expected, dist)
+                self.assertEqual([source, target], [path[0], path[-1]])
+                self.assertAlmostEqual(dist, nx.path_weight(graph, path, weight='length'))
+
+    def test_zero_bound(self):
+        for seed in range(10):
+            graph = SearchTestCase.random_graph(seed)
+            component = max(nx.connected_components(graph), key=len)
+            source, target = random.Random(seed).sample(sorted(component), 2)
+
+            dist, path = bidirectional_astar(graph, source, target, lambda v: lambda u: 0)
+
+            self.assertAlmostEqual(nx.single_source_dijkstra(graph, source, target, weight='length')[0], dist)
+            self.assertAlmostEqual(dist, nx.path_weight(graph, path, weight='length'))
+
+    def test_same_node(self):
+        graph = nx.Graph([(0, 1, {'length': 1})])
+
+        self.assertEqual((0, [1]), bidirectional_astar(graph, 1, 1, lambda v: lambda u: 0))
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import networkx as nx
+import unittest
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.pipeline import STRATEGIES
+from scripts.server import PlanningServer, PlanningService
+from scripts.synthetic import SyntheticFetcher, generate_network
+
+
+class PlanningServerTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        config_json = {
+            'threshold': 0.5,
+            'neighbourRadius': 30,
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'footway': 0.8, 'residential': 0.7}}
+            },
+            'boundingBoxes': {}
+        }
+        network = generate_network('grid', nodes=600, components=1, seed=2)
+        self.graph = GraphProcessing(Model(SyntheticFetcher(network.get_config(config_json), network)))
+        self.components = self.graph.preprocessing()
+        self.service = PlanningService(self.graph, self.components)
+
+    async def asyncSetUp(self) -> None:
+        self.server = PlanningServer(self.service, workers=2)
+        self.port = await self.server.start('127.0.0.1', 0)
+
+    async def asyncTearDown(self) -> None:
+        await self.server.close()
+
+    async def request(self, method: str, target: str, body=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        content = b'' if body is None else json.dumps(body).encode('utf-8')
+        writer.write(f'{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(content)}\r\n\r\n'
+                     .encode('latin-1') + content)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, content = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(content)
+
+    def get_reachable_pair(self):
+        reachable = nx.node_connected_component(self.graph.graph_unfiltered, next(iter(self.components[0])))
+        return 0, next(i for i, component in enumerate(self.components) if i > 0 and len(component & reachable) > 0)
+
+    async def test_components(self):
+        status, result = await self.request('GET', '/components')
+
+        self.assertEqual(200, status)
+        self.assertEqual(0.5, result['threshold'])
+        self.assertEqual([len(component) for component in self.components],
+                         [component['size'] for component in result['components']])
+
+    async def test_path(self):
+        from_index, to_index = self.get_reachable_pair()
+        for strategy, (method, _) in STRATEGIES.items():
+            status, result = await self.request('GET', f'/path?strategy={strategy}&from={from_index}&to={to_index}')
+
+            self.assertEqual(200, status)
+            _, path = getattr(self.graph, method)(self.components[from_index], self.components[to_index])
+            self.assertEqual([list(edge) for edge in path], result['edges'])
+
+    async def test_cache(self):
+        from_index, to_index = self.get_reachable_pair()
+        target = f'/path?strategy=overall&from={from_index}&to={to_index}'
+
+        results = await asyncio.gather(*[self.request('GET', target) for _ in range(3)])
+        _, again = await self.request('GET', target)
+
+        self.assertEqual(1, self.server.misses)
+        self.assertEqual(3, self.server.hits)
+        self.assertTrue(all(result == again for _, result in results))
+
+    async def test_threshold(self):
+        status, result = await self.request('POST', '/threshold', {'threshold': 0.9})
+
+        self.assertEqual(200, status)
+        self.assertEqual(0.9, result['threshold'])
+        self.assertEqual({'threshold': 0.9}, (await self.request('GET', '/threshold'))[1])
+        _, components = await self.request('GET', '/components')
+        self.assertEqual(result, components)
+        self.assertLessEqual(sum(component['size'] for component in components['components']),
+                             sum(len(component) for component in self.components))
+
+    async def test_errors(self):
+        self.assertEqual(400, (await self.request('GET', '/path?strategy=scenic'))[0])
+        self.assertEqual(400, (await self.request('GET', f'/path?from=0&to={len(self.components)}'))[0])
+        self.assertEqual(400, (await self.request('GET', '/components?threshold=2'))[0])
+        self.assertEqual(400, (await self.request('POST', '/threshold', {'threshold': 'high'}))[0])
+        self.assertEqual(404, (await self.request('GET', '/unknown'))[0])
+        self.assertEqual(405, (await self.request('POST', '/components'))[0])
@@ -0,0 +1,64 @@
+import random
+import unittest
+from geopy import distance
+from scripts.spatial import SpatialIndex
+
+
+class SpatialIndexTestCase(unittest.TestCase):
+    def test_query_pairs_in_metres(self):
+        # Two pairs 0.001 degrees of longitude apart, which is about 111 m at the equator and 56 m at 60 degrees
+        layout = {0: (0.0, 0.0), 1: (0.001, 0.0), 2: (0.0, 60.0), 3: (0.001, 60.0)}
+        index = SpatialIndex(layout)
+
+        self.assertEqual([(2, 3)], index.query_pairs(80))
+        self.assertEqual({(0, 1), (2, 3)}, set(index.query_pairs(120)))
+
+    def test_query_pairs_single_node(self):
+        index = SpatialIndex({0: (0.0, 0.0)})
+
+        self.assertEqual([], index.query_pairs(100))
+
+    def test_nearest(self):
+        rng = random.Random(0)
+        layout = {node: (-2.8 + rng.random() * 0.05, 56.3 + rng.random() * 0.05) for node in range(500)}
+        index = SpatialIndex(layout)
+        centre = (-2.78, 56.32)
+
+        def geodesic(node):
+            return distance.distance(tuple(reversed(layout[node])), tuple(reversed(centre))).km
+
+        for nodes in [set(range(500)), set(range(0, 500, 7)), {3, 400}]:
+            self.assertEqual(min(nodes, key=geodesic), index.nearest(centre, nodes))
+        self.assertEqual(min(layout, key=geodesic), index.nearest(centre))
+
+    def test_nearest_no_nodes(self):
+        index = SpatialIndex({0: (0.0, 0.0)})
+
+        with self.assertRaises(ValueError):
+            index.nearest((0.0, 0.0), set())
+
+    def test_update_matches_new_index(self):
+        rng = random.Random(1)
+        layout = {node: (-2.8 + rng.random() * 0.02, 56.3 + rng.random() * 0.02) for node in range(300)}
+        index = SpatialIndex(layout)
+
+        for step in range(20):
+            changed = {node: (-2.8 + rng.random() * 0.02, 56.3 + rng.random() * 0.02)
+                       for node in rng.sample(range(400), rng.randrange(1, 20))}
+            removed = set(rng.sample(sorted(set(layout) - set(changed)), 5))
+            index.update(changed, removed)
+            layout.update(changed)
+            for node in removed:
+                del layout[node]
+            expected = SpatialIndex(layout)
+
+            self.assertEqual(len(layout), len(index))
+            self.assertEqual({frozenset(pair) for pair in expected.query_pairs(100)},
+                             {frozenset(pair) for pair in index.query_pairs(100)})
+            node = rng.choice(sorted(layout))
+            self.assertEqual(sorted(expected.query_ball_point(node, 200)), sorted(index.query_ball_point(node, 200)))
+            centre = (-2.79, 56.31)
+            self.assertEqual(expected.nearest(centre), index.nearest(centre))
+            nodes = set(rng.sample(sorted(layout), 50))
+            self.assertEqual(expected.nearest(centre, nodes), index.nearest(centre, nodes))
+        self.assertLess(len(index.parts), 8)
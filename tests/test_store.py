@@ -0,0 +1,87 @@
+import unittest
+from scripts.store import NodeWayStore, StoreBuilder, TagTable
+
+
+class TagTableTestCase(unittest.TestCase):
+    def test_intern(self):
+        tag_table = TagTable()
+
+        i = tag_table.intern('highway', 'cycleway')
+        j = tag_table.intern('highway', 'primary')
+
+        self.assertEqual(i, tag_table.intern('highway', 'cycleway'))
+        self.assertNotEqual(i, j)
+        self.assertEqual(('highway', 'primary'), tag_table[j])
+        self.assertEqual(2, len(tag_table))
+
+
+class NodeWayStoreTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        builder = StoreBuilder()
+        builder.add_node(30, 0.3, 0.2)
+        builder.add_node(10, 0.1, 0.4)
+        builder.add_node(20, 0.2, 0.5)
+        builder.add_way(1, {'highway': 'cycleway'}, [30, 10])
+        builder.add_way(2, {}, [])
+        builder.add_way(3, {'highway': 'cycleway', 'surface': 'asphalt'}, [10, 20, 30])
+        self.store = builder.build()
+
+    def test_nodes_sorted_by_id(self):
+        self.assertEqual([10, 20, 30], self.store.node_ids.tolist())
+        self.assertEqual([0.1, 0.2, 0.3], self.store.lon.tolist())
+        self.assertEqual([0.4, 0.5, 0.2], self.store.lat.tolist())
+
+    def test_get_nodes(self):
+        self.assertEqual([30, 10], self.store.node_ids[self.store.get_nodes(0)].tolist())
+        self.assertEqual([], self.store.get_nodes(1).tolist())
+
+    def test_get_tags(self):
+        self.assertEqual({'highway': 'cycleway'}, self.store.get_tags(0))
+        self.assertEqual({}, self.store.get_tags(1))
+        self.assertEqual({'highway': 'cycleway', 'surface': 'asphalt'}, self.store.get_tags(2))
+        self.assertEqual(2, len(self.store.tag_table))
+
+    def test_select_ways(self):
+        indptr, nodes = self.store.select_ways([2, 1, 0])
+
+        self.assertEqual([0, 3, 3, 5], indptr.tolist())
+        self.assertEqual([10, 20, 30, 30, 10], self.store.node_ids[nodes].tolist())
+
+    def test_select_ways_empty(self):
+        indptr, nodes = self.store.select_ways([])
+
+        self.assertEqual([0], indptr.tolist())
+        self.assertEqual([], nodes.tolist())
+
+    def test_take_ways(self):
+        store = self.store.take_ways([0])
+
+        self.assertEqual([10, 30], store.node_ids.tolist())
+        self.assertEqual([1], store.way_ids.tolist())
+        self.assertEqual([30, 10], store.node_ids[store.get_nodes(0)].tolist())
+        self.assertEqual({'highway': 'cycleway'}, store.get_tags(0))
+
+    def test_merge(self):
+        builder = StoreBuilder()
+        builder.add_node(20, 0.2, 0.5)
+        builder.add_node(40, 0.4, 0.1)
+        builder.add_way(4, {'highway': 'path'}, [20, 40])
+        other = builder.build()
+
+        store = NodeWayStore.merge([self.store.take_ways([2]), other, self.store.take_ways([])])
+
+        self.assertEqual([10, 20, 30, 40], store.node_ids.tolist())
+        self.assertEqual([0.1, 0.2, 0.3, 0.4], store.lon.tolist())
+        self.assertEqual([3, 4], store.way_ids.tolist())
+        self.assertEqual([10, 20, 30], store.node_ids[store.get_nodes(0)].tolist())
+        self.assertEqual([20, 40], store.node_ids[store.get_nodes(1)].tolist())
+        self.assertEqual({'highway': 'path'}, store.get_tags(1))
+
+    def test_get_node_pos_by_ids(self):
+        node_pos = self.store.get_node_pos_by_ids([30, 10])
+
+        self.assertEqual({30: (0.3, 0.2), 10: (0.1, 0.4)}, node_pos)
+
+    def test_node_index_missing(self):
+        with self.assertRaises(KeyError):
+            self.store.node_index([10, 40])
@@ -0,0 +1,92 @@
+import random
+import unittest
+from scripts.config import Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.store import StoreBuilder
+from scripts.sweep import ThresholdSweep
+from unittest.mock import Mock
+
+
+class ThresholdSweepTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config = Config.from_dict({
+            'area': 'SomePlace',
+            'threshold': 0.5,
+            # Wider than the grid, so that close pairs link nodes that are also joined by low-scoring ways
+            'neighbourEps': 0.0012,
+            'boundingBoxes': {
+                'SomePlace': {'nodeId': 1, 'south': 0, 'west': 0, 'north': 1, 'east': 1}
+            },
+            'weightedTags': {
+                'highway': {
+                    'weight': 1,
+                    'values': {'cycleway': 1, 'residential': 0.7, 'tertiary': 0.3, 'primary': 0.1}
+                }
+            }
+        })
+
+        rng = random.Random(0)
+        builder = StoreBuilder()
+        for i in range(10):
+            for j in range(10):
+                builder.add_node(100 * i + j, 0.001 * i, 0.001 * j)
+        # Nodes close to, but not on, the grid to create proximity edges
+        for k in range(10):
+            builder.add_node(10000 + k, 0.001 * rng.randrange(10) + 0.0002, 0.001 * rng.randrange(10))
+        for way_id in range(40):
+            i, j = rng.randrange(10), rng.randrange(10)
+            nodes = [100 * i + j]
+            for _ in range(rng.randrange(1, 5)):
+                if rng.random() < 0.5:
+                    i = min(9, i + 1)
+                else:
+                    j = min(9, j + 1)
+                nodes.append(100 * i + j)
+            if rng.random() < 0.2:
+                nodes.append(10000 + rng.randrange(10))
+            highway = rng.choice(['cycleway', 'residential', 'tertiary', 'primary'])
+            builder.add_way(way_id, {'highway': highway}, nodes)
+        # An isolated way closing on itself, which is dropped from the graph as it is only a link from its first node
+        # to itself, and a closed way sharing a node with another way
+        for k in range(4):
+            builder.add_node(20000 + k, 0.5 + 0.001 * (k % 2), 0.5 + 0.001 * (k // 2))
+            builder.add_node(30000 + k, 0.7 + 0.001 * (k % 2), 0.7 + 0.001 * (k // 2))
+        builder.add_way(100, {'highway': 'cycleway'}, [20000, 20001, 20003, 20002, 20000])
+        builder.add_way(101, {'highway': 'residential'}, [30000, 30001, 30003, 30000])
+        builder.add_way(102, {'highway': 'cycleway'}, [30003, 30002])
+        self.store = builder.build()
+
+    def build_graph(self, threshold: float) -> GraphProcessing:
+        self.config.threshold = threshold
+        data_fetcher = Mock(config=self.config)
+        data_fetcher.get_store.return_value = self.store
+        data_fetcher.get_centre.return_value = (0.005, 0.005)
+        return GraphProcessing(Model(data_fetcher))
+
+    def test_sweep_matches_rebuild(self):
+        thresholds = [0.1, 0.3, 0.5, 0.7, 1.0]
+        results = ThresholdSweep(self.build_graph(0.5), top=1000).run(thresholds)
+
+        self.assertEqual(thresholds, [result['threshold'] for result in results])
+        for result in results:
+            components = self.build_graph(result['threshold']).preprocessing()
+            self.assertEqual(len(components), result['components'])
+            self.assertEqual(sorted(len(component) for component in components),
+                             sorted(component['nodes'] for component in result['top_components']))
+
+    def test_sweep_lengths_decrease(self):
+        results = ThresholdSweep(self.build_graph(0.5)).run([0.1, 0.5, 1.0])
+        largest = [result['largest_length'] for result in results]
+
+        self.assertEqual(sorted(largest, reverse=True), largest)
+        self.assertTrue(all(len(result['top_components']) <= 2 for result in results))
+
+    def test_format_table(self):
+        results = [{'threshold': 0.5, 'components': 3, 'largest_length': 1.5,
+                    'top_components': [{'nodes': 4, 'length': 1.5}]}]
+
+        table = ThresholdSweep.format_table(results)
+
+        self.assertEqual(2, len(table.splitlines()))
+        self.assertIn('1.500', table)
@@ -0,0 +1,63 @@
+import networkx as nx
+import unittest
+from scripts.config import Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.synthetic import HIGHWAY_VALUES, SyntheticFetcher, generate_network
+
+
+class SyntheticNetworkTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config_json = {
+            'threshold': 0.5,
+            'neighbourRadius': 30,
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'footway': 0.8, 'residential': 0.7}}
+            },
+            'boundingBoxes': {}
+        }
+
+    def get_graph(self, network) -> nx.Graph:
+        graph = nx.Graph()
+        for way in network.ways:
+            nx.add_path(graph, way.node_ids)
+        return graph
+
+    def test_layouts(self):
+        for layout in ['grid', 'organic']:
+            network = generate_network(layout, nodes=2000, components=3, seed=1)
+
+            self.assertLess(abs(len(network.nodes) - 2000), 400)
+            self.assertEqual(set(network.nodes), set(self.get_graph(network).nodes))
+            self.assertEqual(3, nx.number_connected_components(self.get_graph(network)))
+            box = network.bounding_box
+            self.assertTrue(all(box.contains(lon, lat) for lon, lat in network.nodes.values()))
+            self.assertTrue(all(way.tags['highway'] in HIGHWAY_VALUES for way in network.ways))
+
+    def test_number_of_ways(self):
+        few = generate_network('grid', nodes=3000, ways=300)
+        many = generate_network('grid', nodes=3000, ways=1000)
+
+        self.assertLess(len(few.ways), len(many.ways))
+        self.assertLess(abs(len(many.ways) - 1000), 200)
+
+    def test_seed(self):
+        network = generate_network('organic', nodes=500, seed=3)
+
+        self.assertEqual(network, generate_network('organic', nodes=500, seed=3))
+        self.assertNotEqual(network.nodes, generate_network('organic', nodes=500, seed=4).nodes)
+
+    def test_unknown_layout(self):
+        with self.assertRaises(ValueError):
+            generate_network('radial')
+
+    def test_fetcher(self):
+        network = generate_network('grid', nodes=1000, components=2)
+        config = network.get_config(self.config_json)
+        self.assertIsInstance(config, Config)
+
+        graph = GraphProcessing(Model(SyntheticFetcher(config, network)))
+        graph.preprocessing()
+
+        self.assertEqual(network.nodes[network.bounding_box.node_id], graph.centre)
+        self.assertEqual(2, nx.number_connected_components(graph.graph_unfiltered))
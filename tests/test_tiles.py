@@ -0,0 +1,96 @@
+import networkx as nx
+import os
+import random
+import tempfile
+import unittest
+from functools import partial
+from scripts.config import BoundingBox, Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.osm_file import OsmFileFetcher
+from scripts.tiles import TiledFetcher, TileGrid
+
+
+def get_osm_fetcher(filepath: str, config: Config, area: BoundingBox) -> OsmFileFetcher:
+    return OsmFileFetcher(config, filepath, area=area)
+
+
+def write_osm_file(filepath: str, seed: int = 0):
+    """
+    Write a random street grid of 20 x 20 nodes, with some nodes outside the bounding box and ways of up to 8 nodes
+    that cross the edges between tiles.
+    """
+    rng = random.Random(seed)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6" generator="test">']
+    for i in range(20):
+        for j in range(20):
+            lon, lat = -0.001 + 0.001 * i + rng.uniform(-0.0002, 0.0002), -0.001 + 0.001 * j
+            lines.append(f'  <node id="{100 * i + j + 1}" lat="{lat:.7f}" lon="{lon:.7f}"/>')
+    for way_id in range(150):
+        i, j = rng.randrange(20), rng.randrange(20)
+        lines.append(f'  <way id="{way_id + 1}">')
+        for _ in range(rng.randrange(2, 9)):
+            lines.append(f'    <nd ref="{100 * i + j + 1}"/>')
+            if rng.random() < 0.5:
+                i = min(19, i + 1)
+            else:
+                j = min(19, j + 1)
+        highway = rng.choice(['cycleway', 'residential', 'primary'])
+        lines.append(f'    <tag k="highway" v="{highway}"/>')
+        lines.append('  </way>')
+    lines.append('</osm>')
+    with open(filepath, 'w') as f:
+        f.write('\n'.join(lines))
+
+
+class TileGridTestCase(unittest.TestCase):
+    def test_tiles(self):
+        grid = TileGrid(BoundingBox(node_id=1, south=0, west=0, north=2, east=3), rows=2, cols=3)
+
+        self.assertEqual(6, len(grid))
+        self.assertEqual(BoundingBox(node_id=1, south=1, west=2, north=2, east=3), grid.get_tile(5))
+        self.assertEqual([0, 5, 5, 0, -1], grid.tile_of([0.5, 2.5, 3, 1, 4], [0.5, 1.5, 2, 0, 1]).tolist())
+
+
+class TiledFetcherTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmp_dir.name, 'extract.osm')
+        write_osm_file(self.filepath)
+        self.config = Config.from_dict({
+            'area': 'Grid',
+            'threshold': 0.5,
+            'neighbourEps': 0.0003,
+            'boundingBoxes': {
+                'Grid': {'nodeId': 1010, 'south': 0, 'west': 0, 'north': 0.0165, 'east': 0.0165}
+            },
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'residential': 0.7, 'primary': 0.1}}
+            }
+        })
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_tiled_matches_untiled(self):
+        untiled = GraphProcessing(Model(OsmFileFetcher(self.config, self.filepath)))
+        tiled_fetcher = TiledFetcher(self.config, partial(get_osm_fetcher, self.filepath), rows=3, cols=2, workers=2)
+        tiled = GraphProcessing(Model(tiled_fetcher))
+
+        self.assertTrue(any(len(store.way_ids) > 0 for store in tiled_fetcher.stores[1:]))
+        for graph in ['graph', 'graph_unfiltered']:
+            self.assertEqual(set(map(frozenset, getattr(untiled, graph).edges)),
+                             set(map(frozenset, getattr(tiled, graph).edges)))
+        self.assertEqual(untiled.layout, tiled.layout)
+
+        components = untiled.preprocessing()
+        tiled_components = tiled.preprocessing()
+        self.assertEqual(sorted(map(sorted, components)), sorted(map(sorted, tiled_components)))
+
+        source = min(components[0])
+        dist = nx.single_source_dijkstra_path_length(untiled.graph_unfiltered, source, weight='length')
+        tiled_dist = nx.single_source_dijkstra_path_length(tiled.graph_unfiltered, source, weight='length')
+        self.assertGreater(len(dist), len(components[0]))
+        self.assertEqual(dist.keys(), tiled_dist.keys())
+        for node, d in dist.items():
+            self.assertAlmostEqual(d, tiled_dist[node])
@@ -0,0 +1,84 @@
+import dataclasses
+import unittest
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.profiler import Profiler
+from scripts.synthetic import SyntheticFetcher, generate_network
+from scripts.trees import PathTrees
+
+METHODS = ['shortest_path_overall', 'shortest_path_town_centre', 'shortest_path_local_centre',
+           'shortest_path_existing']
+
+
+class PathTreesTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        config_json = {
+            'threshold': 0.5,
+            'neighbourRadius': 20,
+            'strategies': {},
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'footway': 0.8, 'residential': 0.7,
+                                                    'tertiary': 0.3, 'primary': 0.1}}
+            },
+            'boundingBoxes': {}
+        }
+        self.network = generate_network('organic', nodes=3000, seed=3)
+        self.config = self.network.get_config(config_json)
+
+    def get_graph(self, engine: str = 'networkx') -> GraphProcessing:
+        config = dataclasses.replace(self.config, graph_engine=engine)
+        return GraphProcessing(Model(SyntheticFetcher(config, self.network)))
+
+    def test_same_paths_as_separate_searches(self):
+        for engine in ['networkx', 'csr']:
+            graph = self.get_graph(engine)
+            components = graph.preprocessing()
+            trees = PathTrees(graph)
+            for to_region in components[1:4]:
+                for method in METHODS:
+                    expected = getattr(graph, method)(components[0], to_region)
+
+                    dist, path = getattr(graph, method)(components[0], to_region, trees=trees)
+
+                    self.assertAlmostEqual(expected[0], dist)
+                    self.assertEqual(expected[1], path)
+
+    def test_searches_shared_between_regions(self):
+        graph = self.get_graph()
+        components = graph.preprocessing()
+        trees = PathTrees(graph)
+
+        p = Profiler(detailed=True)
+        with p.activate():
+            with p.stage('paths'):
+                for to_region in components[1:6]:
+                    graph.shortest_path_overall(components[0], to_region, trees=trees)
+                    graph.shortest_path_existing(components[0], to_region, trees=trees)
+
+        self.assertEqual(2, p.get_counts()['dijkstra_runs'])
+
+    def test_centre_tree_from_second_path(self):
+        graph = self.get_graph()
+        components = graph.preprocessing()
+        trees = PathTrees(graph)
+
+        for to_region in components[1:4]:
+            graph.shortest_path_town_centre(components[0], to_region, trees=trees)
+
+        node_from = graph.index.nearest(graph.centre, components[0])
+        self.assertEqual([('length', frozenset([node_from]))], list(trees.trees))
+
+    def test_oldest_tree_dropped(self):
+        graph = self.get_graph()
+        components = graph.preprocessing()
+        trees = PathTrees(graph, max_trees=2)
+
+        for from_region in components[:3]:
+            graph.shortest_path_overall(from_region, components[3], trees=trees)
+
+        self.assertEqual([('length', frozenset(components[1])), ('length', frozenset(components[2]))],
+                         list(trees.trees))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from scripts.union_find import UnionFind
+
+
+class UnionFindTestCase(unittest.TestCase):
+    def test_find_adds_item(self):
+        components = UnionFind()
+
+        self.assertEqual(1, components.find(1))
+        self.assertIn(1, components)
+
+    def test_union(self):
+        components = UnionFind()
+
+        components.union(1, 2)
+        root, absorbed = components.union(3, 2)
+
+        self.assertEqual(components.find(1), components.find(3))
+        self.assertEqual(3, components.size[root])
+        self.assertEqual(3, absorbed)
+
+    def test_union_same_set(self):
+        components = UnionFind()
+        components.union(1, 2)
+
+        self.assertIsNone(components.union(2, 1))
+
+    def test_add_existing(self):
+        components = UnionFind()
+
+        self.assertTrue(components.add(1))
+        self.assertFalse(components.add(1))
@@ -0,0 +1,257 @@
+import os
+import random
+import tempfile
+import unittest
+from scripts.config import Config
+from scripts.graph import GraphProcessing
+from scripts.model import Model
+from scripts.osm_file import OsmWay
+from scripts.search import DijkstraTree
+from scripts.store import StoreBuilder
+from scripts.update import GraphUpdater, OsmChange
+from typing import Dict, Tuple
+from unittest.mock import Mock
+
+OSC_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6" generator="test">
+  <create>
+    <node id="5000" lat="0.0025" lon="0.0095"/>
+    <way id="500">
+      <nd ref="4"/>
+      <nd ref="5000"/>
+      <tag k="highway" v="cycleway"/>
+    </way>
+  </create>
+  <modify>
+    <node id="101" lat="0.0012" lon="0.0011"/>
+    <way id="3">
+      <nd ref="1"/>
+      <nd ref="2"/>
+      <tag k="highway" v="primary"/>
+    </way>
+  </modify>
+  <delete>
+    <way id="7"/>
+    <node id="9999"/>
+  </delete>
+</osmChange>
+'''
+
+
+class OsmChangeTestCase(unittest.TestCase):
+    def test_parse(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, 'change.osc')
+            with open(filepath, 'w') as f:
+                f.write(OSC_XML)
+
+            change = OsmChange.parse(filepath)
+
+        self.assertEqual({5000: (0.0095, 0.0025), 101: (0.0011, 0.0012)}, change.nodes)
+        self.assertEqual({500, 3}, set(change.ways.keys()))
+        self.assertEqual([1, 2], change.ways[3].node_ids)
+        self.assertEqual({'highway': 'primary'}, change.ways[3].tags)
+        self.assertEqual({7}, change.deleted_ways)
+        self.assertEqual({9999}, change.deleted_nodes)
+
+    def test_relation_tags_not_added_to_way(self):
+        xml = OSC_XML.replace('''  </modify>''', '''    <relation id="40">
+      <member type="way" ref="3" role=""/>
+      <tag k="highway" v="cycleway"/>
+      <tag k="bicycle" v="designated"/>
+    </relation>
+  </modify>''')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, 'change.osc')
+            with open(filepath, 'w') as f:
+                f.write(xml)
+
+            change = OsmChange.parse(filepath)
+
+        self.assertEqual({'highway': 'primary'}, change.ways[3].tags)
+        self.assertEqual({500, 3}, set(change.ways.keys()))
+
+
+class GraphUpdaterTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config = Config.from_dict({
+            'area': 'SomePlace',
+            'threshold': 0.5,
+            'neighbourRadius': 1,
+            'boundingBoxes': {
+                'SomePlace': {'nodeId': 1, 'south': 0, 'west': 0, 'north': 0.1, 'east': 0.1}
+            },
+            'weightedTags': {
+                'highway': {'weight': 1, 'values': {'cycleway': 1, 'residential': 0.7, 'primary': 0.1}}
+            }
+        })
+        self.rng = random.Random(0)
+        self.nodes: Dict[int, Tuple[float, float]] = {100 * i + j: (0.001 * i, 0.001 * j)
+                                                      for i in range(10) for j in range(10)}
+        self.ways: Dict[int, OsmWay] = {}
+        for way_id in range(40):
+            self.ways[way_id] = self.random_way(way_id)
+
+    def random_way(self, way_id: int) -> OsmWay:
+        i, j = self.rng.randrange(10), self.rng.randrange(10)
+        node_ids = [100 * i + j]
+        for _ in range(self.rng.randrange(1, 5)):
+            i, j = (min(9, i + 1), j) if self.rng.random() < 0.5 else (i, min(9, j + 1))
+            node_ids.append(100 * i + j)
+        tags = {'highway': self.rng.choice(['cycleway', 'residential', 'primary'])}
+        return OsmWay(id=way_id, tags=tags, node_ids=node_ids)
+
+    def build(self) -> Tuple[Model, GraphProcessing]:
+        builder = StoreBuilder()
+        used = {node for way in self.ways.values() for node in way.node_ids}
+        for node in sorted(used):
+            builder.add_node(node, *self.nodes[node])
+        for way in self.ways.values():
+            builder.add_way(way.id, way.tags, way.node_ids)
+        data_fetcher = Mock(config=self.config)
+        data_fetcher.get_store.return_value = builder.build()
+        data_fetcher.get_centre.return_value = (0.005, 0.005)
+        model = Model(data_fetcher)
+        return model, GraphProcessing(model)
+
+    def random_change(self) -> OsmChange:
+        change = OsmChange()
+        for way_id in self.rng.sample(sorted(self.ways), 3):
+            change.deleted_ways.add(way_id)
+            del self.ways[way_id]
+        for way_id in self.rng.sample(sorted(self.ways), 3):
+            way = self.ways[way_id]
+            way.tags = {'highway': self.rng.choice(['cycleway', 'residential', 'primary'])}
+            change.ways[way_id] = OsmWay(id=way_id, tags=dict(way.tags), node_ids=list(way.node_ids))
+        for _ in range(3):
+            way_id = max(self.ways) + 1 + self.rng.randrange(1000)
+            self.ways[way_id] = self.random_way(way_id)
+            change.ways[way_id] = self.ways[way_id]
+            change.nodes.update((node, self.nodes[node]) for node in self.ways[way_id].node_ids)
+        node = self.rng.choice(sorted({node for way in self.ways.values() for node in way.node_ids}))
+        self.nodes[node] = (self.nodes[node][0] + 0.0003, self.nodes[node][1])
+        change.nodes[node] = self.nodes[node]
+        return change
+
+    def assert_same_graphs(self, expected: GraphProcessing, actual: GraphProcessing):
+        for name in ['graph', 'graph_unfiltered']:
+            expected_edges = {frozenset((u, v)): d for u, v, d in getattr(expected, name).edges(data='length')}
+            actual_edges = {frozenset((u, v)): d for u, v, d in getattr(actual, name).edges(data='length')}
+            self.assertEqual(expected_edges.keys(), actual_edges.keys())
+            for edge, length in expected_edges.items():
+                self.assertAlmostEqual(length, actual_edges[edge])
+            self.assertEqual(set(getattr(expected, name).nodes), set(getattr(actual, name).nodes))
+        self.assertEqual({frozenset(edge) for edge in expected.edge_length},
+                         {frozenset(edge) for edge in actual.edge_length})
+
+    def test_apply_matches_rebuild(self):
+        model, graph = self.build()
+        updater = GraphUpdater(model, graph, graph.preprocessing())
+
+        for _ in range(5):
+            report = updater.apply(self.random_change())
+
+            _, rebuilt = self.build()
+            components = rebuilt.preprocessing()
+            self.assert_same_graphs(rebuilt, updater.graph)
+            self.assertEqual(sorted(map(sorted, components)), sorted(map(sorted, updater.get_components())))
+            self.assertGreater(report.ways, 0)
+
+    def test_ways_kept_as_source_keeps_them(self):
+        ways = dict(self.ways)
+        for highways_only in [False, True]:
+            self.ways = dict(ways)
+            model, graph = self.build()
+            updater = GraphUpdater(model, graph, graph.preprocessing(), highways_only=highways_only)
+            change = OsmChange()
+            change.ways[1] = OsmWay(id=1, tags={'building': 'yes'}, node_ids=list(self.ways[1].node_ids))
+            change.ways[1000] = OsmWay(id=1000, tags={'building': 'yes'}, node_ids=[0, 1, 2])
+            change.nodes.update((node, self.nodes[node]) for node in [0, 1, 2])
+
+            updater.apply(change)
+
+            self.ways[1], self.ways[1000] = change.ways[1], change.ways[1000]
+            if highways_only:
+                del self.ways[1], self.ways[1000]
+            _, rebuilt = self.build()
+            rebuilt.preprocessing()
+            self.assert_same_graphs(rebuilt, updater.graph)
+            self.assertEqual(not highways_only, 1000 in updater.ways)
+
+    def test_apply_updates_index(self):
+        model, graph = self.build()
+        updater = GraphUpdater(model, graph, graph.preprocessing())
+        index, tree = graph.index, graph.index.parts[0].tree
+
+        for _ in range(3):
+            updater.apply(self.random_change())
+
+        _, rebuilt = self.build()
+        rebuilt.preprocessing()
+        # The index over all nodes is kept, and only the changed nodes are indexed again
+        self.assertIs(index, updater.graph.index)
+        self.assertIs(tree, updater.graph.index.parts[0].tree)
+        self.assertEqual(rebuilt.layout, updater.graph.layout)
+        self.assertEqual(set(rebuilt.layout), {node for node in rebuilt.layout if node in updater.graph.index})
+        self.assertEqual(len(rebuilt.layout), len(updater.graph.index))
+        self.assertEqual({frozenset(pair) for pair in rebuilt.index.query_pairs(150)},
+                         {frozenset(pair) for pair in updater.graph.index.query_pairs(150)})
+
+    def test_apply_links_close_nodes(self):
+        self.config.neighbour_radius = 50
+        model, graph = self.build()
+        updater = GraphUpdater(model, graph, graph.preprocessing())
+        node = max(graph.graph.nodes, key=lambda node: self.nodes[node])
+        lon, lat = self.nodes[node]
+        self.nodes[20000], self.nodes[20001] = (lon + 0.0002, lat), (lon + 0.002, lat)
+        self.ways[20000] = OsmWay(id=20000, tags={'highway': 'cycleway'}, node_ids=[20000, 20001])
+        change = OsmChange(nodes={20000: self.nodes[20000], 20001: self.nodes[20001]},
+                           ways={20000: self.ways[20000]})
+
+        updater.apply(change)
+
+        _, rebuilt = self.build()
+        rebuilt.preprocessing()
+        self.assertTrue(updater.graph.graph.has_edge(node, 20000))
+        self.assert_same_graphs(rebuilt, updater.graph)
+
+    def test_apply_rebuilds_hierarchy(self):
+        model, graph = self.build()
+        updater = GraphUpdater(model, graph, graph.preprocessing())
+        graph.build_hierarchy()
+
+        for _ in range(3):
+            hierarchy = updater.graph.hierarchy
+            updater.apply(self.random_change())
+            components = updater.get_components()
+            from_region, to_region = components[0], set().union(*components[1:])
+
+            dist, _ = updater.graph.shortest_path_overall(from_region, to_region)
+
+            self.assertIsNot(hierarchy, updater.graph.hierarchy)
+            expected, _ = DijkstraTree(updater.graph.graph_unfiltered, from_region).nearest(to_region)
+            self.assertAlmostEqual(expected, dist)
+
+    def test_affected_strategies(self):
+        model, graph = self.build()
+        updater = GraphUpdater(model, graph, graph.preprocessing())
+        updater.results['overall'] = (0.0, [])
+        change = OsmChange()
+        change.ways[0] = self.ways[0]
+
+        report = updater.apply(change)
+
+        self.assertEqual([], report.edges)
+        self.assertEqual(['existing'], updater.affected_strategies(report, ['overall', 'existing']))
+
+    def test_save_load(self):
+        model, graph = self.build()
+        updater = GraphUpdater(model, graph, graph.preprocessing())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'state.pickle')
+            updater.save(path)
+            loaded = GraphUpdater.load(path)
+            self.assertIsNone(GraphUpdater.load(os.path.join(tmp_dir, 'missing.pickle')))
+
+        self.assert_same_graphs(updater.graph, loaded.graph)